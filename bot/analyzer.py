@@ -1,15 +1,21 @@
 # bot/analyzer.py (версия с мягкой интеграцией PO Streaming v10)
+import asyncio
+import json
 import time
 from datetime import datetime, timezone
 from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import requests
 
-from bot.config import TFS, MAX_CANDLES, REQUEST_DELAY
+from bot.config import TFS, MAX_CANDLES, REQUEST_DELAY, PO_TIMEOUT, RESAMPLE_FROM_M1
+from bot.candle_cache import CANDLE_CACHE
+from bot.http_client import HTTP
+from bot.singleflight import SingleFlight
 from bot.tv_api import get_tv_series
-from bot.indicators import compute_indicators
-from bot.scoring import score_on_tf, calc_overall_probability
+from po_stream.po_resample import TF_SECONDS, resample_ohlc
+from bot.scoring import score_tfs, calc_overall_probability, overall_direction
+from bot.executor import run_cpu
 from bot.logger import log_signal
 
 
@@ -30,11 +36,16 @@ except Exception:
     PO_SYMBOL_MAP = {}
     PO_ENGINE_HTTP = None
 
-# Живая цена от PO Streaming v10 (заполняется в pocket_po_feed.py)
+# Живая цена от PO Streaming v10 (WebSocket-фид pocket_po_feed.py)
 try:
-    from bot.pocket_po_feed import CURRENT_PO_PRICE  # type: ignore
+    from bot.pocket_po_feed import CURRENT_PO_PRICE, TICK_TTL_SEC  # type: ignore
 except Exception:
     CURRENT_PO_PRICE = {}
+    TICK_TTL_SEC = 2.5
+
+
+# сколько M1 нужно, чтобы собрать MAX_CANDLES свечей самого старшего TF (+1 формирующаяся)
+M1_HISTORY = (MAX_CANDLES + 1) * max(TF_SECONDS.get(tf, 60) for tf in TFS) // 60
 
 
 # -------------------- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ -------------------------
@@ -74,30 +85,13 @@ def map_pair_to_po_symbol(pair: str) -> str:
     return p  # обычная биржевая пара, типа EURUSD
 
 
-def fetch_po_candles(pair: str, tf_name: str, limit: int) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
-    """
-    Получение свечей из PO Streaming Engine для пары (в т.ч. OTC).
-    Ожидается эндпоинт:  GET {PO_ENGINE_HTTP}/candles?symbol=...&tf=M1&limit=...
-    """
-    if not PO_ENGINE_HTTP:
-        return None, "PO Streaming Engine не настроен (PO_ENGINE_HTTP = None)"
+PO_CANDLE_FIELDS = ("time", "open", "high", "low", "close")
 
-    symbol = map_pair_to_po_symbol(pair)
-    tf_param = tf_name.upper()  # 'M1', 'M5', 'M15', 'M30'
-
-    try:
-        r = requests.get(
-            f"{PO_ENGINE_HTTP}/candles",
-            params={"symbol": symbol, "tf": tf_param, "limit": limit},
-            timeout=2.5,
-        )
-        r.raise_for_status()
-        data = r.json()
-    except Exception as e:
-        return None, f"Ошибка запроса к PO Streaming Engine: {e}"
 
+def po_rows_to_df(data) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """Формат rows: [{"time": ISO, "open", "high", "low", "close"}] (старые tick-серверы)."""
     if not data:
-        return None, f"Нет свечей PO для {pair}"
+        return None, None
 
     df = pd.DataFrame(data)
     if "time" not in df.columns:
@@ -112,14 +106,71 @@ def fetch_po_candles(pair: str, tf_name: str, limit: int) -> Tuple[Optional[pd.D
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
     df = df.dropna(subset=["open", "high", "low", "close"])
+    return df, None
+
+
+def po_binary_to_df(body: bytes) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """Формат binary: float64 колонками подряд (time, open, high, low, close) → без разбора строк."""
+    if len(body) % (8 * len(PO_CANDLE_FIELDS)):
+        return None, "Неверный формат свечей PO (binary)"
+
+    cols = np.frombuffer(body, dtype="<f8").reshape(len(PO_CANDLE_FIELDS), -1)
+    if not cols.shape[1]:
+        return None, None
+
+    t, o, h, l, c = cols
+    df = pd.DataFrame({"time": t.astype(np.int64), "open": o, "high": h, "low": l, "close": c})
+    df["datetime"] = pd.to_datetime(df["time"], unit="s", utc=True)
+    return df, None
+
+
+async def fetch_po_candles(pair: str, tf_name: str, limit: int) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    Получение свечей из PO Streaming Engine для пары (в т.ч. OTC).
+    Ожидается эндпоинт:  GET {PO_ENGINE_HTTP}/candles?symbol=...&tf=M1&limit=...&format=binary
+    (tick-сервер без format=binary отвечает JSON-строками — разбираем их).
+    """
+    if not PO_ENGINE_HTTP:
+        return None, "PO Streaming Engine не настроен (PO_ENGINE_HTTP = None)"
+
+    symbol = map_pair_to_po_symbol(pair)
+    tf_param = tf_name.upper()  # 'M1', 'M5', 'M15', 'M30'
+    tf_sec = TF_SECONDS.get(tf_param, 60)
+
+    # тот же бар уже скачивали — без сети
+    cached = CANDLE_CACHE.get("po", pair, tf_sec, limit)
+    if cached is not None:
+        return cached, None
+
+    try:
+        body, content_type = await HTTP.get_bytes(
+            f"{PO_ENGINE_HTTP}/candles",
+            params={"symbol": symbol, "tf": tf_param, "limit": limit, "format": "binary"},
+            timeout=PO_TIMEOUT,
+            source="po",
+        )
+        if content_type == "application/octet-stream":
+            df, err = po_binary_to_df(body)
+        else:
+            df, err = po_rows_to_df(json.loads(body) if body else None)
+    except Exception as e:
+        return None, f"Ошибка запроса к PO Streaming Engine: {e}"
+
+    if err:
+        return None, err
+    if df is None:
+        return None, f"Нет свечей PO для {pair}"
     if df.empty:
         return None, "Нет валидных свечей PO"
 
     # Приводим формат к такому же, как у get_tv_series
     df["dt_utc"] = df["datetime"]
-    df["time"] = df["datetime"].astype("int64") // 10**9
+    # unix-секунды независимо от разрешения datetime64 (ns / us / s)
+    df["time"] = (df["datetime"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
 
-    return df.tail(limit), None
+    df = df.tail(limit)
+    CANDLE_CACHE.put("po", pair, tf_sec, limit, df)
+    return df, None
 
 
 def get_live_po_price(pair: str) -> Optional[float]:
@@ -135,6 +186,10 @@ def get_live_po_price(pair: str) -> Optional[float]:
     if not tick:
         return None
 
+    # тик старше TICK_TTL_SEC (фид отвалился / символ не торгуется) — не живая цена
+    if isinstance(tick, dict) and "recv" in tick and time.time() - tick["recv"] > TICK_TTL_SEC:
+        return None
+
     # словарь разных форматов
     if isinstance(tick, dict):
         if "price" in tick:
@@ -196,10 +251,83 @@ def check_market_open(df: pd.DataFrame):
     return None
 
 
+class CandleContext:
+    """
+    Свечи одной пары в рамках одного анализа.
+
+    Каждый (pair, TF) скачивается из источника один раз (не меньше MAX_CANDLES баров),
+    а короткие срезы — волатильность (50), wick entry (3), fallback (5) —
+    отдаются из памяти как tail() уже загруженной серии.
+
+    При RESAMPLE_FROM_M1 старшие TF (M5/M15/...) строятся из той же M1-серии
+    (po_resample.resample_ohlc), поэтому на анализ пары уходит один запрос.
+    """
+
+    def __init__(self, pair: str):
+        self.pair = pair
+        self.fetches = 0  # сколько раз реально ходили в источник
+        # tf_name -> (сколько баров запрашивали, df, err)
+        self._frames: dict[str, tuple[int, Optional[pd.DataFrame], object]] = {}
+
+    async def _fetch(self, tf_name: str, limit: int):
+        if is_otc_pair(self.pair):
+            df, err = await fetch_po_candles(self.pair, tf_name, limit)
+        else:
+            if self.fetches:
+                # пауза между запросами к TV, не блокирует event loop
+                await asyncio.sleep(REQUEST_DELAY)
+            df, err = await get_tv_series(self.pair, TFS.get(tf_name, "1min"), limit)
+        self.fetches += 1
+        return df, err
+
+    async def get(self, tf_name: str, n_bars: int = MAX_CANDLES):
+        cached = self._frames.get(tf_name)
+        if cached is None or cached[0] < n_bars:
+            tf_sec = TF_SECONDS.get(tf_name, 60)
+            if RESAMPLE_FROM_M1 and tf_sec > 60:
+                ratio = tf_sec // 60
+                m1, err = await self.get("M1", (n_bars + 1) * ratio)
+                df = resample_ohlc(m1, tf_sec).tail(n_bars) if m1 is not None else None
+                cached = (n_bars, df, err)
+            else:
+                limit = max(n_bars, M1_HISTORY if RESAMPLE_FROM_M1 else MAX_CANDLES)
+                df, err = await self._fetch(tf_name, limit)
+                cached = (limit, df, err)
+            self._frames[tf_name] = cached
+
+        _, df, err = cached
+        if df is None:
+            return None, err
+        return df.tail(n_bars), err
+
+
 # -------------------- ОСНОВНОЙ АНАЛИЗ --------------------
 
 
+# Один расчёт на (пару, M1-бар) для всех конкурентных вызовов
+ANALYSIS_FLIGHTS = SingleFlight()
+
+
 async def analyze_pair_for_user(user_id: int, pair: str):
+    """
+    Анализ пары для панели / API / автосканера.
+
+    Конкурентные вызовы для одной пары в пределах одного M1-бара делят один
+    расчёт (fetch → score_tfs в пуле процессов), успешный результат
+    мемоизируется до закрытия бара. Поэтому сигнал логируется один раз на бар.
+    """
+    now = time.time()
+    bar_open = int(now) - int(now) % 60
+    res, err = await ANALYSIS_FLIGHTS.do(
+        (pair, bar_open),
+        lambda: _analyze_pair(pair),
+        expires_at=bar_open + 60,
+        memoize=lambda r: r[1] is None,
+    )
+    return (dict(res) if res else res), err
+
+
+async def _analyze_pair(pair: str):
     """
     Основной анализ одной пары для панели.
 
@@ -211,17 +339,14 @@ async def analyze_pair_for_user(user_id: int, pair: str):
     """
 
     tf_results: list[dict] = []
+    tf_items: list[tuple] = []
     last_close_1m: float | None = None
+    candles = CandleContext(pair)
 
     # --------- Сбор индикаторов по всем TF ---------
     for tf_name, tf_int in TFS.items():  # {"M1":"1min","M5":"5min",...}
-        # OTC → попытка взять свечи из PO Streaming Engine
-        if is_otc_pair(pair):
-            df_tf, err = fetch_po_candles(pair, tf_name, MAX_CANDLES)
-            # для PO нет смысла спамить time.sleep
-        else:
-            df_tf, err = get_tv_series(pair, tf_int, MAX_CANDLES)
-            time.sleep(REQUEST_DELAY)
+        # OTC → свечи из PO Streaming Engine, иначе TradingView
+        df_tf, err = await candles.get(tf_name, MAX_CANDLES)
 
         if df_tf is None:
             # Если ошибка "рынок закрыт" / "нет котировок" и т.п. — сразу отдаём её наверх
@@ -238,16 +363,25 @@ async def analyze_pair_for_user(user_id: int, pair: str):
             return None, market_state["error"]
         # --------------------------------------
 
-        # Индикаторы, как в Colab
-        df_tf = compute_indicators(df_tf)
-        ind = score_on_tf(df_tf, tf_name)
-        ind["tf"] = tf_name
-        tf_results.append(ind)
+        # Индикаторы и оценка TF — быстрый путь по numpy-массивам (см. score_on_tf);
+        # считаются ниже одним заданием в пуле процессов
+        if not df_tf["datetime"].is_monotonic_increasing:
+            df_tf = df_tf.sort_values("datetime")
+        tf_items.append((
+            tf_name,
+            df_tf["open"].to_numpy(dtype="float64"),
+            df_tf["high"].to_numpy(dtype="float64"),
+            df_tf["low"].to_numpy(dtype="float64"),
+            df_tf["close"].to_numpy(dtype="float64"),
+        ))
 
         # запоминаем последний close на M1 (fallback для entry_price)
         if tf_int == "1min":
             last_close_1m = float(df_tf["close"].iloc[-1])
 
+    if tf_items:
+        tf_results = await run_cpu(score_tfs, tf_items)
+
     if not tf_results:
         return None, f"Нет данных для {pair}. Проверь подключение к источнику котировок."
 
@@ -259,28 +393,11 @@ async def analyze_pair_for_user(user_id: int, pair: str):
     m5 = next((r for r in tf_results if r.get("tf") == "M5"), None)
     m15 = next((r for r in tf_results if r.get("tf") == "M15"), None)
 
-    dirs = [r["direction"] for r in tf_results]
-    buy_count = dirs.count("BUY")
-    sell_count = dirs.count("SELL")
-
-    overall = "NONE"
-
-    # 1) Для частых сигналов — главное направление М1
-    if m1 and m1["direction"] in ("BUY", "SELL"):
-        overall = m1["direction"]
-    # 2) Если М1 дал NONE — голосование TF
-    elif buy_count > sell_count:
-        overall = "BUY"
-    elif sell_count > buy_count:
-        overall = "SELL"
-    else:
-        overall = "NONE"
+    overall = overall_direction(tf_results)
 
     # --------- Волатильность по M1 (как в Colab) ---------
-    if is_otc_pair(pair):
-        df_vol, err_vol = fetch_po_candles(pair, "M1", 50)
-    else:
-        df_vol, err_vol = get_tv_series(pair, "1min", 50)
+    # срез уже загруженной M1-серии, без повторного запроса
+    df_vol, err_vol = await candles.get("M1", 50)
 
     if df_vol is not None and not df_vol.empty:
         vol_df = df_vol.copy()
@@ -319,11 +436,8 @@ async def analyze_pair_for_user(user_id: int, pair: str):
     live_po_price = get_live_po_price(pair)
 
     try:
-        # берём последние 3 свечи M1 для точного входа
-        if is_otc_pair(pair):
-            df_1m, _ = fetch_po_candles(pair, "M1", 3)
-        else:
-            df_1m, _ = get_tv_series(pair, "1min", 3)
+        # берём последние 3 свечи M1 для точного входа (из памяти)
+        df_1m, _ = await candles.get("M1", 3)
 
         if df_1m is not None and not df_1m.empty and overall in ("BUY", "SELL"):
             df_1m = df_1m.sort_values("datetime")
@@ -381,8 +495,7 @@ async def analyze_pair_for_user(user_id: int, pair: str):
         if live_po_price is not None:
             entry_price = live_po_price
         else:
-            df1, _ = (fetch_po_candles(pair, "M1", 5) if is_otc_pair(pair)
-                      else get_tv_series(pair, "1min", 5))
+            df1, _ = await candles.get("M1", 5)
             if df1 is not None and not df1.empty:
                 df1 = df1.sort_values("datetime")
                 entry_price = float(df1["close"].iloc[-1])
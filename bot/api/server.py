@@ -1,18 +1,25 @@
 # bot/api/server.py
 from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from bot.pocket_po_feed import CURRENT_PO_PRICE
 import asyncio
 import time
 import json
-import websockets
+from datetime import datetime
+from typing import Optional
+from starlette.websockets import WebSocketState
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from bot.analyzer import analyze_pair_for_user
-from bot.config import PAIRS
-from bot.logger import read_signals_log
+from bot.analyzer import ANALYSIS_FLIGHTS, analyze_pair_for_user
+from bot.candle_cache import CANDLE_CACHE
+from bot.config import PAIRS, SIGNALS_PAGE_MAX
+from bot.executor import EXECUTORS
+from bot.http_client import HTTP
+from bot.pocket_po_feed import po_feed_status
+from bot.price_hub import PRICE_HUB
+from bot.stats_index import STATS_INDEX
+from bot.logger import SIGNAL_LOG, read_signals_log, signal_stats, signal_stats_by_pair
 
 
 app = FastAPI(title="TradeBot API")
@@ -24,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -49,13 +57,56 @@ async def api_analyze(req: PairRequest):
     return JSONResponse(res)
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Служебные метрики: пулы исполнителей, HTTP rate limit, кэш свечей, single-flight, журнал."""
+    return {
+        "executors": EXECUTORS.stats(),
+        "http": HTTP.rate_stats(),
+        "candle_cache": CANDLE_CACHE.stats(),
+        "analysis": ANALYSIS_FLIGHTS.stats(),
+        "signal_log": SIGNAL_LOG.stats(),
+        "stats_index": STATS_INDEX.stats(),
+        "price_hub": PRICE_HUB.stats(),
+        "po_feed": po_feed_status(),
+    }
+
+
 @app.get("/signals")
-def get_signals(symbol: str):
+def get_signals(
+    symbol: str,
+    limit: int = Query(100, ge=1, le=SIGNALS_PAGE_MAX),
+    before: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+):
     """
-    История сигналов (symbol: EURUSD)
+    История сигналов (symbol: EURUSD): limit самых свежих, по возрастанию времени.
+    - before — курсор из заголовка X-Next-Cursor предыдущего ответа (страница старше);
+    - since / until — окно времени (ISO или unix);
+    - fields — поля через запятую (по умолчанию time,symbol,direction,prob,expiry,result,reason).
+    Ответ — JSON-массив, отдаётся потоком по строкам.
     """
-    rows = read_signals_log(symbol)
-    return JSONResponse(rows)
+    rows, cursor = read_signals_log(
+        symbol,
+        since=since,
+        until=until,
+        before=before,
+        limit=limit,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+    )
+
+    def stream():
+        yield "["
+        for i, row in enumerate(rows):
+            yield ("," if i else "") + json.dumps(row, ensure_ascii=False)
+        yield "]"
+
+    headers = {"X-Next-Cursor": cursor} if cursor else {}
+    return StreamingResponse(stream(), media_type="application/json", headers=headers)
+
+
    #---------------- Для вывода сигналов в автоскан--------- 
 # @app.get("/autoscan")
 # def autoscan():
@@ -74,37 +125,55 @@ async def get_signal(pair: str = Query(...)):
 
     return JSONResponse(res)
     
-@app.websocket("/ws")
-async def ws_price_feed(ws: WebSocket):
-    await ws.accept()
-    print("✅ WS client connected")
-
+async def safe_close(ws: WebSocket):
+    """Закрыть WebSocket, если он ещё открыт (повторное закрытие / обрыв — не ошибка)."""
+    if ws.client_state == WebSocketState.DISCONNECTED:
+        return
     try:
-        last_sent = {}
+        await ws.close()
+    except Exception:
+        pass
 
-        while True:
-            # отправляем только если цена изменилась
-            for symbol, data in CURRENT_PO_PRICE.items():
-                price = data.get("price")
-                ts = data.get("time")
 
-                if not price:
-                    continue
+def _symbols_param(raw: Optional[str]):
+    if not raw:
+        return None
+    return [s.strip() for s in raw.split(",") if s.strip()]
 
-                if last_sent.get(symbol) == price:
-                    continue
 
-                payload = {
-                    "event": "tick",
-                    "symbol": symbol,
-                    "price": price,
-                    "time": ts,
-                }
+@app.websocket("/ws")
+async def ws_price_feed(ws: WebSocket, symbols: Optional[str] = None):
+    """
+    Живые цены PO через общий PRICE_HUB (bot/price_hub.py).
+    ?symbols=EURUSD_otc,GBPUSD_otc — подписка на часть символов (по умолчанию все);
+    сменить на лету: {"action": "subscribe", "symbols": [...]} (null — все).
+    Кадры: один символ — {"event": "tick", "symbol", "price", "time"},
+    несколько накопившихся — {"event": "ticks", "ticks": [...]}.
+    """
+    await ws.accept()
+    print("✅ WS client connected")
+    sub = PRICE_HUB.subscribe(_symbols_param(symbols))
 
-                await ws.send_json(payload)
-                last_sent[symbol] = price
+    async def receive():
+        # входящие сообщения клиента: смена подписки
+        while True:
+            msg = await ws.receive_json()
+            if isinstance(msg, dict) and msg.get("action") == "subscribe":
+                PRICE_HUB.set_symbols(sub, msg.get("symbols"))
 
-            await asyncio.sleep(0.25)
+    async def send():
+        while True:
+            batch = await sub.next_batch()
+            if len(batch) == 1:
+                await ws.send_json({"event": "tick", **batch[0]})
+            else:
+                await ws.send_json({"event": "ticks", "ticks": batch})
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            t.result()
 
     except WebSocketDisconnect:
         print("❌ WS client disconnected")
@@ -113,59 +182,29 @@ async def ws_price_feed(ws: WebSocket):
         print("❌ WS error:", e)
 
     finally:
+        for t in tasks:
+            t.cancel()
+        PRICE_HUB.unsubscribe(sub)
         await safe_close(ws)
         print("🛑 WS session closed")
 
 @app.get("/stats")
-def api_stats(symbol: str):
+def api_stats(symbol: str, window: str = Query("all", pattern="^(24h|7d|all)$")):
     """
     Возвращает статистику для WebApp:
     total, wins, losses, buy, sell, winrate, avg_prob, last_active
+    window: 24h / 7d / all — из индекса в памяти (bot/stats_index.py), без чтения журнала.
     """
-    import pandas as pd
-    from bot.config import LOG_FILE
+    return signal_stats(symbol, window)
 
-    try:
-        df = pd.read_csv(LOG_FILE)
-    except:
-        return {
-            "total": 0, "wins": 0, "losses": 0,
-            "buy": 0, "sell": 0,
-            "winrate": 0, "avg_prob": 0,
-            "last_active": "–"
-        }
-
-    # фильтруем по символу
-    df["pair"] = df["pair"].astype(str)
-    df_sym = df[df["pair"].str.replace("/", "") == symbol]
-
-    if df_sym.empty:
-        return {
-            "total": 0, "wins": 0, "losses": 0,
-            "buy": 0, "sell": 0,
-            "winrate": 0, "avg_prob": 0,
-            "last_active": "–"
-        }
-
-    total = len(df_sym)
-    wins = int((df_sym["result"] == "WIN").sum())
-    losses = int((df_sym["result"] == "LOSE").sum())
-    buy = int((df_sym["direction"] == "BUY").sum())
-    sell = int((df_sym["direction"] == "SELL").sum())
-    avg_prob = round(df_sym["probability"].astype(float).mean(), 1)
-    last = df_sym["timestamp_utc"].iloc[-1]
-
-    winrate = round((wins / (wins + losses)) * 100, 1) if (wins + losses) > 0 else 0
 
+@app.get("/stats/pairs")
+def api_stats_pairs(window: str = Query("24h", pattern="^(24h|7d|all)$")):
+    """Разбивка статистики по парам + итог по всем парам."""
     return {
-        "total": total,
-        "wins": wins,
-        "losses": losses,
-        "buy": buy,
-        "sell": sell,
-        "winrate": winrate,
-        "avg_prob": avg_prob,
-        "last_active": last,
+        "window": window,
+        "total": signal_stats(None, window),
+        "pairs": signal_stats_by_pair(window),
     }
 
 
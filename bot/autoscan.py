@@ -1,42 +1,177 @@
 import asyncio
+import time
 
 from aiogram import Bot
 
-from .config import PAIRS, SIGNAL_CHAT_ID
-from .analyzer import analyze_pair_for_user
+from .config import MAX_CANDLES, PAIRS, SIGNAL_CHAT_ID, TFS
+from .analyzer import CandleContext, analyze_pair_for_user
+from .bar_events import BAR_EVENTS, start_bar_events
+from .batch_scoring import score_batch, stack_frames
+from .executor import run_cpu
 
 AUTO_SCAN_ENABLED = False
-AUTO_SCAN_DELAY = 5.0
-AUTO_SCAN_CYCLE = 20.0
+AUTO_SCAN_CONCURRENCY = 6   # сколько пар анализируется одновременно
+AUTO_SCAN_DEBOUNCE = 0.2    # сек: собрать в один свип события, пришедшие пачкой
+AUTO_SCAN_PREFILTER = True  # пакетная оценка всех пар, полный анализ — только кандидатам
+PREFILTER_MIN_PROB = 68     # ниже analyze_pair_for_user не логирует сигнал (нет экспирации)
+
+# Метрики свипов
+SCAN_STATS = {
+    "sweeps": 0,
+    "last_sweep_sec": 0.0,
+    "pair_latency": {},      # pair -> сек на анализ
+    "close_to_result": {},   # pair -> сек от закрытия бара до результата
+    "prefilter": {},         # последний пакет: пар, кандидатов, сек
+}
+
+_SEM: asyncio.Semaphore | None = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # общий на все свипы: TV- и OTC-события могут обрабатываться одновременно
+    global _SEM
+    if _SEM is None:
+        _SEM = asyncio.Semaphore(AUTO_SCAN_CONCURRENCY)
+    return _SEM
+
+
+async def _scan_pair(bot: Bot, pair: str, closed_at: float | None = None):
+    async with _semaphore():
+        t0 = time.perf_counter()
+        try:
+            res, err = await analyze_pair_for_user(SIGNAL_CHAT_ID, pair)
+            if closed_at is not None:
+                SCAN_STATS["close_to_result"][pair] = round(time.time() - closed_at, 3)
+            if err:
+                print(f"[{pair}] Ошибка TV:", err)
+            elif res and res["dir"] in ("BUY", "SELL") and res["prob"] >= 70:
+                msg = (
+                    f"📡 *Авто-сигнал*\n"
+                    f"Пара: {pair}\n"
+                    f"Направление: *{res['dir']}*\n"
+                    f"Вероятность: *{res['prob']}%*\n"
+                    f"Цена входа: {res['entry_price']}"
+                )
+                await bot.send_message(SIGNAL_CHAT_ID, msg, parse_mode="Markdown")
+        except Exception as e:
+            print("❌ AUTOSCAN ERROR:", e)
+        finally:
+            SCAN_STATS["pair_latency"][pair] = round(time.perf_counter() - t0, 3)
+
+
+async def _load_frames(pair: str):
+    """Свечи всех TF пары — те же, что возьмёт анализ (кэш свечей общий)."""
+    async with _semaphore():
+        try:
+            candles = CandleContext(pair)
+            frames = {}
+            for tf_name in TFS:
+                df, _ = await candles.get(tf_name, MAX_CANDLES)
+                if df is None:
+                    return None
+                frames[tf_name] = df
+            return frames
+        except Exception as e:
+            print(f"[{pair}] prefilter:", e)
+            return None
+
+
+async def prefilter_pairs(pairs: list[str]) -> list[str]:
+    """
+    Пакетная оценка всех пар (batch_scoring.score_batch) вместо 3 × N отдельных
+    расчётов. Возвращает кандидатов на полный анализ: пары с вероятностью
+    не ниже PREFILTER_MIN_PROB и пары, не попавшие в пакет (короткая история,
+    NaN, ошибка загрузки) — их проверяет полный анализ, как раньше.
+    """
+    t0 = time.perf_counter()
+    loaded = await asyncio.gather(*(_load_frames(p) for p in pairs))
+
+    rows = set(range(len(pairs)))
+    for tf_name in TFS:
+        _, ok = stack_frames([f[tf_name] if f else None for f in loaded], MAX_CANDLES)
+        rows &= set(ok)
+    batch = sorted(rows)
+
+    candidates = [p for i, p in enumerate(pairs) if i not in rows]
+    if batch:
+        ohlc = {
+            tf_name: stack_frames([loaded[i][tf_name] for i in batch], MAX_CANDLES)[0]
+            for tf_name in TFS
+        }
+        scores = await run_cpu(score_batch, [pairs[i] for i in batch], ohlc)
+        candidates += [p for p, r in scores.items() if r["prob"] >= PREFILTER_MIN_PROB]
+
+    SCAN_STATS["prefilter"] = {
+        "pairs": len(pairs),
+        "batched": len(batch),
+        "candidates": len(candidates),
+        "sec": round(time.perf_counter() - t0, 3),
+    }
+    return [p for p in pairs if p in candidates]
+
+
+async def scan_pairs(bot: Bot, pairs: list[str], closed_at: dict[str, float] | None = None) -> float:
+    """
+    Один свип: пары анализируются параллельно, не больше AUTO_SCAN_CONCURRENCY
+    одновременно. Частоту запросов к источникам ограничивает token bucket
+    общего HTTP-клиента (RATE_LIMITS). При AUTO_SCAN_PREFILTER полный анализ
+    получают только кандидаты пакетной оценки. Возвращает длительность свипа, сек.
+    """
+    closed_at = closed_at or {}
+    t0 = time.perf_counter()
+    if AUTO_SCAN_PREFILTER and len(pairs) > 1:
+        total = len(pairs)
+        pairs = await prefilter_pairs(pairs)
+        print(f"🧮 Пакетная оценка: {total} пар → {len(pairs)} кандидатов")
+    await asyncio.gather(*(_scan_pair(bot, p, closed_at.get(p)) for p in pairs))
+    elapsed = time.perf_counter() - t0
+
+    SCAN_STATS["sweeps"] += 1
+    SCAN_STATS["last_sweep_sec"] = round(elapsed, 3)
+
+    lat = {p: SCAN_STATS["pair_latency"].get(p, 0.0) for p in pairs}
+    if lat:
+        slow = max(lat, key=lat.get)
+        avg = sum(lat.values()) / len(lat)
+        print(
+            f"⏱ Свип: {len(pairs)} пар за {elapsed:.1f} сек "
+            f"(в среднем {avg:.2f} сек, дольше всех {slow}: {lat[slow]:.2f} сек)"
+        )
+    return elapsed
 
 
 async def autoscan_loop(bot: Bot):
-    global AUTO_SCAN_ENABLED
+    """
+    Автосканер по событиям закрытия M1-бара (bot/bar_events.py):
+    пара пересчитывается только когда по ней закрылась новая свеча —
+    OTC по "bar_close" от tick-сервера, TradingView по границе минуты.
+    """
     print("🔁 Авто-сканер загружен. Ожидает активации /autoscan_on")
 
+    start_bar_events(PAIRS)
+    queue = BAR_EVENTS.subscribe()
+    last_bar: dict[str, int] = {}
+    tasks: set[asyncio.Task] = set()
+
     while True:
-        if AUTO_SCAN_ENABLED:
-            print("▶️ Сканирую пары...")
-            for pair in PAIRS:
-                try:
-                    res, err = await analyze_pair_for_user(SIGNAL_CHAT_ID, pair)
-                    if err:
-                        print(f"[{pair}] Ошибка TV:", err)
-                        await asyncio.sleep(AUTO_SCAN_DELAY)
-                        continue
-                    if res and res["dir"] in ("BUY", "SELL") and res["prob"] >= 70:
-                        msg = (
-                            f"📡 *Авто-сигнал*\n"
-                            f"Пара: {pair}\n"
-                            f"Направление: *{res['dir']}*\n"
-                            f"Вероятность: *{res['prob']}%*\n"
-                            f"Цена входа: {res['entry_price']}"
-                        )
-                        await bot.send_message(SIGNAL_CHAT_ID, msg, parse_mode="Markdown")
-                except Exception as e:
-                    print("❌ AUTOSCAN ERROR:", e)
-                await asyncio.sleep(AUTO_SCAN_DELAY)
-            print(f"⏳ Цикл завершён. Пауза {AUTO_SCAN_CYCLE} сек.")
-            await asyncio.sleep(AUTO_SCAN_CYCLE)
-        else:
-            await asyncio.sleep(1)
+        events = [await queue.get()]
+        await asyncio.sleep(AUTO_SCAN_DEBOUNCE)
+        while not queue.empty():
+            events.append(queue.get_nowait())
+
+        if not AUTO_SCAN_ENABLED:
+            continue
+
+        closed_at: dict[str, float] = {}
+        for ev in events:
+            pair = ev["pair"]
+            if pair not in PAIRS or last_bar.get(pair, -1) >= ev["time"]:
+                continue  # этот бар уже анализировали
+            last_bar[pair] = ev["time"]
+            closed_at[pair] = ev["closed_at"]
+
+        if closed_at:
+            # не ждём свип: следующая пачка событий (другой источник) идёт параллельно
+            task = asyncio.create_task(scan_pairs(bot, list(closed_at), closed_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
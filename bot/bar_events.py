@@ -0,0 +1,111 @@
+# bot/bar_events.py
+# ==========================================
+# События закрытия M1-бара для автосканера
+# ==========================================
+#
+# Источники:
+# - OTC-пары: "bar_close" от CandleBuilder в po_tick_server (WebSocket :9002/ws,
+#   общее соединение bot/pocket_po_feed.py);
+# - пары TradingView: планировщик по границе M1-бара (свеча закрыта по часам).
+
+import asyncio
+import time
+from typing import Dict, List
+
+from .config import TV_BAR_CLOSE_DELAY
+from .analyzer import is_otc_pair, map_pair_to_po_symbol
+from .pocket_po_feed import add_listener, ensure_po_price_feed, po_feed_connected
+
+BAR_SEC = 60
+
+
+class BarCloseBus:
+    """
+    Простая pub/sub шина внутри event loop бота.
+    Событие: {"pair", "tf", "time" (open закрытого бара), "source", "closed_at"}
+    (+ "candle" с OHLC, если источник её прислал).
+    """
+
+    def __init__(self):
+        self._subs: List[asyncio.Queue] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        self._subs.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        if q in self._subs:
+            self._subs.remove(q)
+
+    def publish(self, event: dict):
+        for q in self._subs:
+            q.put_nowait(event)
+
+
+BAR_EVENTS = BarCloseBus()
+
+_TASKS: List[asyncio.Task] = []
+
+
+async def tv_bar_scheduler(pairs: List[str]):
+    """
+    Каждую границу M1 (+TV_BAR_CLOSE_DELAY, чтобы TradingView дописал свечу)
+    публикует закрытие бара для всех пар TradingView.
+    Пока нет WebSocket tick-сервера — и для OTC-пар тоже (fallback).
+    """
+    while True:
+        now = time.time()
+        await asyncio.sleep(BAR_SEC - now % BAR_SEC + TV_BAR_CLOSE_DELAY)
+
+        bar_open = int(time.time()) // BAR_SEC * BAR_SEC - BAR_SEC
+        closed_at = bar_open + BAR_SEC
+        po_live = po_feed_connected()
+        for pair in pairs:
+            if is_otc_pair(pair) and po_live:
+                continue
+            BAR_EVENTS.publish({
+                "pair": pair,
+                "tf": "M1",
+                "time": bar_open,
+                "source": "po" if is_otc_pair(pair) else "tv",
+                "closed_at": closed_at,
+            })
+
+
+def po_bar_close_listener(pairs: List[str]):
+    """
+    Слушатель "bar_close" из WebSocket-фида tick-сервера (bot/pocket_po_feed.py):
+    закрытие M1 → событие для OTC-пары. Соединение и переподключение — в фиде.
+    """
+    by_symbol: Dict[str, str] = {
+        map_pair_to_po_symbol(p): p for p in pairs if is_otc_pair(p)
+    }
+
+    def on_bar_close(data: dict):
+        if data.get("tf") != "M1":
+            return
+        pair = by_symbol.get(data.get("symbol"))
+        if not pair:
+            return
+        event = {
+            "pair": pair,
+            "tf": "M1",
+            "time": int(data["time"]),
+            "source": "po",
+            "closed_at": int(data["time"]) + BAR_SEC,
+            "candle": {k: data.get(k) for k in ("open", "high", "low", "close")},
+        }
+        BAR_EVENTS.publish(event)
+
+    return on_bar_close
+
+
+def start_bar_events(pairs: List[str]):
+    """Запустить планировщик TV и слушатель PO (один раз на процесс)."""
+    if _TASKS:
+        return
+    _TASKS.append(asyncio.create_task(tv_bar_scheduler(pairs)))
+    if any(is_otc_pair(p) for p in pairs):
+        add_listener("bar_close", po_bar_close_listener(pairs))
+        _TASKS.append(ensure_po_price_feed())
@@ -0,0 +1,320 @@
+# bot/batch_scoring.py
+# ==========================================
+# Пакетная оценка: все пары одного TF одним проходом по матрицам
+# ==========================================
+#
+# Вход на TF — матрицы (пары × бары) OHLC. EMA / RSI / MACD / ATR / impulse —
+# indicators.indicator_arrays сразу по всем строкам (столбцы одного DataFrame).
+# Голоса, уровни, SMC и фильтры M1 — те же формулы, что в scoring._score_tf,
+# по столбцам матриц.
+# Результат по паре совпадает со score_on_arrays на тех же барах.
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .indicators import IndicatorArrays, indicator_arrays
+from .scoring import calc_overall_probability, overall_direction
+
+OHLC = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+MIN_BARS = 60           # как в score_on_tf: меньше — TF не оценивается
+SWING_LOOKBACK = 3
+LEVEL_LOOKBACK = 40     # get_swing_levels(df, lookback=40) для M1
+
+
+def stack_frames(frames: Sequence[Optional[pd.DataFrame]], n_bars: int) -> Tuple[Optional[OHLC], List[int]]:
+    """
+    Последние n_bars баров каждого df → матрицы (пары × n_bars) OHLC.
+    В пакет попадают только df с полной историей и без NaN; возвращает
+    (матрицы или None, индексы попавших df).
+    """
+    rows: List[int] = []
+    cols: List[np.ndarray] = []
+    for i, df in enumerate(frames):
+        if df is None or len(df) < n_bars:
+            continue
+        if "datetime" in df.columns and not df["datetime"].is_monotonic_increasing:
+            df = df.sort_values("datetime")
+        arr = df[["open", "high", "low", "close"]].to_numpy(dtype="float64")[-n_bars:]
+        if np.isnan(arr).any():
+            continue
+        rows.append(i)
+        cols.append(arr)
+
+    if not rows:
+        return None, rows
+    block = np.stack(cols)  # (пары, бары, 4)
+    return tuple(np.ascontiguousarray(block[:, :, k]) for k in range(4)), rows
+
+
+def indicator_matrix(c: np.ndarray, h: np.ndarray, l: np.ndarray) -> IndicatorArrays:
+    """
+    indicator_arrays для матриц (пары × бары): тот же расчёт (pandas ewm / rolling
+    по столбцам одним вызовом), поля IndicatorArrays — матрицы той же формы.
+    """
+    return indicator_arrays(c, h, l)
+
+
+def _split(ind: IndicatorArrays, rows: slice) -> IndicatorArrays:
+    return IndicatorArrays(*(getattr(ind, f)[rows] for f in IndicatorArrays.__dataclass_fields__))
+
+
+def _last_true(mask: np.ndarray) -> np.ndarray:
+    """Индекс последнего True в каждой строке, -1 если нет."""
+    pos = np.where(mask, np.arange(mask.shape[1]), -1)
+    return pos.max(axis=1)
+
+
+def _pick(mat: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """mat[r, idx[r]] по строкам; для idx = -1 — NaN."""
+    vals = np.take_along_axis(mat, np.maximum(idx, 0)[:, None], axis=1)[:, 0]
+    return np.where(idx >= 0, vals, np.nan)
+
+
+def _swing_masks(h: np.ndarray, l: np.ndarray, k: int = SWING_LOOKBACK):
+    """smc.swing_points по строкам: маски swing high / swing low."""
+    p = h.shape[0]
+    pad_lo = np.full((p, k), -np.inf)
+    pad_hi = np.full((p, k), np.inf)
+    win = 2 * k + 1
+    roll_max = np.fmax.reduce(sliding_window_view(np.hstack([pad_lo, h, pad_lo]), win, axis=1), axis=2)
+    roll_min = np.fmin.reduce(sliding_window_view(np.hstack([pad_hi, l, pad_hi]), win, axis=1), axis=2)
+    return h == roll_max, l == roll_min
+
+
+def _local_extrema(m: np.ndarray):
+    lo = np.zeros(m.shape, dtype=bool)
+    hi = np.zeros(m.shape, dtype=bool)
+    lo[:, 1:-1] = (m[:, 1:-1] < m[:, :-2]) & (m[:, 1:-1] < m[:, 2:])
+    hi[:, 1:-1] = (m[:, 1:-1] > m[:, :-2]) & (m[:, 1:-1] > m[:, 2:])
+    return lo, hi
+
+
+def _in_range(mask: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    sub = np.zeros(mask.shape, dtype=bool)
+    sub[:, lo: hi + 1] = mask[:, lo: hi + 1]
+    return sub
+
+
+def score_matrix(
+    o: np.ndarray,
+    h: np.ndarray,
+    l: np.ndarray,
+    c: np.ndarray,
+    tf_name: str,
+    ind: Optional[IndicatorArrays] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    score_on_arrays для всех строк матриц разом.
+    Возвращает столбцы результата: {"direction", "score", "ema20", "near_support", ...}.
+    """
+    p, n = c.shape
+    if n < MIN_BARS:
+        raise ValueError(f"нужно минимум {MIN_BARS} баров, есть {n}")
+
+    if ind is None:
+        ind = indicator_matrix(c, h, l)
+    k = SWING_LOOKBACK
+    price = c[:, -1]
+
+    # --- EMA / MACD / RSI / ATR / impulse ---
+    ema20, ema12, ema26 = ind.ema20[:, -1], ind.ema12[:, -1], ind.ema26[:, -1]
+    trend_up = (ema12 > ema26) & (price > ema20)
+    trend_down = (ema12 < ema26) & (price < ema20)
+    ema_vote = np.where(trend_up, 1, np.where(trend_down, -1, 0))
+
+    hist = ind.macd_hist
+    macd_diff = ind.macd[:, -1] - ind.macd_sig[:, -1]
+    macd_vote = np.where(np.abs(macd_diff) < np.abs(hist[:, -1]) * 0.3, 0, np.where(macd_diff > 0, 1, -1))
+
+    min_local, max_local = _local_extrema(hist)
+    last_lo = _last_true(min_local)
+    prev_lo = _last_true(min_local & (np.arange(n) < last_lo[:, None]))
+    last_hi = _last_true(max_local)
+    prev_hi = _last_true(max_local & (np.arange(n) < last_hi[:, None]))
+    div_buy = (prev_lo >= 0) & (_pick(hist, last_lo) > _pick(hist, prev_lo)) & (l[:, -1] < l[:, -2])
+    div_sell = (prev_hi >= 0) & (_pick(hist, last_hi) < _pick(hist, prev_hi)) & (h[:, -1] > h[:, -2])
+
+    rsi, rsi_prev = ind.rsi[:, -1], ind.rsi[:, -2]
+    rsi_buy = (rsi > 55) & (rsi > rsi_prev) & trend_up
+    rsi_sell = ~rsi_buy & (rsi < 40) & (rsi < rsi_prev) & trend_down
+    rsi_vote = np.where(rsi_buy, 1, np.where(rsi_sell, -1, 0))
+
+    atr_last = ind.atr[:, -1]
+    impulse = np.nan_to_num(ind.impulse[:, -1], nan=0.0, posinf=np.inf, neginf=-np.inf)
+    impulse_vote = np.select(
+        [impulse > 0.7, impulse < -0.7, impulse > 0.4, impulse < -0.4],
+        [1.0, -1.0, 0.5, -0.5],
+        0.0,
+    )
+
+    # --- Развороты (detect_reversal) ---
+    sh_mask, sl_mask = _swing_masks(h, l, k)
+    rev_sh = _pick(h, _last_true(_in_range(sh_mask, k + 1, n - 2 * k)))
+    rev_sl = _pick(l, _last_true(_in_range(sl_mask, k + 1, n - 2 * k)))
+    rev_ok = ~np.isnan(rev_sh) & ~np.isnan(rev_sl)
+    rev_up = rev_ok & (price > rev_sh)
+    rev_down = rev_ok & (price < rev_sl)
+    rev_strength = np.where(
+        rev_down, (rev_sl - price) / rev_sl, np.where(rev_up, (price - rev_sh) / rev_sh, 0.0)
+    )
+    both = rev_up & rev_down
+    keep_up = np.abs(price - rev_sh) > np.abs(price - rev_sl)
+    rev_up = rev_up & ~(both & ~keep_up)
+    rev_down = rev_down & ~(both & keep_up)
+    rev_vote = np.where(rev_up, 1.0, np.where(rev_down, -1.0, 0.0))
+    rev_weight_factor = np.minimum(1.0 + rev_strength * 10.0, 2.0)
+
+    # --- Свечной паттерн (последние два бара) ---
+    lo_, lh, ll, lc = o[:, -1], h[:, -1], l[:, -1], c[:, -1]
+    po, pc = o[:, -2], c[:, -2]
+    bull = (lc > lo_) & (lo_ < pc) & (lc > po)
+    bear = ~bull & (lc < lo_) & (lo_ > pc) & (lc < po)
+    body = np.abs(lc - lo_)
+    hammer = ~bull & ~bear & ((np.minimum(lo_, lc) - ll) > body * 2) & ((lh - np.maximum(lo_, lc)) < body * 0.5)
+    pattern = np.where(bull, "BULLISH_ENGULF", np.where(bear, "BEARISH_ENGULF", np.where(hammer, "HAMMER", "")))
+    pat_vote = np.where(bull | hammer, 1.0, np.where(bear, -1.0, 0.0))
+
+    # --- Сумма голосов, как в _score_tf ---
+    total = np.zeros(p)
+    total = total + ema_vote * 1.0
+    total = total + macd_vote * 1.8
+    total = total + rsi_vote * 2.0
+    total = total + impulse_vote * 1.5
+    total = np.where(rev_vote != 0, total + rev_vote * 2.3 * rev_weight_factor, total)
+    total = np.where(div_buy, total + 0.8, np.where(div_sell, total - 0.8, total))
+    total = total + pat_vote * 0.7
+
+    direction = np.where(total > 0.5, "BUY", np.where(total < -0.5, "SELL", "NONE")).astype(object)
+
+    near_support = np.zeros(p, dtype=bool)
+    near_resistance = np.zeros(p, dtype=bool)
+    smc_high = np.full(p, np.nan)
+    smc_low = np.full(p, np.nan)
+    rejection_up = np.zeros(p, dtype=bool)
+    rejection_down = np.zeros(p, dtype=bool)
+
+    if tf_name == "M1":
+        # уровни (get_swing_levels, lookback=40)
+        lo_ext, hi_ext = _local_extrema(l)[0], _local_extrema(h)[1]
+        start, stop = max(n - LEVEL_LOOKBACK + 1, 1), n - 1
+        if n >= LEVEL_LOOKBACK + 5:
+            lows_in = lo_ext[:, start:stop]
+            highs_in = hi_ext[:, start:stop]
+            support = np.where(lows_in.any(axis=1), np.where(lows_in, l[:, start:stop], np.inf).min(axis=1), np.nan)
+            resistance = np.where(highs_in.any(axis=1), np.where(highs_in, h[:, start:stop], -np.inf).max(axis=1), np.nan)
+        else:
+            support = resistance = np.full(p, np.nan)
+        level_eps = np.where(atr_last > 0, atr_last * 1.2, price * 0.0005)
+        near_support = (price >= support) & ((price - support) <= level_eps)
+        near_resistance = (price <= resistance) & ((resistance - price) <= level_eps)
+
+        # SMC (detect_smc_levels)
+        smc_high = _pick(h, _last_true(_in_range(sh_mask, k + 1, n - 6)))
+        smc_low = _pick(l, _last_true(_in_range(sl_mask, k + 1, n - 6)))
+        smc_ok = ~np.isnan(smc_high) & ~np.isnan(smc_low)
+        smc_high = np.where(smc_ok, smc_high, np.nan)
+        smc_low = np.where(smc_ok, smc_low, np.nan)
+        tolerance = (lh - ll) * 0.5
+        rejection_down = smc_ok & (lh >= smc_high - tolerance) & (price < smc_high)
+        rejection_up = smc_ok & (ll <= smc_low + tolerance) & (price > smc_low)
+
+        # фильтры M1
+        cut = (direction == "BUY") & near_resistance
+        direction = np.where(cut, "NONE", direction)
+        total = np.where(cut, total - 3, total)
+        cut = (direction == "SELL") & near_support
+        direction = np.where(cut, "NONE", direction)
+        total = np.where(cut, total + 3, total)
+
+        cut = (direction == "BUY") & smc_ok & (smc_high != 0) & (price >= smc_high * 0.998)
+        direction = np.where(cut, "NONE", direction)
+        total = np.where(cut, total - 2, total)
+        cut = (direction == "SELL") & smc_ok & (smc_low != 0) & (price <= smc_low * 1.002)
+        direction = np.where(cut, "NONE", direction)
+        total = np.where(cut, total + 2, total)
+
+        direction = np.where(rejection_down, "SELL", direction)
+        total = np.where(rejection_down, total - 3, total)
+        direction = np.where(rejection_up, "BUY", direction)
+        total = np.where(rejection_up, total + 3, total)
+
+        direction = np.where((near_resistance | near_support) & (np.abs(total) < 2), "NONE", direction)
+
+    return {
+        "direction": direction,
+        "score": total,
+        "ema20": ema20,
+        "rsi": rsi,
+        "impulse": impulse,
+        "pattern": pattern,
+        "reversal_up": rev_up,
+        "reversal_down": rev_down,
+        "div_buy": div_buy,
+        "div_sell": div_sell,
+        "near_support": near_support,
+        "near_resistance": near_resistance,
+        "swing_high": smc_high,
+        "swing_low": smc_low,
+        "rejection_up": rejection_up,
+        "rejection_down": rejection_down,
+    }
+
+
+def _row(cols: Dict[str, np.ndarray], i: int, tf_name: str) -> dict:
+    """Строка score_matrix → dict с полями, которые читает calc_overall_probability."""
+    sh, sl = cols["swing_high"][i], cols["swing_low"][i]
+    return {
+        "tf": tf_name,
+        "direction": str(cols["direction"][i]),
+        "score": round(float(cols["score"][i]), 4),
+        "ema20": float(cols["ema20"][i]),
+        "reversal_up": bool(cols["reversal_up"][i]),
+        "reversal_down": bool(cols["reversal_down"][i]),
+        "near_support": bool(cols["near_support"][i]),
+        "near_resistance": bool(cols["near_resistance"][i]),
+        "swing_high": None if np.isnan(sh) else float(sh),
+        "swing_low": None if np.isnan(sl) else float(sl),
+        "rejection_up": bool(cols["rejection_up"][i]),
+        "rejection_down": bool(cols["rejection_down"][i]),
+    }
+
+
+def score_batch(pairs: Sequence[str], ohlc_by_tf: Dict[str, OHLC]) -> Dict[str, dict]:
+    """
+    Оценка всех пар разом. ohlc_by_tf: {"M1": (O, H, L, C), ...}, матрицы
+    (len(pairs) × бары), строки в порядке pairs.
+
+    Возвращает {pair: {"dir", "score", "prob", "tf_results"}}:
+    dir — scoring.overall_direction (как в analyze_pair_for_user),
+    score — счёт M1, prob — calc_overall_probability.
+    """
+    # TF с одинаковой длиной истории идут через рекурсию индикаторов одним блоком
+    by_len: Dict[int, List[str]] = {}
+    for tf, m in ohlc_by_tf.items():
+        by_len.setdefault(m[3].shape[1], []).append(tf)
+
+    cols: Dict[str, Dict[str, np.ndarray]] = {}
+    for tfs in by_len.values():
+        block = [np.vstack([ohlc_by_tf[tf][k] for tf in tfs]) for k in range(4)]
+        ind = indicator_matrix(block[3], block[1], block[2])
+        p = len(pairs)
+        for j, tf in enumerate(tfs):
+            rows = slice(j * p, (j + 1) * p)
+            cols[tf] = score_matrix(*ohlc_by_tf[tf], tf, ind=_split(ind, rows))
+    cols = {tf: cols[tf] for tf in ohlc_by_tf}
+
+    out: Dict[str, dict] = {}
+    for i, pair in enumerate(pairs):
+        tf_results = [_row(c, i, tf) for tf, c in cols.items()]
+        m1 = next((r for r in tf_results if r["tf"] == "M1"), None)
+        out[pair] = {
+            "dir": overall_direction(tf_results),
+            "score": m1["score"] if m1 else 0.0,
+            "prob": calc_overall_probability(tf_results),
+            "tf_results": tf_results,
+        }
+    return out
@@ -0,0 +1,172 @@
+# bot/bench.py
+# ==========================================
+# Бенчмарк расчёта индикаторов на TF
+# ==========================================
+#
+# Запуск:  python -m bot.bench [--bars 120 500 2000] [--repeat 200]
+#          python -m bot.bench --check 2000   # = python -m bot.selfcheck --only scoring --count 2000
+#
+# Сравнивает прежний путь (compute_indicators на pandas → copy/sort в score_on_tf
+# → compute_macd с повторным расчётом EMA и 8 новыми колонками → rolling ATR)
+# со слитным compute_indicator_arrays, и оценку TF: score_on_tf (эталон на df)
+# против score_on_arrays, и свип рынка: score_on_arrays по каждой паре и TF
+# против одного пакетного batch_scoring.score_batch. Данные синтетические, сеть не нужна.
+
+import argparse
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .config import MAX_CANDLES
+from .indicators import (
+    ATR_K,
+    EMA_PERIOD,
+    RSI_PERIOD,
+    compute_indicator_arrays,
+    compute_indicators,
+    compute_macd,
+    compute_rsi,
+)
+from .batch_scoring import score_batch, stack_frames
+from .scoring import score_on_arrays, score_on_tf
+
+
+def make_frame(n: int, seed: int = 0, mode: int = 0) -> pd.DataFrame:
+    """
+    Случайное блуждание OHLC. mode: 0 — обычное, 1 — цены округлены (много равных
+    экстремумов), 2 — три уровня цены без теней, 3 — крупный масштаб с волной,
+    4 — тени с тяжёлым хвостом (размеры на порядки разные: проверка сумм окна).
+    """
+    rng = np.random.default_rng(seed)
+    if mode == 1:
+        close = 1.1 + np.round(np.cumsum(rng.normal(0, 1e-4, n)), 4)
+    elif mode == 2:
+        close = 1.1 + rng.integers(0, 3, n) * 1e-4
+    elif mode == 3:
+        close = 100 + np.cumsum(rng.normal(0, 0.3, n)) + np.sin(np.arange(n) / 5)
+    else:
+        close = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    open_ = np.r_[close[0], close[:-1]]
+    if mode == 4:
+        wick = np.abs(rng.standard_cauchy(n)) * 10 ** rng.uniform(-2, 4, n)
+    else:
+        wick = 0.0 if mode == 2 else 1.0
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 5e-5, n)) * wick
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 5e-5, n)) * wick
+    t = 1_700_000_000 + 60 * np.arange(n)
+    return pd.DataFrame({
+        "time": t,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "datetime": pd.to_datetime(t, unit="s"),
+    })
+
+
+def legacy_pass(df: pd.DataFrame) -> pd.DataFrame:
+    """Индикаторная часть анализа TF в том виде, как она была до слитного расчёта."""
+    df = df.copy()
+    df["EMA20"] = df["close"].ewm(span=EMA_PERIOD, adjust=False).mean()
+    df["EMA12"] = df["close"].ewm(span=12, adjust=False).mean()
+    df["EMA26"] = df["close"].ewm(span=26, adjust=False).mean()
+    df["MACD"] = df["EMA12"] - df["EMA26"]
+    df["MACD_sig"] = df["MACD"].ewm(span=9, adjust=False).mean()
+    df["RSI"] = compute_rsi(df["close"], RSI_PERIOD)
+
+    df = df.copy()
+    df = df.sort_values("datetime")
+    compute_macd(df)
+    df["range"] = df["high"] - df["low"]
+    df["ATR"] = df["range"].rolling(14).mean()
+    df["impulse"] = (df["close"] - df["close"].shift(3)) / (df["ATR"] * ATR_K)
+    return df
+
+
+def fused_pass(df: pd.DataFrame):
+    return compute_indicator_arrays(df)
+
+
+def _ohlc(df: pd.DataFrame):
+    return tuple(df[k].to_numpy(dtype="float64") for k in ("open", "high", "low", "close"))
+
+
+def score_df(df: pd.DataFrame):
+    return score_on_tf(compute_indicators(df), "M1")
+
+
+def score_arrays(df: pd.DataFrame):
+    return score_on_arrays(*_ohlc(df), "M1")
+
+
+def _peak_alloc(fn, df) -> int:
+    fn(df)  # прогрев кэшей pandas
+    tracemalloc.start()
+    fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _time_ms(fn, df, repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(df), number=repeat, repeat=3)) / repeat * 1e3
+
+
+def run(bars, repeat: int):
+    print(f"{'bars':>6} | {'legacy ms':>9} {'fused ms':>9} {'x':>6} | {'legacy KB':>9} {'fused KB':>9}")
+    for n in bars:
+        df = make_frame(n)
+        t_old = _time_ms(legacy_pass, df, repeat)
+        t_new = _time_ms(fused_pass, df, repeat)
+        m_old = _peak_alloc(legacy_pass, df) / 1024
+        m_new = _peak_alloc(fused_pass, df) / 1024
+        print(
+            f"{n:>6} | {t_old:>9.3f} {t_new:>9.3f} {t_old / t_new:>5.1f}x | "
+            f"{m_old:>9.1f} {m_new:>9.1f}"
+        )
+
+    print()
+    print(f"{'bars':>6} | {'score_on_tf ms':>14} {'arrays ms':>9} {'x':>6}")
+    for n in bars:
+        df = make_frame(n)
+        t_df = _time_ms(score_df, df, repeat)
+        t_arr = _time_ms(score_arrays, df, repeat)
+        print(f"{n:>6} | {t_df:>14.3f} {t_arr:>9.3f} {t_df / t_arr:>5.1f}x")
+
+    print()
+    print(f"{'pairs':>6} | {'per-pair ms':>11} {'batch ms':>9} {'x':>6}   ({MAX_CANDLES} баров × 3 TF)")
+    for p in (6, 24, 96):
+        frames = [make_frame(MAX_CANDLES, seed=j) for j in range(p)]
+        arrays = [_ohlc(df) for df in frames]
+        ohlc, _ = stack_frames(frames, MAX_CANDLES)
+        pairs = [f"P{j}" for j in range(p)]
+        tfs = {"M1": ohlc, "M5": ohlc, "M15": ohlc}
+
+        def per_pair():
+            for a in arrays:
+                for tf in tfs:
+                    score_on_arrays(*a, tf)
+
+        t_one = min(timeit.repeat(per_pair, number=3, repeat=3)) / 3 * 1e3
+        t_batch = min(timeit.repeat(lambda: score_batch(pairs, tfs), number=3, repeat=3)) / 3 * 1e3
+        print(f"{p:>6} | {t_one:>11.1f} {t_batch:>9.1f} {t_one / t_batch:>5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индикаторов на один TF")
+    parser.add_argument("--bars", type=int, nargs="+", default=[MAX_CANDLES, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--check", type=int, metavar="N", help="только сверка на N случайных наборах")
+    args = parser.parse_args()
+    if args.check:
+        from .selfcheck import check_scoring  # selfcheck сам импортирует bench
+
+        sys.exit(1 if check_scoring(args.check) else 0)
+    run(args.bars, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,26 @@
 import asyncio
 import threading
-import time
 import uvicorn
 import html as hd
 from datetime import datetime, timezone
 from typing import Dict, Any
+from . import autoscan
 from .autoscan import autoscan_loop
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo, CallbackQuery
+from aiogram.types import BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo, CallbackQuery
 from aiogram.exceptions import TelegramBadRequest
 
 from .config import BOT_TOKEN, PAIRS, API_URL
 from .analyzer import analyze_pair_for_user
-from .logger import stats_last_24h, build_pie, evaluate_pending_signals
+from .logger import SIGNAL_LOG, stats_last_24h, build_pie, evaluate_pending_signals, rebuild_stats_index
 
 from fastapi import FastAPI
 from bot.api.server import app as fastapi_app
-from bot.pocket_po_feed import start_po_price_feed
+from bot.pocket_po_feed import ensure_po_price_feed
+from bot.http_client import HTTP
+from bot.executor import EXECUTORS, run_cpu, run_io
 
 
 
@@ -128,8 +130,7 @@ def panel_text_analysis(
 
 
 
-def panel_text_stats() -> str:
-    s = stats_last_24h()
+def panel_text_stats(s: dict) -> str:
     return (
         f"{panel_text_header()}\n\n"
         f"📈 *Статистика за 24 часа*\n"
@@ -142,31 +143,30 @@ def panel_text_stats() -> str:
 
 # ================== BACKGROUND: авто-оценка сигналов ==================
 
-def background_evaluation() -> None:
+async def background_evaluation() -> None:
     """
     Фоновая проверка signals.csv каждые 6 минуты.
-    Запускается отдельным потоком при старте.
+    Задача event loop; сама оценка (CSV + запросы свечей) идёт в пуле I/O.
     """
     while True:
         try:
-            evaluate_pending_signals()
+            await run_io(evaluate_pending_signals)
         except Exception as e:
             print("background_evaluation error:", e)
-        time.sleep(500)
+        await asyncio.sleep(500)
 
 
 # ================== HANDLERS ==================
 
 @dp.message(Command("autoscan_on"))
 async def autoscan_on(msg: types.Message):
-    global AUTO_SCAN_ENABLED
-    AUTO_SCAN_ENABLED = True
+    # флаг живёт в модуле autoscan — его читает autoscan_loop
+    autoscan.AUTO_SCAN_ENABLED = True
     await msg.answer("🚀 Авто-сканер включён.")
     
 @dp.message(Command("autoscan_off"))
 async def autoscan_off(msg: types.Message):
-    global AUTO_SCAN_ENABLED
-    AUTO_SCAN_ENABLED = False
+    autoscan.AUTO_SCAN_ENABLED = False
     await msg.answer("⏹ Авто-сканер выключён.")
 
 @dp.message(Command("start"))
@@ -296,13 +296,15 @@ async def on_refresh(cb: CallbackQuery) -> None:
 @dp.callback_query(lambda c: c.data == "ACT|STATS")
 async def on_stats(cb: CallbackQuery) -> None:
     # простая текстовая статистика + при возможности — картинка-пирог
-    text = panel_text_stats()
-
+    # (агрегаты из индекса в памяти, matplotlib — в пуле процессов)
     stats = stats_last_24h()
-    pie_buf = build_pie(stats["wins"], stats["losses"])
+    text = panel_text_stats(stats)
+
+    pie_buf = await run_cpu(build_pie, stats["wins"], stats["losses"])
 
     if pie_buf:
-        await cb.message.answer_photo(pie_buf, caption=text, parse_mode="HTML")
+        photo = BufferedInputFile(pie_buf.getvalue(), filename="stats.png")
+        await cb.message.answer_photo(photo, caption=text, parse_mode="HTML")
     else:
         await cb.message.edit_text(text, reply_markup=kb_main(SESS.get(cb.from_user.id, {}).get("pair")), parse_mode="HTML")
 
@@ -314,13 +316,23 @@ async def on_stats(cb: CallbackQuery) -> None:
 async def main() -> None:
     print("✅ Бот запущен. Отправь /start в Telegram.")
 
+    # агрегаты статистики (/stats, панель) — из хранилища один раз при старте
+    await run_io(rebuild_stats_index)
+    # воркеры пула процессов стартуют сразу, а не на первом анализе
+    asyncio.create_task(EXECUTORS.warm_up())
     # фоновая оценка сигналов
-    threading.Thread(target=background_evaluation, daemon=True).start()
+    asyncio.create_task(background_evaluation())
     # 🔥 вот эта строка запускает autoscan
     asyncio.create_task(autoscan_loop(bot))
-    asyncio.create_task(start_po_price_feed())
+    # живые цены PO: постоянная WebSocket-подписка на tick-сервер
+    ensure_po_price_feed()
 
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        EXECUTORS.shutdown()
+        SIGNAL_LOG.close()
+        HTTP.close()
 
 
 def start_api():
@@ -0,0 +1,116 @@
+# bot/candle_cache.py
+# ==========================================
+# Общий кэш свечей, выровненный по закрытию бара
+# ==========================================
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from .config import CANDLE_CACHE_MAX_MB
+
+
+class CandleCache:
+    """
+    In-memory кэш серий свечей под get_tv_series / fetch_po_candles.
+
+    Ключ — (source, pair, tf_sec, last_closed_bar): запись живёт ровно до
+    закрытия текущего бара этого TF, после чего ключ меняется и следующий
+    запрос идёт в сеть. Все пользователи Telegram, /analyze, /get_signal и
+    автосканер в пределах одного бара получают одни и те же данные без сети.
+
+    - LRU-вытеснение по суммарному размеру DataFrame (max_bytes);
+    - счётчики hits / misses / evictions;
+    - invalidate(pair) — сброс всех записей пары.
+    Потокобезопасен (aiogram, uvicorn и фоновые потоки).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # key -> (n_bars, df, size, expires_at)
+        self._data: "OrderedDict[Tuple, Tuple[int, pd.DataFrame, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(source: str, pair: str, tf_sec: int, now: float) -> Tuple[Tuple, float]:
+        bar_open = int(now) - int(now) % tf_sec
+        last_closed = bar_open - tf_sec
+        return (source, pair, tf_sec, last_closed), bar_open + tf_sec
+
+    def get(self, source: str, pair: str, tf_sec: int, n_bars: int) -> Optional[pd.DataFrame]:
+        """Серия из кэша (tail(n_bars)) или None, если бар закрылся / баров мало."""
+        now = time.time()
+        key, _ = self._key(source, pair, tf_sec, now)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < n_bars or now >= entry[3]:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1].tail(n_bars)
+
+    def put(self, source: str, pair: str, tf_sec: int, n_bars: int, df: pd.DataFrame):
+        now = time.time()
+        key, expires_at = self._key(source, pair, tf_sec, now)
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._purge_expired(now)
+
+            self._data[key] = (n_bars, df, size, expires_at)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and self._data:
+                _, (_, _, old_size, _) = self._data.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def _purge_expired(self, now: float):
+        for key in [k for k, v in self._data.items() if v[3] <= now]:
+            self._bytes -= self._data.pop(key)[2]
+
+    def invalidate(self, pair: str, source: Optional[str] = None) -> int:
+        """Удалить все записи пары (опционально — только одного источника)."""
+        with self._lock:
+            keys = [
+                k for k in self._data
+                if k[1] == pair and (source is None or k[0] == source)
+            ]
+            for k in keys:
+                self._bytes -= self._data.pop(k)[2]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Единственный кэш на процесс
+CANDLE_CACHE = CandleCache(max_bytes=CANDLE_CACHE_MAX_MB * 1024 * 1024)
@@ -9,12 +9,26 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 TV_USERNAME = os.getenv("TV_USERNAME")
 TV_PASSWORD = os.getenv("TV_PASSWORD")
 PO_ENGINE_HTTP = "http://34.79.192.92:9001"  # свой VPS
+PO_ENGINE_WS = "ws://34.79.192.92:9002/ws"   # события tick-сервера (bar_close, tick)
 SIGNAL_CHAT_ID = int(os.getenv("SIGNAL_CHAT_ID", "0"))
 API_URL = "https://tradebot-production-74c0.up.railway.app/" #"https://philologic-resentfully-kimberlee.ngrok-free.dev" 
 
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
 LOG_FILE = DATA_DIR / "signals.csv"
+# Журнал сигналов (bot/logger.py): дозапись одним потоком-писателем,
+# fsync не чаще раза в SIGNAL_FSYNC_INTERVAL сек или каждые SIGNAL_FSYNC_BATCH строк,
+# по смене суток UTC файл уходит в архив signals-YYYY-MM-DD.csv
+SIGNAL_FSYNC_INTERVAL = 1.0
+SIGNAL_FSYNC_BATCH = 64
+SIGNAL_EVAL_LOOKBACK_H = 24   # сколько часов назад искать неоценённые сигналы
+# Хранилище сигналов: "sqlite" (bot/signal_store.py, WAL + индексы) или "csv"
+SIGNAL_STORE = os.getenv("SIGNAL_STORE", "sqlite")
+SIGNAL_DB = DATA_DIR / "signals.db"
+# Статистика (bot/stats_index.py): агрегаты в памяти по корзинам (пара, час)
+STATS_BUCKET_SEC = 3600
+# История сигналов (/signals): максимум строк на страницу
+SIGNALS_PAGE_MAX = 1000
 
 PAIRS = [
     "EUR/USD","EUR/GBP","EUR/AUD","EUR/JPY","EUR/CHF","EUR/CAD",
@@ -28,9 +42,41 @@ PAIRS = [
 
 TFS = {"M1":"1min","M5":"5min","M15":"15min"}
 MAX_CANDLES = 120
+# M5/M15 собираются из одной M1-серии (po_stream/po_resample.py) —
+# один запрос к источнику на анализ пары вместо трёх
+RESAMPLE_FROM_M1 = True
+# через сколько секунд после границы M1 считать свечу TradingView закрытой
+TV_BAR_CLOSE_DELAY = 1.5
 REQUEST_DELAY = 0.8
 CLEAN_DAYS = 300
 
+# Общий HTTP-клиент (bot/http_client.py): один keep-alive пул на процесс
+HTTP_POOL_SIZE = 32          # всего соединений в пуле
+HTTP_PER_HOST_LIMIT = 6      # одновременных запросов к одному хосту
+HTTP_HOST_LIMITS = {         # переопределения лимита для отдельных хостов
+    "dchart-api.tradingview.com": 4,
+}
+HTTP_KEEPALIVE = 30.0        # сколько секунд держать простаивающее соединение
+HTTP_RETRIES = 2             # повторов при таймауте / 429 / 5xx
+HTTP_RETRY_BACKOFF = 0.3     # базовая пауза между повторами (удваивается)
+TV_TIMEOUT = 7.0
+PO_TIMEOUT = 2.5
+# Token bucket на источник: (запросов в секунду, размер пачки)
+RATE_LIMITS = {
+    "tv": (4.0, 8),
+    "po": (20.0, 40),
+}
+
+# Кэш свечей (bot/candle_cache.py): запись живёт до закрытия бара своего TF
+CANDLE_CACHE_MAX_MB = 64
+# Сколько баров хранить в скользящей истории TradingView на (пару, TF)
+TV_HISTORY_MAX_BARS = 3000
+
+# Исполнители (bot/executor.py): потоки для I/O, процессы для индикаторов / скоринга
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))   # 0 — считать в потоках, без процессов
+CPU_START_METHOD = "forkserver"
+
 TV_MAP = {
     "EUR/USD": ("EURUSD","OANDA"),
     "EUR/GBP": ("EURGBP","OANDA"),
@@ -0,0 +1,161 @@
+# bot/executor.py
+# ==========================================
+# Пулы исполнителей: I/O — потоки, расчёты — процессы
+# ==========================================
+#
+# Тяжёлые этапы не выполняются прямо в event loop:
+# - run_io(fn, ...)  — блокирующий I/O (CSV, синхронный HTTP, оценка сигналов);
+# - run_cpu(fn, ...) — индикаторы / скоринг / matplotlib в отдельных процессах,
+#   без конкуренции за GIL с потоком uvicorn (bot_main.start_api).
+# В процессы передаются только лёгкие для pickle данные: numpy-массивы, числа,
+# строки; fn — функция верхнего уровня модуля.
+#
+# Вызывать можно из любого event loop (aiogram и uvicorn).
+# Воркеры forkserver/spawn импортируют главный модуль как __mp_main__ —
+# запуск в нём должен быть под if __name__ == "__main__" (как в bot_main).
+
+import asyncio
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .config import CPU_START_METHOD, CPU_WORKERS, IO_WORKERS
+
+
+def _noop():
+    return None
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Выполняется в воркере: результат + время работы самого fn."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t0, result
+
+
+class PoolStats:
+    """Счётчики одного пула. Очередь = задач в полёте сверх числа воркеров."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.busy_sec = 0.0    # суммарное время работы fn в воркерах
+        self.wait_sec = 0.0    # суммарное ожидание в очереди (+ передача данных)
+        self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        uptime = max(time.time() - self.started_at, 1e-9)
+        done = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "inflight": self.inflight,
+            "busy": min(self.inflight, self.workers),
+            "queue_depth": max(self.inflight - self.workers, 0),
+            "max_inflight": self.max_inflight,
+            "utilization": round(self.busy_sec / (self.workers * uptime), 4) if self.workers else 0.0,
+            "avg_run_ms": round(self.busy_sec / done * 1e3, 3) if done else 0.0,
+            "avg_wait_ms": round(self.wait_sec / done * 1e3, 3) if done else 0.0,
+        }
+
+
+class Executors:
+    """
+    Пул потоков для I/O и пул процессов для CPU, общие на процесс бота.
+
+    Пул процессов создаётся лениво при первом run_cpu; старт через forkserver
+    (CPU_START_METHOD): fork из процесса с потоками (uvicorn, HTTP-клиент) небезопасен.
+    CPU_WORKERS = 0 — CPU-задачи идут в пул потоков (без отдельных процессов).
+    """
+
+    def __init__(self, io_workers: int = IO_WORKERS, cpu_workers: int = CPU_WORKERS,
+                 start_method: str = CPU_START_METHOD):
+        self._lock = threading.Lock()
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self._cpu: Optional[ProcessPoolExecutor] = None
+        self._cpu_workers = cpu_workers
+        self._start_method = start_method
+        self.io_stats = PoolStats(io_workers)
+        self.cpu_stats = PoolStats(cpu_workers or io_workers)
+
+    def _cpu_pool(self) -> Executor:
+        if not self._cpu_workers:
+            return self._io
+        with self._lock:
+            if self._cpu is None:
+                methods = mp.get_all_start_methods()
+                method = self._start_method if self._start_method in methods else "spawn"
+                self._cpu = ProcessPoolExecutor(
+                    max_workers=self._cpu_workers,
+                    mp_context=mp.get_context(method),
+                )
+            return self._cpu
+
+    async def _run(self, pool: Executor, stats: PoolStats, fn: Callable, args: tuple, kwargs: dict):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stats.submitted += 1
+            stats.inflight += 1
+            stats.max_inflight = max(stats.max_inflight, stats.inflight)
+
+        t0 = time.perf_counter()
+        ok = False
+        run_sec = 0.0
+        try:
+            run_sec, result = await loop.run_in_executor(pool, _timed_call, fn, args, kwargs)
+            ok = True
+            return result
+        finally:
+            wall = time.perf_counter() - t0
+            with self._lock:
+                stats.inflight -= 1
+                if ok:
+                    stats.completed += 1
+                    stats.busy_sec += run_sec
+                    stats.wait_sec += max(wall - run_sec, 0.0)
+                else:
+                    stats.failed += 1
+
+    async def run_io(self, fn: Callable, *args, **kwargs):
+        return await self._run(self._io, self.io_stats, fn, args, kwargs)
+
+    async def run_cpu(self, fn: Callable, *args, **kwargs):
+        return await self._run(self._cpu_pool(), self.cpu_stats, fn, args, kwargs)
+
+    async def warm_up(self):
+        """Поднять воркеры заранее: старт процесса и импорт numpy / pandas — не на первом анализе."""
+        if not self._cpu_workers:
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._cpu_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, _noop) for _ in range(self._cpu_workers)))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {"io": self.io_stats.snapshot(), "cpu": self.cpu_stats.snapshot()}
+
+    def shutdown(self):
+        self._io.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            if self._cpu is not None:
+                self._cpu.shutdown(wait=False, cancel_futures=True)
+                self._cpu = None
+
+
+EXECUTORS = Executors()
+
+
+async def run_io(fn: Callable, *args, **kwargs):
+    return await EXECUTORS.run_io(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs):
+    return await EXECUTORS.run_cpu(fn, *args, **kwargs)
@@ -0,0 +1,203 @@
+# bot/http_client.py
+# ==========================================
+# Общий асинхронный HTTP-клиент (aiohttp)
+# ==========================================
+
+import asyncio
+import threading
+import time
+from typing import Any, Coroutine, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .config import (
+    HTTP_POOL_SIZE,
+    HTTP_PER_HOST_LIMIT,
+    HTTP_HOST_LIMITS,
+    HTTP_KEEPALIVE,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    RATE_LIMITS,
+)
+
+# статусы, при которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket: в среднем rate запросов/сек, пачкой до burst.
+    Живёт в loop клиента, поэтому один на источник для всего процесса.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._ts = time.monotonic()
+        self.waited = 0.0  # суммарное время ожидания токенов, сек
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return
+            delay = (1.0 - self._tokens) / self.rate
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+
+class HttpClient:
+    """
+    Один пул keep-alive соединений на весь процесс.
+
+    Сессия aiohttp живёт в собственном event loop (daemon-поток "http-client"),
+    поэтому её одновременно используют:
+    - aiogram (главный поток, asyncio.run(main())),
+    - FastAPI / uvicorn (поток start_api, свой loop),
+    - фоновые потоки (оценка сигналов) через run_sync().
+
+    Ограничения:
+    - HTTP_POOL_SIZE соединений всего,
+    - HTTP_PER_HOST_LIMIT одновременных запросов на хост (HTTP_HOST_LIMITS — исключения).
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {
+            src: TokenBucket(rate, burst) for src, (rate, burst) in RATE_LIMITS.items()
+        }
+        self._lock = threading.Lock()
+
+    # ---------- event loop клиента ----------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coro: Coroutine):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # вызывается только внутри loop клиента
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                keepalive_timeout=HTTP_KEEPALIVE,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ""
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(HTTP_HOST_LIMITS.get(host, HTTP_PER_HOST_LIMIT))
+            self._host_sems[host] = sem
+        return sem
+
+    # ---------- запросы ----------
+
+    async def _request(
+        self, url: str, params: Optional[dict], timeout: float, retries: int, source: Optional[str],
+        raw: bool = False,
+    ) -> Any:
+        session = await self._get_session()
+        sem = self._host_semaphore(url)
+        bucket = self._buckets.get(source) if source else None
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+        for attempt in range(retries + 1):
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                async with sem:
+                    async with session.get(url, params=params, timeout=client_timeout) as r:
+                        r.raise_for_status()
+                        if raw:
+                            return await r.read(), r.content_type
+                        return await r.json(content_type=None)
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES or attempt == retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(HTTP_RETRY_BACKOFF * (2 ** attempt))
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        timeout: float = 5.0,
+        retries: int = HTTP_RETRIES,
+        source: Optional[str] = None,
+    ) -> Any:
+        """
+        GET → JSON из любого event loop (aiogram / uvicorn).
+        source — ключ RATE_LIMITS ("tv" / "po"): запрос ждёт токен своего источника.
+        Бросает aiohttp.ClientError / asyncio.TimeoutError после исчерпания повторов.
+        """
+        fut = self._submit(self._request(url, params, timeout, retries, source))
+        return await asyncio.wrap_future(fut)
+
+    async def get_bytes(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        timeout: float = 5.0,
+        retries: int = HTTP_RETRIES,
+        source: Optional[str] = None,
+    ) -> Tuple[bytes, str]:
+        """
+        GET → (тело, content-type) без разбора: бинарные форматы (/candles?format=binary).
+        Повторы, лимиты и исключения — как у get_json.
+        """
+        fut = self._submit(self._request(url, params, timeout, retries, source, raw=True))
+        return await asyncio.wrap_future(fut)
+
+    def run_sync(self, coro: Coroutine) -> Any:
+        """
+        Выполнить coroutine в loop клиента и дождаться результата.
+        Для синхронного кода в фоновых потоках (НЕ вызывать из event loop).
+        """
+        return self._submit(coro).result()
+
+    def rate_stats(self) -> Dict[str, float]:
+        """Суммарное ожидание токенов по источникам, сек."""
+        return {src: round(b.waited, 3) for src, b in self._buckets.items()}
+
+    def close(self):
+        """Закрыть сессию и остановить loop клиента."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+
+        async def _close():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+            self._host_sems = {}
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# Единственный клиент на процесс
+HTTP = HttpClient()
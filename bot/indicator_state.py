@@ -0,0 +1,187 @@
+# bot/indicator_state.py
+# ==========================================
+# Потоковые индикаторы: O(1) на новый бар, снимок / восстановление
+# ==========================================
+#
+# Значения совпадают с pandas ewm(adjust=False).mean() из compute_indicators,
+# если подать ту же серию с начала: EMA20 / EMA12 / EMA26 / MACD / MACD_sig / RSI.
+# Сверка: python -m bot.selfcheck --only indicator_state
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicators import EMA_PERIOD, RSI_PERIOD
+
+NAN = float("nan")
+
+
+class EMAState:
+    """
+    EMA как pandas ewm(span=... | com=..., adjust=False).mean():
+    та же формула и та же обработка NaN (ignore_na=False), что в pandas.
+    """
+
+    def __init__(self, span: Optional[float] = None, com: Optional[float] = None):
+        if span is not None:
+            com = (span - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.value = NAN
+        self._old_wt = 1.0
+
+    def update(self, x: float) -> float:
+        w = self.value
+        if w == w:
+            self._old_wt *= 1.0 - self.alpha
+            if x == x:
+                if w != x:
+                    w = (self._old_wt * w + self.alpha * x) / (self._old_wt + self.alpha)
+                self._old_wt = 1.0
+        elif x == x:
+            w = x
+        self.value = w
+        return w
+
+    def snapshot(self) -> dict:
+        return {"alpha": self.alpha, "value": self.value, "old_wt": self._old_wt}
+
+    @classmethod
+    def from_snapshot(cls, snap: dict) -> "EMAState":
+        st = cls(com=1.0 / snap["alpha"] - 1.0)
+        st.alpha = snap["alpha"]
+        st.value = snap["value"]
+        st._old_wt = snap["old_wt"]
+        return st
+
+
+class RSIState:
+    """RSI как compute_rsi: EMA(com=period-1) роста / падения close."""
+
+    def __init__(self, period: int = RSI_PERIOD):
+        self.period = period
+        self.up = EMAState(com=period - 1)
+        self.down = EMAState(com=period - 1)
+        self.prev_close = NAN
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        delta = close - self.prev_close  # первый бар: NaN, как diff()
+        self.prev_close = close
+        ma_up = self.up.update(max(delta, 0.0) if delta == delta else NAN)
+        ma_down = self.down.update(-min(delta, 0.0) if delta == delta else NAN)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.float64(ma_up) / np.float64(ma_down)
+            self.value = float(100 - (100 / (1 + rs)))
+        return self.value
+
+    def snapshot(self) -> dict:
+        return {
+            "period": self.period,
+            "up": self.up.snapshot(),
+            "down": self.down.snapshot(),
+            "prev_close": self.prev_close,
+            "value": self.value,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap: dict) -> "RSIState":
+        st = cls(snap["period"])
+        st.up = EMAState.from_snapshot(snap["up"])
+        st.down = EMAState.from_snapshot(snap["down"])
+        st.prev_close = snap["prev_close"]
+        st.value = snap["value"]
+        return st
+
+
+class MACDState:
+    """MACD как compute_indicators: EMA12 - EMA26, сигнал — EMA9 от MACD."""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMAState(span=fast)
+        self.slow = EMAState(span=slow)
+        self.signal = EMAState(span=signal)
+        self.macd = NAN
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        sig = self.signal.update(self.macd)
+        return self.macd, sig, self.macd - sig
+
+    def snapshot(self) -> dict:
+        return {
+            "fast": self.fast.snapshot(),
+            "slow": self.slow.snapshot(),
+            "signal": self.signal.snapshot(),
+            "macd": self.macd,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap: dict) -> "MACDState":
+        st = cls()
+        st.fast = EMAState.from_snapshot(snap["fast"])
+        st.slow = EMAState.from_snapshot(snap["slow"])
+        st.signal = EMAState.from_snapshot(snap["signal"])
+        st.macd = snap["macd"]
+        return st
+
+
+class IndicatorState:
+    """
+    Набор индикаторов одной серии (symbol, TF), обновляемый по закрытым барам.
+    update() возвращает значения под именами колонок compute_indicators.
+    """
+
+    def __init__(self):
+        self.ema20 = EMAState(span=EMA_PERIOD)
+        self.macd = MACDState()
+        self.rsi = RSIState()
+        self.last_time: Optional[int] = None
+        self.values: Dict[str, float] = {}
+
+    def update(self, ts: int, close: float) -> Dict[str, float]:
+        macd, sig, _ = self.macd.update(close)
+        self.values = {
+            "EMA20": self.ema20.update(close),
+            "EMA12": self.macd.fast.value,
+            "EMA26": self.macd.slow.value,
+            "MACD": macd,
+            "MACD_sig": sig,
+            "RSI": self.rsi.update(close),
+        }
+        self.last_time = int(ts)
+        return self.values
+
+    def update_frame(self, df: pd.DataFrame) -> int:
+        """Прогнать бары df с time > last_time. Возвращает число новых баров."""
+        t = df["time"].to_numpy(dtype="int64")
+        start = 0 if self.last_time is None else int(np.searchsorted(t, self.last_time, side="right"))
+        c = df["close"].to_numpy(dtype="float64")
+        for i in range(start, len(t)):
+            self.update(int(t[i]), float(c[i]))
+        return len(t) - start
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IndicatorState":
+        st = cls()
+        st.update_frame(df)
+        return st
+
+    def snapshot(self) -> dict:
+        return {
+            "ema20": self.ema20.snapshot(),
+            "macd": self.macd.snapshot(),
+            "rsi": self.rsi.snapshot(),
+            "last_time": self.last_time,
+            "values": dict(self.values),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap: dict) -> "IndicatorState":
+        st = cls()
+        st.ema20 = EMAState.from_snapshot(snap["ema20"])
+        st.macd = MACDState.from_snapshot(snap["macd"])
+        st.rsi = RSIState.from_snapshot(snap["rsi"])
+        st.last_time = snap["last_time"]
+        st.values = dict(snap["values"])
+        return st
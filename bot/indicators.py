@@ -1,8 +1,12 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
 EMA_PERIOD        = 14
 RSI_PERIOD        = 8
 ATR_K             = 0.5
+ATR_PERIOD        = 14
 
 
 def compute_rsi(series: pd.Series, period: int = RSI_PERIOD):
@@ -54,7 +58,142 @@ def compute_macd(df, fast=12, slow=26, signal=9):
     }
 
 
+# ==========================================
+# Слитный расчёт индикаторов (один проход)
+# ==========================================
+
+@dataclass
+class IndicatorArrays:
+    """
+    Все серии индикаторов одного TF: строки одного буфера (9, n) float64
+    (для пакета пар — матрицы пары × бары). Рекурсии считает pandas, поэтому
+    значения те же, что у compute_indicators / compute_macd / ATR и impulse из score_on_tf.
+    """
+    ema20: np.ndarray
+    ema12: np.ndarray
+    ema26: np.ndarray
+    macd: np.ndarray
+    macd_sig: np.ndarray
+    macd_hist: np.ndarray
+    rsi: np.ndarray
+    atr: np.ndarray
+    impulse: np.ndarray
+
+    def __len__(self):
+        return len(self.ema20)
+
+
+def _pandas_rows(x: np.ndarray):
+    """Строки x (k, n) → столбцы pandas (одна строка — Series, у неё меньше накладных)."""
+    return pd.Series(x[0]) if len(x) == 1 else pd.DataFrame(x.T)
+
+
+def _to_rows(res) -> np.ndarray:
+    v = res.to_numpy()
+    return v[None] if v.ndim == 1 else v.T
+
+
+def _ewm_rows(x: np.ndarray, **kw) -> np.ndarray:
+    """ewm(adjust=False).mean() по каждой строке x (k, n) — один вызов pandas."""
+    return _to_rows(_pandas_rows(x).ewm(adjust=False, **kw).mean())
+
+
+def _fill(out: np.ndarray, close: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    Индикаторы строк close / high / low (k, n) в out (9, k, n).
+    Рекурсии (EMA, сигнальная EMA9, сглаживание приращений RSI) и окно ATR —
+    pandas ewm / rolling, как в compute_indicators и score_on_tf, поэтому значения
+    те же; остальное (MACD, гистограмма, RSI, impulse) — numpy прямо в out.
+    """
+    k = len(close)
+    out[0] = _ewm_rows(close, span=EMA_PERIOD)
+    out[1] = _ewm_rows(close, span=12)
+    out[2] = _ewm_rows(close, span=26)
+    np.subtract(out[1], out[2], out=out[3])
+    out[4] = _ewm_rows(out[3], span=9)
+    np.subtract(out[3], out[4], out=out[5])
+
+    # RSI: приращения как delta.clip(...) в compute_rsi (первое — NaN)
+    delta = np.empty_like(close)
+    delta[:, 0] = np.nan
+    np.subtract(close[:, 1:], close[:, :-1], out=delta[:, 1:])
+    smooth = _ewm_rows(np.concatenate([np.maximum(delta, 0.0), -np.minimum(delta, 0.0)]), com=RSI_PERIOD - 1)
+    rsi = out[6]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(smooth[:k], smooth[k:], out=rsi)
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+
+    out[7] = _to_rows(_pandas_rows(high - low).rolling(ATR_PERIOD).mean())
+
+    # impulse = (close - close[-3]) / (ATR * ATR_K)
+    out[8, :, :3] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(close[:, 3:] - close[:, :-3], out[7, :, 3:] * ATR_K, out=out[8, :, 3:])
+
+
+def indicator_arrays(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> IndicatorArrays:
+    """
+    Все индикаторы TF за один проход в предвыделенный буфер (9, n)
+    по массивам close / high / low (float64, по возрастанию времени).
+    Матрицы (пары × бары) тоже принимаются: поля результата — той же формы.
+    """
+    shape = np.shape(close)
+    rows = [np.asarray(x, dtype="float64").reshape(-1, shape[-1]) for x in (close, high, low)]
+    out = np.empty((9, len(rows[0]), shape[-1]), dtype="float64")
+    if shape[-1]:
+        _fill(out, *rows)
+    return IndicatorArrays(*out.reshape((9,) + shape))
+
+
+def compute_indicator_arrays(df: pd.DataFrame) -> IndicatorArrays:
+    """indicator_arrays по колонкам df. Ничего не пишет в df и не копирует его."""
+    return indicator_arrays(
+        df["close"].to_numpy(dtype="float64"),
+        df["high"].to_numpy(dtype="float64"),
+        df["low"].to_numpy(dtype="float64"),
+    )
+
+
+def macd_summary(ind: IndicatorArrays, high: np.ndarray, low: np.ndarray) -> dict:
+    """
+    То же, что возвращает compute_macd(df), но по готовым массивам:
+    без повторного расчёта EMA и без новых колонок в df.
+    """
+    hist = ind.macd_hist
+    n = len(hist)
+
+    min_local = np.zeros(n, dtype=bool)
+    max_local = np.zeros(n, dtype=bool)
+    if n >= 3:
+        min_local[1:-1] = (hist[1:-1] < hist[:-2]) & (hist[1:-1] < hist[2:])
+        max_local[1:-1] = (hist[1:-1] > hist[:-2]) & (hist[1:-1] > hist[2:])
+
+    div_buy = False
+    div_sell = False
+    if n >= 2:
+        macd_lows = hist[min_local][-2:]
+        if len(macd_lows) == 2:
+            div_buy = bool(macd_lows[-1] > macd_lows[-2] and low[-1] < low[-2])
+        macd_highs = hist[max_local][-2:]
+        if len(macd_highs) == 2:
+            div_sell = bool(macd_highs[-1] < macd_highs[-2] and high[-1] > high[-2])
+
+    slope = float(hist[-1] - hist[-2]) if n >= 2 else float("nan")
+    return {
+        "macd": float(ind.macd[-1]),
+        "macd_signal": float(ind.macd_sig[-1]),
+        "macd_hist": float(hist[-1]),
+        "macd_slope": slope,
+        "macd_expansion": slope,
+        "div_buy": div_buy,
+        "div_sell": div_sell,
+    }
+
+
 def compute_indicators(df: pd.DataFrame):
+    """Эталон на pandas (для score_on_tf); в анализе — compute_indicator_arrays."""
     df = df.copy()
     df["EMA20"] = df["close"].ewm(span=EMA_PERIOD, adjust=False).mean()
     df["EMA12"] = df["close"].ewm(span=12, adjust=False).mean()
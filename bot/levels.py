@@ -1,23 +1,67 @@
+from typing import Dict, Iterable
+
+import numpy as np
 import pandas as pd
 
 
-def get_swing_levels(df: pd.DataFrame, lookback: int = 60):
-    if len(df) < lookback + 5:
-        return None, None
+def _local_extrema(high: np.ndarray, low: np.ndarray):
+    """
+    Маски локальных экстремумов в один проход сдвинутыми массивами:
+    high[i] > high[i-1] и high[i] > high[i+1] (для low — меньше обоих соседей).
+    """
+    is_high = np.zeros(len(high), dtype=bool)
+    is_low = np.zeros(len(low), dtype=bool)
+    if len(high) >= 3:
+        is_high[1:-1] = (high[1:-1] > high[:-2]) & (high[1:-1] > high[2:])
+        is_low[1:-1] = (low[1:-1] < low[:-2]) & (low[1:-1] < low[2:])
+    return is_high, is_low
+
+
+def swing_level_sets(high: np.ndarray, low: np.ndarray, lookbacks: Iterable[int] = (60,)) -> Dict[int, dict]:
+    """
+    Полный набор swing-уровней для нескольких lookback за один вызов:
+        {lookback: {"support", "resistance", "highs", "lows"}}
 
-    swings_high = []
-    swings_low = []
+    highs / lows — все локальные максимумы / минимумы за последние lookback баров
+    (без последнего, он ещё не подтверждён соседом справа), по времени.
+    Нужны для кластеризации уровней; support / resistance — min(lows) / max(highs).
+    """
+    n = len(high)
+    is_high, is_low = _local_extrema(high, low)
 
-    for i in range(2, lookback):
-        idx = -i
-        if idx - 1 < -len(df) or idx + 1 >= 0:
+    out: Dict[int, dict] = {}
+    for lookback in lookbacks:
+        if n < lookback + 5:
+            out[lookback] = {
+                "support": None,
+                "resistance": None,
+                "highs": np.empty(0),
+                "lows": np.empty(0),
+            }
             continue
-        if df["high"].iloc[idx] > df["high"].iloc[idx - 1] and df["high"].iloc[idx] > df["high"].iloc[idx + 1]:
-            swings_high.append(df["high"].iloc[idx])
-        if df["low"].iloc[idx] < df["low"].iloc[idx - 1] and df["low"].iloc[idx] < df["low"].iloc[idx + 1]:
-            swings_low.append(df["low"].iloc[idx])
 
-    resistance = max(swings_high) if swings_high else None
-    support = min(swings_low) if swings_low else None
+        # позиции n-lookback+1 .. n-2 (как idx = -2 .. -(lookback-1))
+        start, stop = max(n - lookback + 1, 1), n - 1
+        highs = high[start:stop][is_high[start:stop]]
+        lows = low[start:stop][is_low[start:stop]]
+        out[lookback] = {
+            "support": lows.min() if len(lows) else None,
+            "resistance": highs.max() if len(highs) else None,
+            "highs": highs,
+            "lows": lows,
+        }
+    return out
 
-    return support, resistance
+
+def get_swing_level_sets(df: pd.DataFrame, lookbacks: Iterable[int] = (60,)) -> Dict[int, dict]:
+    """swing_level_sets по колонкам high / low df."""
+    return swing_level_sets(
+        df["high"].to_numpy(dtype="float64"),
+        df["low"].to_numpy(dtype="float64"),
+        lookbacks,
+    )
+
+
+def get_swing_levels(df: pd.DataFrame, lookback: int = 60):
+    levels = get_swing_level_sets(df, (lookback,))[lookback]
+    return levels["support"], levels["resistance"]
@@ -1,32 +1,378 @@
-from datetime import datetime, timezone
+import asyncio
+import atexit
+import csv
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
-from typing import Dict, Any, Tuple
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
-from .config import LOG_FILE
+from .config import (
+    LOG_FILE,
+    PAIRS,
+    SIGNAL_DB,
+    SIGNAL_EVAL_LOOKBACK_H,
+    SIGNAL_FSYNC_BATCH,
+    SIGNAL_FSYNC_INTERVAL,
+    SIGNAL_STORE,
+)
+from .signal_store import SIGNAL_COLUMNS, SQLiteSignalStore
+from .stats_index import STATS_INDEX
+from .http_client import HTTP
 from .tv_api import get_tv_series
 
+# Сколько M1-баров запрашивать для оценки: не меньше EVAL_MIN_BARS (как раньше),
+# больше — если у пары есть старые неоценённые сигналы
+EVAL_MIN_BARS = 300
+EVAL_MAX_BARS = SIGNAL_EVAL_LOOKBACK_H * 60 + 60
+
+_ARCHIVE_RE = re.compile(r"-(\d{4}-\d{2}-\d{2})(?:\.\d+)?$")
+
+
+def _cell(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    return v
+
+
+def _archive_day(path: Path) -> Optional[str]:
+    m = _ARCHIVE_RE.search(path.stem)
+    return m.group(1) if m else None
+
+
+def signal_archives(path: Path = LOG_FILE) -> List[Path]:
+    """Архивы журнала signals-YYYY-MM-DD[.N].csv по возрастанию дня."""
+    files = [p for p in path.parent.glob(f"{path.stem}-*{path.suffix}") if _archive_day(p)]
+    return sorted(files, key=lambda p: (_archive_day(p), p.name))
+
+
+def signal_files(since: Optional[datetime] = None, path: Path = LOG_FILE) -> List[Path]:
+    """
+    Файлы журнала, где могут быть сигналы не старше since: архивы + текущий.
+    Архив назван по дню своей первой строки и тянется до следующего файла.
+    """
+    files = signal_archives(path)
+    if since is not None:
+        day = since.astimezone(timezone.utc).strftime("%Y-%m-%d")
+        older = [i for i, p in enumerate(files) if _archive_day(p) <= day]
+        files = files[older[-1]:] if older else files
+    if path.exists():
+        files.append(path)
+    return files
+
+
+class SignalLogWriter:
+    """
+    Журнал сигналов только на дозапись.
+
+    - append(): строка по SIGNAL_COLUMNS кладётся в очередь — O(1), без чтения файла;
+    - единственный поток-писатель дописывает строки пачкой, flush после каждой пачки,
+      fsync — раз в fsync_interval сек или каждые fsync_batch строк;
+    - первая строка новых суток UTC: текущий файл атомарно (os.replace) уходит
+      в архив signals-YYYY-MM-DD.csv, запись продолжается в свежий signals.csv;
+    - update(): результаты оценки применяет тот же поток — переписывает только
+      затронутый файл (сутки) через временный файл и os.replace.
+    Все записи идут через один поток: автосканер, API и оценка не гоняются за файл.
+    """
+
+    def __init__(self, path: Path = LOG_FILE, fsync_interval: float = SIGNAL_FSYNC_INTERVAL,
+                 fsync_batch: int = SIGNAL_FSYNC_BATCH):
+        self.path = Path(path)
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._fh = None
+        self._day: Optional[str] = None   # день первой строки текущего файла
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.appended = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.rewrites = 0
+        self.errors = 0
+
+    # ---------- API (любой поток) ----------
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="signal-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def append(self, row: Dict[str, Any]):
+        self.start()
+        self._queue.put(("append", [_cell(row.get(c)) for c in SIGNAL_COLUMNS]))
+
+    def update(self, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        """changes: {(timestamp_utc, pair): {колонка: значение}}."""
+        if changes:
+            self.start()
+            self._queue.put(("update", changes))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дождаться записи и fsync всего, что уже в очереди."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": str(self.path),
+            "day": self._day,
+            "queue": self._queue.qsize(),
+            "appended": self.appended,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "rewrites": self.rewrites,
+            "errors": self.errors,
+        }
+
+    def read(self, since: Optional[datetime] = None, pairs: Optional[Sequence[str]] = None,
+             evaluated: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Сигналы из текущего файла и архивов (только файлы, покрывающие since).
+        Строки, ещё лежащие в очереди писателя, не видны — см. flush().
+        """
+        frames = []
+        for path in signal_files(since, self.path):
+            try:
+                frames.append(pd.read_csv(path, dtype={"result": "string"}))
+            except (FileNotFoundError, pd.errors.EmptyDataError):
+                continue
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        mask = pd.Series(True, index=df.index)
+        if since is not None:
+            mask &= pd.to_datetime(df["timestamp_utc"], utc=True, errors="coerce") >= since
+        if pairs is not None:
+            mask &= df["pair"].isin(list(pairs))
+        if evaluated is not None:
+            mask &= (df["evaluated"].astype(str) == "True") == evaluated
+        return df[mask].reset_index(drop=True)
+
+    def page(self, pairs: Optional[Sequence[str]] = None, since: Optional[str] = None,
+             until: Optional[str] = None, before: Optional[Tuple[str, str]] = None, limit: int = 100,
+             columns: Sequence[str] = SIGNAL_COLUMNS) -> List[Dict[str, Any]]:
+        """Страница истории, как SQLiteSignalStore.page (здесь — чтением файлов журнала)."""
+        df = self.read(pairs=pairs)
+        if df.empty:
+            return []
+        ts = df["timestamp_utc"].astype(str)
+        mask = pd.Series(True, index=df.index)
+        if since is not None:
+            mask &= ts >= since
+        if until is not None:
+            mask &= ts < until
+        if before is not None:
+            pair = df["pair"].astype(str)
+            mask &= (ts < before[0]) | ((ts == before[0]) & (pair < before[1]))
+        df = df[mask].sort_values(["timestamp_utc", "pair"]).tail(int(limit))
+        columns = [c for c in columns if c in df.columns] or SIGNAL_COLUMNS
+        df = df[columns].astype(object).where(df[columns].notna(), None)
+        return df.to_dict("records")
+
+    # ---------- поток-писатель ----------
+
+    def _run(self):
+        while True:
+            try:
+                op = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+            batch = [op]
+            while len(batch) < self.fsync_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for op in batch:
+                try:
+                    if op is None:
+                        self._sync(force=True)
+                        self._close_file()
+                        return
+                    kind, arg = op
+                    if kind == "append":
+                        self._append(arg)
+                    elif kind == "update":
+                        self._apply(arg)
+                    elif kind == "flush":
+                        self._sync(force=True)
+                        arg.set()
+                except Exception as e:
+                    self.errors += 1
+                    print("⚠️ signal log:", e)
+
+            if self._fh is not None:
+                self._fh.flush()
+            if self._unsynced >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _open(self):
+        header, first = None, None
+        if self.path.exists():
+            with open(self.path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                first = next(reader, None)
+        if header is not None and header != SIGNAL_COLUMNS:
+            # старый файл с другой схемой — в архив, дальше пишем по SIGNAL_COLUMNS
+            self._day = first[0][:10] if first else datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            self._rotate()
+            header, first = None, None
+        self._day = first[0][:10] if first else None
+        self._fh = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._fh)
+        if header is None:
+            self._writer.writerow(SIGNAL_COLUMNS)
+
+    def _close_file(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _sync(self, force: bool = False):
+        if self._fh is not None and (self._unsynced or force):
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self.fsyncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _archive_path(self, day: str) -> Path:
+        dst = self.path.with_name(f"{self.path.stem}-{day}{self.path.suffix}")
+        n = 0
+        while dst.exists():
+            n += 1
+            dst = self.path.with_name(f"{self.path.stem}-{day}.{n}{self.path.suffix}")
+        return dst
+
+    def _rotate(self):
+        self._sync(force=True)
+        self._close_file()
+        os.replace(self.path, self._archive_path(self._day))
+        self.rotations += 1
+        self._day = None
+
+    def _append(self, values: list):
+        if self._fh is None:
+            self._open()
+        day = str(values[0])[:10]
+        if self._day is not None and day > self._day:
+            self._rotate()
+            self._open()
+        if self._day is None:
+            self._day = day
+        self._writer.writerow(values)
+        self.appended += 1
+        self._unsynced += 1
+
+    def _file_for(self, day: str) -> Path:
+        if self._day is None or day >= self._day:
+            return self.path
+        target = None
+        for p in signal_archives(self.path):
+            if target is None or _archive_day(p) <= day:
+                target = p
+        return target or self.path
+
+    def _apply(self, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        if self._fh is None:
+            self._open()
+        by_file: Dict[Path, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        for key, upd in changes.items():
+            by_file.setdefault(self._file_for(key[0][:10]), {})[key] = upd
+
+        for path, upd in by_file.items():
+            current = path == self.path
+            if current:
+                self._sync(force=True)
+                self._close_file()
+            try:
+                self._rewrite(path, upd)
+            finally:
+                if current:
+                    self._open()
+
+    def _rewrite(self, path: Path, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        """Переписать один файл журнала с изменениями: temp + fsync + os.replace."""
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            columns = reader.fieldnames or SIGNAL_COLUMNS
+            rows = list(reader)
+        extra = [c for upd in changes.values() for c in upd if c not in columns]
+        columns = list(columns) + list(dict.fromkeys(extra))
+        for row in rows:
+            upd = changes.get((row.get("timestamp_utc"), row.get("pair")))
+            if upd:
+                row.update({k: _cell(v) for k, v in upd.items()})
+
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self.rewrites += 1
+
+
+def _make_store():
+    """SIGNAL_STORE: "sqlite" — SQLite (WAL) в SIGNAL_DB, "csv" — журнал signals.csv."""
+    if SIGNAL_STORE != "sqlite":
+        return SignalLogWriter(LOG_FILE)
+    # новая база при первом обращении забирает накопленный CSV-журнал
+    return SQLiteSignalStore(SIGNAL_DB, seed=lambda: signal_files(None, LOG_FILE))
+
+
+SIGNAL_LOG = _make_store()
+
 
 def init_log():
-    if not LOG_FILE.exists():
-        df = pd.DataFrame(
-            columns=[
-                "timestamp_utc","pair","direction","probability",
-                "expiry_min","entry_price","evaluated","result"
-            ]
-        )
-        df.to_csv(LOG_FILE, index=False)
+    SIGNAL_LOG.start()
 
 
-def log_signal(pair: str, direction: str, probability: float, expiry_min: int, entry_price: float, indicators: Dict[str, Any] | None = None):
-    init_log()
-    try:
-        df = pd.read_csv(LOG_FILE, dtype={"result": "string", "evaluated": "bool"})
-    except FileNotFoundError:
-        df = pd.DataFrame()
+def pairs_for_symbol(symbol: str) -> List[str]:
+    """EURUSD → ["EUR/USD"]: символ WebApp (без слэша) → имена пар в журнале."""
+    pairs = [p for p in PAIRS if p.replace("/", "") == symbol]
+    if not pairs and len(symbol) == 6 and symbol.isalpha():
+        pairs = [f"{symbol[:3]}/{symbol[3:]}"]
+    return pairs or [symbol]
 
+
+def load_signals(since: Optional[datetime] = None, pairs: Optional[Sequence[str]] = None,
+                 evaluated: Optional[bool] = None) -> pd.DataFrame:
+    """Сигналы из хранилища (SQLite или CSV) по окну времени / парам / признаку оценки."""
+    return SIGNAL_LOG.read(since=since, pairs=pairs, evaluated=evaluated)
+
+
+def log_signal(pair: str, direction: str, probability: float, expiry_min: int, entry_price: float, indicators: Dict[str, Any] | None = None):
     row = {
         "timestamp_utc": datetime.now(timezone.utc).isoformat(),
         "pair": pair,
@@ -41,68 +387,104 @@ def log_signal(pair: str, direction: str, probability: float, expiry_min: int, e
     if indicators:
         row.update(indicators)
 
-    row_df = pd.DataFrame([row])
-    if not df.empty:
-        df = pd.concat([df, row_df], ignore_index=True)
-    else:
-        df = row_df
+    # индекс статистики и очередь писателя — под одной блокировкой (см. StatsIndex)
+    with STATS_INDEX.lock:
+        STATS_INDEX.on_signal(row)
+        SIGNAL_LOG.append(row)
 
-    df["result"] = df["result"].astype("string")
-    df["evaluated"] = df["evaluated"].astype(bool)
 
-    df.to_csv(LOG_FILE, index=False)
+def _load_all_signals() -> pd.DataFrame:
+    SIGNAL_LOG.flush()
+    return SIGNAL_LOG.read()
 
 
-def evaluate_signal_entry(entry_row) -> Tuple[str, float | None, str | None]:
-    try:
-        t0 = pd.to_datetime(entry_row["timestamp_utc"]).tz_convert("UTC")
-    except Exception:
-        t0 = pd.to_datetime(entry_row["timestamp_utc"]).tz_localize("UTC")
+def rebuild_stats_index():
+    """Пересобрать агрегаты статистики из хранилища (старт бота)."""
+    STATS_INDEX.rebuild(_load_all_signals)
 
-    expiry = int(entry_row["expiry_min"])
-    target = t0 + pd.Timedelta(minutes=expiry)
 
-    df, err = get_tv_series(entry_row["pair"], "1min", 300)
-    if df is None or df.empty:
-        return "ERROR", None, err
+def signal_stats(symbol: Optional[str] = None, window: str = "all") -> Dict[str, Any]:
+    """Статистика окна (24h / 7d / all) по символу WebApp или по всем парам — из индекса."""
+    STATS_INDEX.ensure_loaded(_load_all_signals)
+    return STATS_INDEX.summary(window, pairs_for_symbol(symbol) if symbol else None)
 
-    idx = df["dt_utc"].searchsorted(target)
-    if idx >= len(df):
-        return "PENDING", None, "no bar yet"
 
-    price_at = float(df["close"].iloc[idx].item())
+def signal_stats_by_pair(window: str = "all") -> Dict[str, Dict[str, Any]]:
+    STATS_INDEX.ensure_loaded(_load_all_signals)
+    return STATS_INDEX.breakdown(window)
 
-    if (entry_row["direction"] == "BUY" and price_at > entry_row["entry_price"]) or            (entry_row["direction"] == "SELL" and price_at < entry_row["entry_price"]):
-        res = "WIN"
-    else:
-        res = "LOSE"
 
-    return res, price_at, None
+def resolve_outcomes(times: np.ndarray, closes: np.ndarray, targets: np.ndarray,
+                     directions: np.ndarray, entries: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Исходы пачки сигналов одной пары по одной M1-серии.
+    times — open баров (unix-сек, по возрастанию), targets — время экспирации (unix-сек).
+    Цена экспирации — close первого бара с open >= target (один searchsorted на все сигналы).
+    Возвращает (ready, result "WIN"/"LOSE", price); ready=False — бара ещё нет.
+    """
+    idx = np.searchsorted(times, targets, side="left")
+    ready = idx < len(times)
+    price = np.where(ready, closes[np.minimum(idx, len(closes) - 1)], np.nan)
+    win = ((directions == "BUY") & (price > entries)) | ((directions == "SELL") & (price < entries))
+    return ready, np.where(win, "WIN", "LOSE"), price
 
 
-def stats_last_24h():
-    init_log()
-    try:
-        df = pd.read_csv(LOG_FILE)
-    except FileNotFoundError:
-        return {"total":0, "wins":0, "losses":0, "winrate":0.0}
+def fetch_eval_series(bars_by_pair: Dict[str, int]) -> Dict[str, Tuple[Optional[pd.DataFrame], Any]]:
+    """
+    M1-серии для оценки: по одному запросу на пару, все пары параллельно
+    через общий HTTP-клиент (лимиты источников соблюдает он же).
+    OTC-пары — из PO Streaming Engine, остальные — TradingView.
+    Для фоновых потоков (НЕ вызывать из event loop).
+    """
+    from .analyzer import fetch_po_candles, is_otc_pair  # analyzer сам импортирует logger
 
-    if df.empty:
-        return {"total":0, "wins":0, "losses":0, "winrate":0.0}
+    async def one(pair: str, n_bars: int):
+        if is_otc_pair(pair):
+            return await fetch_po_candles(pair, "M1", n_bars)
+        return await get_tv_series(pair, "1min", n_bars)
 
-    now = datetime.now(timezone.utc)
-    df["timestamp_utc"] = pd.to_datetime(df["timestamp_utc"], utc=True, errors="coerce")
-
-    last24 = df[df["timestamp_utc"] >= (now - pd.Timedelta(hours=24))].copy()
-    last24["expiry_min"] = pd.to_numeric(last24["expiry_min"], errors="coerce")
-    last24 = last24.dropna(subset=["expiry_min"])
-    last24["done"] = last24["timestamp_utc"] + pd.to_timedelta(last24["expiry_min"].astype(int), unit="m")
-    mask_done = last24["done"] <= now
-    mask_eval = last24.get("evaluated", False).astype(bool) if "evaluated" in last24.columns else True
-    subset = last24[mask_done & mask_eval].copy()
-
-    wins = int((subset["result"] == "WIN").sum())
-    losses = int((subset["result"] == "LOSE").sum())
+    async def fetch_all():
+        res = await asyncio.gather(*(one(p, n) for p, n in bars_by_pair.items()), return_exceptions=True)
+        return {
+            p: (None, str(r)) if isinstance(r, BaseException) else r
+            for p, r in zip(bars_by_pair, res)
+        }
+
+    return HTTP.run_sync(fetch_all())
+
+
+def _to_unix(ts: pd.Series) -> np.ndarray:
+    """ISO-время (с микросекундами или без) → unix-секунды float64, NaN для мусора."""
+    dt = pd.to_datetime(ts, utc=True, errors="coerce", format="ISO8601")
+    sec = (dt - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+    return sec.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def evaluate_signal_entry(entry_row) -> Tuple[str, float | None, str | None]:
+    t0 = _to_unix(pd.Series([entry_row["timestamp_utc"]]))[0]
+    target = t0 + int(entry_row["expiry_min"]) * 60
+
+    pair = entry_row["pair"]
+    df, err = fetch_eval_series({pair: EVAL_MIN_BARS})[pair]
+    if df is None or df.empty:
+        return "ERROR", None, err
+
+    ready, res, price = resolve_outcomes(
+        df["time"].to_numpy(dtype="float64"),
+        df["close"].to_numpy(dtype="float64"),
+        np.array([target]),
+        np.array([entry_row["direction"]]),
+        np.array([float(entry_row["entry_price"])]),
+    )
+    if not ready[0]:
+        return "PENDING", None, "no bar yet"
+    return str(res[0]), float(price[0]), None
+
+
+def stats_last_24h():
+    """Оценённые сигналы за 24 часа (по часовым корзинам индекса) — для панели бота."""
+    s = signal_stats(window="24h")
+    wins, losses = s["wins"], s["losses"]
     total_eval = wins + losses
     winrate = round((wins / total_eval) * 100, 2) if total_eval > 0 else 0.0
 
@@ -129,71 +511,149 @@ def build_pie(wins: int, losses: int):
 
 
 def evaluate_pending_signals():
-    init_log()
-    try:
-        df = pd.read_csv(LOG_FILE, dtype={"result": "string", "evaluated": "bool"})
-    except FileNotFoundError:
-        print("⚠️ signals.csv не найден")
-        return
+    """
+    Оценка истёкших сигналов пачкой: группировка по паре → одна M1-серия на пару,
+    покрывающая все её экспирации, → searchsorted по всем сигналам пары сразу
+    → одно пакетное обновление хранилища.
+    """
+    now = datetime.now(timezone.utc)
+    df = load_signals(since=now - timedelta(hours=SIGNAL_EVAL_LOOKBACK_H), evaluated=False)
 
     if df.empty:
         return
 
-    now = datetime.now(timezone.utc)
-    updated = wins = losses = 0
+    ts = _to_unix(df["timestamp_utc"])
+    expiry = pd.to_numeric(df["expiry_min"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+    targets = ts + expiry * 60
+    due = (ts == ts) & (expiry > 0) & (targets <= now.timestamp())
+    if not due.any():
+        print("ℹ️ Новых завершённых сигналов нет.")
+        return
 
-    for i, row in df.iterrows():
-        if str(row.get("evaluated", False)) == "True":
-            continue
+    df = df[due].reset_index(drop=True)
+    ts, targets = ts[due], targets[due]
 
-        ts = pd.to_datetime(row["timestamp_utc"], utc=True, errors="coerce")
-        expiry = int(row.get("expiry_min", 0) or 0)
-        if pd.isna(ts) or expiry <= 0:
-            continue
-        if ts + pd.Timedelta(minutes=expiry) > now:
+    # одна серия на пару: от самого раннего сигнала пары до текущего бара
+    groups = df.groupby("pair", sort=False).indices
+    bars = {
+        pair: int(min(max(EVAL_MIN_BARS, (now.timestamp() - ts[idx].min()) // 60 + 5), EVAL_MAX_BARS))
+        for pair, idx in groups.items()
+    }
+    series = fetch_eval_series(bars)
+
+    directions = df["direction"].astype(str).to_numpy()
+    entries = pd.to_numeric(df["entry_price"], errors="coerce").to_numpy(dtype="float64")
+    stamps = df["timestamp_utc"].to_numpy()
+    changes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    wins = losses = 0
+
+    for pair, idx in groups.items():
+        bars_df, err = series.get(pair, (None, "no series"))
+        if bars_df is None or bars_df.empty:
+            print(f"⚠️ Оценка {pair}: {err}")
             continue
-
-        res, price_at, err = evaluate_signal_entry(row)
-        if res in ("WIN", "LOSE"):
-            df.at[i, "result"] = res
-            df.at[i, "evaluated"] = True
-            if price_at is not None:
-                df.at[i, "price_at_expiry"] = price_at
-            updated += 1
-            wins += (res == "WIN")
-            losses += (res == "LOSE")
-
-    if updated > 0:
-        df.to_csv(LOG_FILE, index=False)
-        print(f"✅ Оценено: {updated} (WIN: {wins}, LOSE: {losses})")
+        ready, res, price = resolve_outcomes(
+            bars_df["time"].to_numpy(dtype="float64"),
+            bars_df["close"].to_numpy(dtype="float64"),
+            targets[idx], directions[idx], entries[idx],
+        )
+        for j, ok, r, p in zip(idx, ready, res, price):
+            if not ok:
+                continue
+            changes[(stamps[j], pair)] = {"result": str(r), "evaluated": True, "price_at_expiry": float(p)}
+            wins += (r == "WIN")
+            losses += (r == "LOSE")
+
+    if changes:
+        # одно пакетное обновление: поток-писатель хранилища (+ индекс статистики)
+        with STATS_INDEX.lock:
+            STATS_INDEX.on_results(changes)
+            SIGNAL_LOG.update(changes)
+        print(f"✅ Оценено: {len(changes)} (WIN: {wins}, LOSE: {losses}), пар: {len(groups)}")
     else:
         print("ℹ️ Новых завершённых сигналов нет.")
-        
-def read_signals_log(symbol: str):
+
+
+# Поля истории для WebApp (/signals): имя в ответе → колонка хранилища.
+# Остальные колонки SIGNAL_COLUMNS доступны в fields под своими именами.
+HISTORY_FIELDS = {
+    "time": "timestamp_utc",
+    "symbol": "pair",
+    "direction": "direction",
+    "prob": "probability",
+    "expiry": "expiry_min",
+}
+HISTORY_DEFAULT_FIELDS = ["time", "symbol", "direction", "prob", "expiry", "result", "reason"]
+
+
+def _reason(rec: Dict[str, Any]) -> str:
+    """Короткая подпись сигнала в истории: вероятность, экспирация, паттерн, итог."""
+    parts = []
+    if rec.get("probability") is not None:
+        parts.append(f"{rec['probability']}%")
+    if rec.get("expiry_min") is not None:
+        parts.append(f"{int(rec['expiry_min'])} мин")
+    if rec.get("pattern") and rec["pattern"] != "NONE":
+        parts.append(str(rec["pattern"]))
+    if rec.get("result"):
+        parts.append(str(rec["result"]))
+    return " · ".join(parts)
+
+
+def _utc_iso(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def _encode_cursor(rec: Dict[str, Any]) -> str:
+    """Курсор X-Next-Cursor: "timestamp_utc|pair" самой старой строки страницы."""
+    return f"{rec['timestamp_utc']}|{rec['pair']}"
+
+
+def _decode_cursor(before: str) -> Tuple[str, str]:
+    """Старый курсор — только время: pair "" даёт прежнее строгое timestamp_utc < before."""
+    ts, _, pair = before.partition("|")
+    return ts, pair
+
+
+def read_signals_log(symbol: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     before: Optional[str] = None, limit: int = 100,
+                     fields: Optional[Sequence[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Читает signals.csv и возвращает сигналы по символу.
-    symbol приходит без слэша: EURUSD
+    История сигналов по символу WebApp (EURUSD → EUR/USD): limit самых свежих
+    в окне [since, until) старше курсора before, по возрастанию времени.
+    Возвращает (строки с полями fields, курсор следующей — более старой — страницы или None).
     """
-    try:
-        rows = []
-        with open("signals.csv", "r", encoding="utf-8") as f:
-            for line in f.readlines()[1:]:  # пропускаем заголовок
-                parts = line.strip().split(",")
-                if len(parts) < 6:
-                    continue
-
-                t, pair, direction, prob, expiry, reason = parts
-
-                # Приводим EUR/USD → EURUSD для сравнения
-                if pair.replace("/", "") == symbol:
-                    rows.append({
-                        "time": t,
-                        "symbol": pair,
-                        "direction": direction,
-                        "prob": prob,
-                        "expiry": expiry,
-                        "reason": reason,
-                    })
-        return rows
-    except FileNotFoundError:
-        return []
+    fields = [f for f in (fields or HISTORY_DEFAULT_FIELDS) if f in HISTORY_FIELDS or f in SIGNAL_COLUMNS or f == "reason"]
+    fields = fields or HISTORY_DEFAULT_FIELDS
+    columns = {"timestamp_utc", "pair"}
+    for f in fields:
+        if f == "reason":
+            columns.update(("probability", "expiry_min", "pattern", "result"))
+        else:
+            columns.add(HISTORY_FIELDS.get(f, f))
+
+    recs = SIGNAL_LOG.page(
+        pairs=pairs_for_symbol(symbol),
+        since=_utc_iso(since),
+        until=_utc_iso(until),
+        before=_decode_cursor(before) if before else None,
+        limit=limit,
+        columns=[c for c in SIGNAL_COLUMNS if c in columns],
+    )
+    rows = []
+    for rec in recs:
+        row = {}
+        for f in fields:
+            if f == "reason":
+                row[f] = _reason(rec)
+            else:
+                v = rec.get(HISTORY_FIELDS.get(f, f))
+                row[f] = None if isinstance(v, float) and v != v else v
+        rows.append(row)
+
+    cursor = _encode_cursor(recs[0]) if len(recs) == limit else None
+    return rows, cursor
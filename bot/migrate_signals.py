@@ -0,0 +1,39 @@
+# bot/migrate_signals.py
+# ==========================================
+# Импорт CSV-журнала сигналов в SQLite
+# ==========================================
+#
+# Запуск:  python -m bot.migrate_signals                 # signals.csv + архивы → signals.db
+#          python -m bot.migrate_signals --db other.db a.csv b.csv
+#
+# Повторный запуск безопасен: сигнал с тем же (timestamp_utc, pair) пропускается.
+
+import argparse
+from pathlib import Path
+
+from .config import LOG_FILE, SIGNAL_DB
+from .logger import signal_files
+from .signal_store import SQLiteSignalStore, import_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт signals.csv (и архивов) в SQLite")
+    parser.add_argument("--db", type=Path, default=SIGNAL_DB)
+    parser.add_argument("files", type=Path, nargs="*", help="CSV-файлы (по умолчанию журнал и его архивы)")
+    args = parser.parse_args()
+
+    files = args.files or signal_files(None, LOG_FILE)
+    if not files:
+        print("ℹ️ CSV-журналов не найдено")
+        return
+
+    store = SQLiteSignalStore(args.db)
+    counts = import_csv(store, files)
+    for name, n in counts.items():
+        print(f"📥 {name}: {n}")
+    total = len(store.read())
+    print(f"✅ {args.db}: импортировано {sum(counts.values())}, всего сигналов {total}")
+
+
+if __name__ == "__main__":
+    main()
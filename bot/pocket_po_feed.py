@@ -1,79 +1,222 @@
 # bot/pocket_po_feed.py
 # ==========================================
 # Pocket Option price feed (CLIENT)
-# Reads data from po_tick_server
+# Push-подписка на WebSocket po_tick_server
 # ==========================================
-
+#
+# Одно постоянное соединение с ws://host:9002/ws (PO_ENGINE_WS):
+# - "tick"      → CURRENT_PO_PRICE[symbol] сразу по приходу (без опроса);
+# - "bar_close" → слушателям (bot/bar_events.py → автосканер);
+# - обрыв      → переподключение с экспоненциальной паузой (1 → 30 сек);
+# - подключение → все последние тики одним GET /snapshot (PO_ENGINE_HTTP),
+#                 не дожидаясь следующего тика каждого символа.
+# Свежесть цены — по локальному времени получения тика (часы VPS и бота
+# могут расходиться): po_feed_status() / get_po_price().
+
+import asyncio
+import json
 import time
-import threading
-import requests
-from typing import Optional, Dict
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from .config import PO_ENGINE_HTTP, PO_ENGINE_WS, PO_TIMEOUT
 
 # ================= CONFIG =================
 
-PO_TICK_SERVER_HTTP = "http://127.0.0.1:9001"
 TICK_TTL_SEC = 2.5          # сколько секунд тик считается живым
-POLL_INTERVAL = 0.4         # частота опроса сервера
 DEFAULT_ACCOUNT = "REAL"
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
 
 # ================= STORAGE =================
 
+# symbol → {"price", "ts" (время тика на сервере), "recv" (локальное время приёма), "account"}
 CURRENT_PO_PRICE: Dict[str, Dict] = {}
-_LAST_UPDATE_TS = 0.0
-_LOCK = threading.Lock()
+
+Listener = Callable[[dict], None]
+_LISTENERS: Dict[str, List[Listener]] = {"tick": [], "bar_close": []}
+_TASK: Optional[asyncio.Task] = None
+
+
+class FeedState:
+    """Состояние подключения и счётчики (для /metrics и диагностики)."""
+
+    def __init__(self):
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.ticks = 0
+        self.bar_closes = 0
+        self.seeded = 0
+        self.last_error: Optional[str] = None
+        self.last_msg = 0.0
+        self.lag_sum = 0.0     # recv - ts по тикам: задержка сервер → бот (+ разница часов)
+
+
+FEED = FeedState()
+
+
+# ================= LISTENERS =================
+
+def add_listener(event: str, callback: Listener):
+    """Подписаться на "tick" / "bar_close": callback(payload) в event loop фида."""
+    _LISTENERS.setdefault(event, []).append(callback)
+
+
+def remove_listener(event: str, callback: Listener):
+    if callback in _LISTENERS.get(event, []):
+        _LISTENERS[event].remove(callback)
+
+
+def _emit(event: str, data: dict):
+    for cb in list(_LISTENERS.get(event, [])):
+        try:
+            cb(data)
+        except Exception as e:
+            print(f"⚠️ PO feed listener ({event}):", e)
 
 
 # ================= INTERNAL =================
 
-def _poll_last_ticks():
+def _set_tick(symbol: str, price: float, ts: float, recv: float, account: str) -> bool:
+    old = CURRENT_PO_PRICE.get(symbol)
+    if old and old["ts"] > ts:
+        return False
+    CURRENT_PO_PRICE[symbol] = {"price": price, "ts": ts, "recv": recv, "account": account}
+    return True
+
+
+async def _seed_from_snapshot(session: aiohttp.ClientSession, http_url: str):
+    """
+    Последние тики всех символов после (пере)подключения.
+    recv — локальное время с поправкой на возраст тика по часам сервера.
+    """
+    try:
+        async with session.get(f"{http_url}/snapshot", timeout=aiohttp.ClientTimeout(total=PO_TIMEOUT)) as r:
+            r.raise_for_status()
+            data = await r.json(content_type=None)
+    except Exception as e:
+        FEED.last_error = f"snapshot: {e}"
+        return
+
+    now = time.time()
+    server_time = float(data.get("server_time") or now)
+    for symbol, t in (data.get("ticks") or {}).items():
+        if t.get("price") is None:
+            continue
+        ts = float(t.get("time") or server_time)
+        recv = now - max(server_time - ts, 0.0)
+        if _set_tick(symbol, float(t["price"]), ts, recv, t.get("account", DEFAULT_ACCOUNT)):
+            FEED.seeded += 1
+
+
+def _on_message(data: dict):
+    event = data.get("event")
+    now = time.time()
+    FEED.last_msg = now
+
+    if event == "tick":
+        symbol = data.get("symbol")
+        if not symbol or data.get("price") is None:
+            return
+        ts = float(data.get("time") or now)
+        _set_tick(symbol, float(data["price"]), ts, now, data.get("account", DEFAULT_ACCOUNT))
+        FEED.ticks += 1
+        FEED.lag_sum += now - ts
+        _emit("tick", data)
+
+    elif event == "bar_close":
+        FEED.bar_closes += 1
+        _emit("bar_close", data)
+
+
+async def start_po_price_feed(url: Optional[str] = PO_ENGINE_WS, http_url: Optional[str] = PO_ENGINE_HTTP):
     """
-    Фоновый опрос po_tick_server (/last_tick)
+    Постоянная подписка на WebSocket tick-сервера (coroutine, живёт до отмены).
+    Переподключение с экспоненциальной паузой; после подключения — /snapshot.
     """
-    global _LAST_UPDATE_TS
+    if not url:
+        return
 
+    backoff = RECONNECT_MIN
     while True:
         try:
-            r = requests.get(
-                f"{PO_TICK_SERVER_HTTP}/last_tick",
-                timeout=2
-            )
-
-            if r.status_code == 200:
-                data = r.json()
-
-                # ожидаемый формат:
-                # {
-                #   "symbol": "AUDNZD_otc",
-                #   "price": 1.28857,
-                #   "time": 1730000000.123,
-                #   "account": "REAL"
-                # }
-
-                symbol = data.get("symbol")
-                if symbol:
-                    with _LOCK:
-                        CURRENT_PO_PRICE[symbol] = {
-                            "price": float(data["price"]),
-                            "ts": float(data["time"]),
-                            "account": data.get("account", DEFAULT_ACCOUNT),
-                        }
-                        _LAST_UPDATE_TS = time.time()
-
-        except Exception:
-            pass
-
-        time.sleep(POLL_INTERVAL)
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(url, heartbeat=20) as ws:
+                    FEED.connected = True
+                    FEED.connects += 1
+                    backoff = RECONNECT_MIN
+                    print("🔌 PO price feed подключён:", url)
+                    if http_url:
+                        # тики, пришедшие во время запроса, ждут в буфере ws и новее снимка
+                        await _seed_from_snapshot(session, http_url)
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        try:
+                            _on_message(json.loads(msg.data))
+                        except (ValueError, TypeError, KeyError) as e:
+                            FEED.last_error = f"bad message: {e}"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            FEED.last_error = str(e)
+            print("⚠️ PO price feed:", e)
+        finally:
+            if FEED.connected:
+                FEED.disconnects += 1
+            FEED.connected = False
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, RECONNECT_MAX)
+
+
+def ensure_po_price_feed() -> asyncio.Task:
+    """Запустить фид в текущем event loop один раз на процесс."""
+    global _TASK
+    if _TASK is None or _TASK.done():
+        _TASK = asyncio.create_task(start_po_price_feed())
+    return _TASK
 
 
 # ================= PUBLIC API =================
 
-def start_po_price_feed():
-    """
-    Запуск фонового потока получения цен
-    """
-    t = threading.Thread(target=_poll_last_ticks, daemon=True)
-    t.start()
-    return t
+def po_feed_connected() -> bool:
+    return FEED.connected
+
+
+def tick_age(symbol: str, now: Optional[float] = None) -> Optional[float]:
+    """Сколько секунд назад пришёл последний тик символа (None — не было)."""
+    t = CURRENT_PO_PRICE.get(symbol)
+    if not t:
+        return None
+    return (now or time.time()) - t.get("recv", t["ts"])
+
+
+def po_feed_status() -> Dict[str, Any]:
+    """Подключение + свежесть каждого символа (stale — старше TICK_TTL_SEC)."""
+    now = time.time()
+    symbols = {}
+    for symbol, t in list(CURRENT_PO_PRICE.items()):
+        age = tick_age(symbol, now)
+        symbols[symbol] = {
+            "price": t["price"],
+            "age_sec": round(age, 3),
+            "stale": age > TICK_TTL_SEC,
+        }
+    return {
+        "connected": FEED.connected,
+        "connects": FEED.connects,
+        "disconnects": FEED.disconnects,
+        "ticks": FEED.ticks,
+        "bar_closes": FEED.bar_closes,
+        "seeded": FEED.seeded,
+        "avg_lag_ms": round(FEED.lag_sum / FEED.ticks * 1e3, 2) if FEED.ticks else None,
+        "last_msg_age": round(now - FEED.last_msg, 3) if FEED.last_msg else None,
+        "last_error": FEED.last_error,
+        "symbols": symbols,
+    }
 
 
 def get_po_price(pair: str, account: str = DEFAULT_ACCOUNT) -> Optional[float]:
@@ -91,7 +234,7 @@ def get_po_price(pair: str, account: str = DEFAULT_ACCOUNT) -> Optional[float]:
     if t["account"] != account:
         return None
 
-    if time.time() - t["ts"] > TICK_TTL_SEC:
+    if tick_age(asset) > TICK_TTL_SEC:
         return None
 
     return t["price"]
@@ -0,0 +1,141 @@
+# bot/price_hub.py
+# ==========================================
+# Раздача живых цен клиентам /ws (pub/sub)
+# ==========================================
+#
+# Один производитель на event loop API: раз в HUB_INTERVAL сравнивает
+# CURRENT_PO_PRICE с прошлым состоянием и раздаёт только изменившиеся тики
+# подписчикам. Подписчик — WebSocket-клиент со своим набором символов
+# (None — все) и ограниченным почтовым ящиком: на символ хранится только
+# последний тик, старый при переполнении выбрасывается (медленный клиент
+# получает свежую цену, а не очередь устаревших).
+# Клиенту уходит одна пачка за раз: все накопившиеся символы в одном кадре.
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .pocket_po_feed import CURRENT_PO_PRICE
+
+HUB_INTERVAL = 0.25       # как часто производитель сверяет цены, сек
+HUB_MAX_PENDING = 256     # максимум символов в ящике одного клиента
+
+
+def tick_payload(symbol: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "symbol": symbol,
+        "price": data.get("price"),
+        "time": data.get("ts"),
+    }
+
+
+class Subscription:
+    """Ящик одного клиента: symbol → последний тик + событие "есть что отправить"."""
+
+    def __init__(self, symbols: Optional[Iterable[str]] = None, max_pending: int = HUB_MAX_PENDING):
+        self.symbols: Optional[Set[str]] = set(symbols) if symbols is not None else None
+        self.max_pending = max_pending
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.ready = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, tick: Dict[str, Any]):
+        symbol = tick["symbol"]
+        if symbol in self.pending:
+            self.dropped += 1          # прошлый тик символа так и не ушёл — заменяем
+        elif len(self.pending) >= self.max_pending:
+            self.pending.pop(next(iter(self.pending)))
+            self.dropped += 1
+        self.pending[symbol] = tick
+        self.ready.set()
+
+    async def next_batch(self) -> List[Dict[str, Any]]:
+        await self.ready.wait()
+        self.ready.clear()
+        batch = list(self.pending.values())
+        self.pending.clear()
+        self.delivered += len(batch)
+        return batch
+
+
+class PriceHub:
+    """Производитель + подписчики. Все методы — из event loop API (uvicorn)."""
+
+    def __init__(self, interval: float = HUB_INTERVAL):
+        self.interval = interval
+        self._subs: Set[Subscription] = set()
+        self._last: Dict[str, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.published = 0
+        self._delivered = 0    # счётчики отключившихся клиентов
+        self._dropped = 0
+
+    def subscribe(self, symbols: Optional[Iterable[str]] = None) -> Subscription:
+        sub = Subscription(symbols)
+        self._subs.add(sub)
+        self.prime(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._produce())
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        if sub in self._subs:
+            self._subs.discard(sub)
+            self._delivered += sub.delivered
+            self._dropped += sub.dropped
+
+    def set_symbols(self, sub: Subscription, symbols: Optional[Iterable[str]]):
+        sub.symbols = set(symbols) if symbols is not None else None
+        sub.pending = {s: t for s, t in sub.pending.items() if sub.wants(s)}
+        self.prime(sub)
+
+    def prime(self, sub: Subscription):
+        """Новому подписчику — текущие цены его символов сразу, не дожидаясь изменений."""
+        for symbol, data in list(CURRENT_PO_PRICE.items()):
+            if data.get("price") and sub.wants(symbol):
+                sub.offer(tick_payload(symbol, data))
+
+    def publish(self, ticks: List[Dict[str, Any]]):
+        """Раздать изменившиеся тики заинтересованным подписчикам."""
+        self.published += len(ticks)
+        for sub in self._subs:
+            for tick in ticks:
+                if sub.wants(tick["symbol"]):
+                    sub.offer(tick)
+
+    def _changed(self) -> List[Dict[str, Any]]:
+        ticks = []
+        for symbol, data in list(CURRENT_PO_PRICE.items()):
+            price = data.get("price")
+            if not price:
+                continue
+            key = (price, data.get("ts"))
+            if self._last.get(symbol) != key:
+                self._last[symbol] = key
+                ticks.append(tick_payload(symbol, data))
+        return ticks
+
+    async def _produce(self):
+        while self._subs:
+            self.cycles += 1
+            ticks = self._changed()
+            if ticks:
+                self.publish(ticks)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        subs = list(self._subs)
+        return {
+            "subscribers": len(subs),
+            "cycles": self.cycles,
+            "published": self.published,
+            "delivered": self._delivered + sum(s.delivered for s in subs),
+            "dropped": self._dropped + sum(s.dropped for s in subs),
+        }
+
+
+PRICE_HUB = PriceHub()
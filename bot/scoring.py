@@ -1,9 +1,17 @@
 import math
+
+import numpy as np
 import pandas as pd
 
-from .indicators import compute_indicators, compute_macd, EMA_PERIOD, ATR_K
-from .levels import get_swing_levels
-from .smc import detect_reversal, detect_smc_levels
+from .indicators import ATR_K, IndicatorArrays, compute_macd, indicator_arrays, macd_summary
+from .levels import get_swing_levels, swing_level_sets
+from .smc import (
+    detect_reversal,
+    detect_reversal_arrays,
+    detect_smc_levels,
+    detect_smc_levels_arrays,
+    swing_points,
+)
 
 
 def detect_candlestick_pattern(df: pd.DataFrame):
@@ -25,33 +33,72 @@ def detect_candlestick_pattern(df: pd.DataFrame):
     return None
 
 
+def candlestick_pattern_arrays(o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray):
+    """detect_candlestick_pattern по последним двум барам массивов OHLC."""
+    last_o, last_h, last_l, last_c = o[-1].item(), h[-1].item(), l[-1].item(), c[-1].item()
+    prev_o, prev_c = o[-2].item(), c[-2].item()
+
+    if last_c > last_o and last_o < prev_c and last_c > prev_o:
+        return "BULLISH_ENGULF"
+
+    if last_c < last_o and last_o > prev_c and last_c < prev_o:
+        return "BEARISH_ENGULF"
+
+    body = abs(last_c - last_o)
+    lower_shadow = min(last_o, last_c) - last_l
+    upper_shadow = last_h - max(last_o, last_c)
+    if lower_shadow > body * 2 and upper_shadow < body * 0.5:
+        return "HAMMER"
+
+    return None
+
+
+def _empty_tf_result():
+    return {
+        "direction": "NONE",
+        "score": 0.0,
+        "macd_diff": 0.0,
+        "macd_vote": 0,
+        "rsi": 0.0,
+        "rsi_vote": 0,
+        "rsi_pro_active": False,
+        "reversal_up": False,
+        "reversal_down": False,
+        "div_buy": False,
+        "div_sell": False,
+        "impulse": 0.0,
+        "pattern": "NONE",
+        "ema20": 0.0,
+        "ema_vote": 0,
+        "near_support": False,
+        "near_resistance": False,
+        "smc_type": None,
+        "smc_strength": 0.0,
+        "swing_high": None,
+        "swing_low": None,
+        "rejection_up": False,
+        "rejection_down": False,
+    }
+
+
+_NO_SMC = {
+    "swing_high": None,
+    "swing_low": None,
+    "type": None,
+    "strength": 0.0,
+    "rejection_up": False,
+    "rejection_down": False,
+}
+
+
 def score_on_tf(df: pd.DataFrame, tf_name: str):
+    """
+    Эталонная оценка TF на pandas (прежний конвейер): df после compute_indicators,
+    compute_macd по копии, rolling ATR. В анализе — быстрый путь score_on_arrays,
+    сверка с этим эталоном: python -m bot.selfcheck --only scoring.
+    """
     if len(df) < 60:
-        return {
-            "direction": "NONE",
-            "score": 0.0,
-            "macd_diff": 0.0,
-            "macd_vote": 0,
-            "rsi": 0.0,
-            "rsi_vote": 0,
-            "rsi_pro_active": False,
-            "reversal_up": False,
-            "reversal_down": False,
-            "div_buy": False,
-            "div_sell": False,
-            "impulse": 0.0,
-            "pattern": "NONE",
-            "ema20": 0.0,
-            "ema_vote": 0,
-            "near_support": False,
-            "near_resistance": False,
-            "smc_type": None,
-            "smc_strength": 0.0,
-            "swing_high": None,
-            "swing_low": None,
-            "rejection_up": False,
-            "rejection_down": False,
-        }
+        return _empty_tf_result()
 
     df = df.copy()
     df = df.sort_values("datetime") if "datetime" in df.columns else df
@@ -244,6 +291,266 @@ def score_on_tf(df: pd.DataFrame, tf_name: str):
     }
 
 
+def score_on_arrays(
+    o: np.ndarray,
+    h: np.ndarray,
+    l: np.ndarray,
+    c: np.ndarray,
+    tf_name: str,
+    ind: IndicatorArrays | None = None,
+):
+    """
+    Быстрый путь score_on_tf без pandas: непрерывные float64-массивы OHLC
+    (по возрастанию времени) и, если уже посчитаны, индикаторы.
+    Результат совпадает со score_on_tf(compute_indicators(df)) на тех же барах.
+    """
+    if len(c) < 60:
+        return _empty_tf_result()
+
+    o, h, l, c = (np.ascontiguousarray(x, dtype="float64") for x in (o, h, l, c))
+    if ind is None:
+        ind = indicator_arrays(c, h, l)
+
+    swings = swing_points(h, l)
+    support = resistance = None
+    if tf_name == "M1":
+        levels = swing_level_sets(h, l, (40,))[40]
+        support, resistance = levels["support"], levels["resistance"]
+
+    return _score_tf(
+        tf_name,
+        price=c[-1].item(),
+        ema20=ind.ema20[-1].item(),
+        ema12=ind.ema12[-1].item(),
+        ema26=ind.ema26[-1].item(),
+        macd_data=macd_summary(ind, h, l),
+        rsi=ind.rsi[-1].item(),
+        rsi_prev=ind.rsi[-2].item(),
+        atr_last=ind.atr[-1].item(),
+        impulse_raw=ind.impulse[-1].item(),
+        rev_info=detect_reversal_arrays(h, l, c, swings=swings),
+        pattern=candlestick_pattern_arrays(o, h, l, c),
+        support=support,
+        resistance=resistance,
+        smc=detect_smc_levels_arrays(h, l, c, swings=swings) if tf_name == "M1" else _NO_SMC,
+    )
+
+
+def score_tfs(items):
+    """
+    Оценка нескольких TF одной пары: [(tf_name, o, h, l, c), ...] →
+    [результат score_on_arrays + "tf", ...]. Для пула процессов (executor.run_cpu):
+    на входе только numpy-массивы и строки.
+    """
+    results = []
+    for tf_name, o, h, l, c in items:
+        res = score_on_arrays(o, h, l, c, tf_name)
+        res["tf"] = tf_name
+        results.append(res)
+    return results
+
+
+def _score_tf(
+    tf_name: str,
+    *,
+    price: float,
+    ema20: float,
+    ema12: float,
+    ema26: float,
+    macd_data: dict,
+    rsi: float,
+    rsi_prev: float,
+    atr_last: float,
+    impulse_raw: float,
+    rev_info: dict,
+    pattern,
+    support,
+    resistance,
+    smc: dict,
+):
+    """Голоса, веса и фильтры M1 для score_on_arrays (те же правила, что в эталонном score_on_tf)."""
+    trend_up = ema12 > ema26 and price > ema20
+    trend_down = ema12 < ema26 and price < ema20
+    ema_vote = 1 if trend_up else -1 if trend_down else 0
+
+    macd = macd_data["macd"]
+    macd_sig = macd_data["macd_signal"]
+    macd_hist = macd_data["macd_hist"]
+    div_buy = macd_data["div_buy"]
+    div_sell = macd_data["div_sell"]
+
+    macd_diff = macd - macd_sig
+    if abs(macd_diff) < abs(macd_hist) * 0.3:
+        macd_vote = 0
+    else:
+        macd_vote = 1 if macd_diff > 0 else -1
+
+    rsi_pro_active = False
+    if rsi > 55 and rsi > rsi_prev and trend_up:
+        rsi_vote = 1
+        rsi_pro_active = True
+    elif rsi < 40 and rsi < rsi_prev and trend_down:
+        rsi_vote = -1
+        rsi_pro_active = True
+    else:
+        rsi_vote = 0
+
+    if math.isnan(atr_last):
+        atr_last = None
+    if math.isnan(impulse_raw):
+        impulse_raw = 0.0
+
+    if impulse_raw > 0.7:
+        impulse_vote = 1
+    elif impulse_raw < -0.7:
+        impulse_vote = -1
+    elif impulse_raw > 0.4:
+        impulse_vote = 0.5
+    elif impulse_raw < -0.4:
+        impulse_vote = -0.5
+    else:
+        impulse_vote = 0.0
+
+    reversal_up = bool(rev_info["reversal_up"])
+    reversal_down = bool(rev_info["reversal_down"])
+    rev_strength = float(rev_info.get("strength", 0.0))
+
+    rev_vote = 0
+    if reversal_up:
+        rev_vote = 1
+    elif reversal_down:
+        rev_vote = -1
+    rev_weight_factor = min(1.0 + rev_strength * 10.0, 2.0)
+
+    pat_vote = 0
+    if pattern in ("BULLISH_ENGULF", "HAMMER"):
+        pat_vote = 1
+    elif pattern in ("BEARISH_ENGULF", "SHOOTING_STAR"):
+        pat_vote = -1
+
+    near_support = False
+    near_resistance = False
+
+    if tf_name == "M1":
+        if atr_last is not None and atr_last > 0:
+            level_eps = atr_last * 1.2
+        else:
+            level_eps = price * 0.0005
+        if support is not None and price >= support and (price - support) <= level_eps:
+            near_support = True
+        if resistance is not None and price <= resistance and (resistance - price) <= level_eps:
+            near_resistance = True
+
+    w = {
+        "ema": 1.0,
+        "macd": 1.8,
+        "rsi": 2.0,
+        "imp": 1.5,
+        "rev": 2.3,
+        "div": 0.8,
+        "pat": 0.7,
+    }
+
+    total = 0.0
+    total += ema_vote * w["ema"]
+    total += macd_vote * w["macd"]
+    total += rsi_vote * w["rsi"]
+    total += impulse_vote * w["imp"]
+
+    if rev_vote != 0:
+        total += rev_vote * w["rev"] * rev_weight_factor
+
+    if div_buy:
+        total += w["div"]
+    elif div_sell:
+        total -= w["div"]
+
+    total += pat_vote * w["pat"]
+
+    direction = "NONE"
+    if total > 0.5:
+        direction = "BUY"
+    elif total < -0.5:
+        direction = "SELL"
+
+    if tf_name == "M1":
+        if direction == "BUY" and near_resistance:
+            direction = "NONE"
+            total -= 3
+        if direction == "SELL" and near_support:
+            direction = "NONE"
+            total += 3
+
+        smc_high = smc["swing_high"]
+        smc_low = smc["swing_low"]
+        rejection_up = smc["rejection_up"]
+        rejection_down = smc["rejection_down"]
+
+        if direction == "BUY" and smc_high and price >= smc_high * 0.998:
+            direction = "NONE"
+            total -= 2
+        if direction == "SELL" and smc_low and price <= smc_low * 1.002:
+            direction = "NONE"
+            total += 2
+
+        if rejection_down:
+            direction = "SELL"
+            total -= 3
+        if rejection_up:
+            direction = "BUY"
+            total += 3
+
+        if (near_resistance or near_support) and abs(total) < 2:
+            direction = "NONE"
+    else:
+        rejection_up = False
+        rejection_down = False
+
+    return {
+        "direction": direction,
+        "score": round(float(total), 4),
+        "macd_diff": float(macd_diff),
+        "macd_vote": int(macd_vote),
+        "rsi": float(rsi),
+        "rsi_vote": int(rsi_vote),
+        "rsi_pro_active": bool(rsi_pro_active),
+        "reversal_up": bool(reversal_up),
+        "reversal_down": bool(reversal_down),
+        "div_buy": bool(div_buy),
+        "div_sell": bool(div_sell),
+        "impulse": float(impulse_raw),
+        "pattern": pattern,
+        "ema20": float(ema20),
+        "ema_vote": int(ema_vote),
+        "near_support": bool(near_support),
+        "near_resistance": bool(near_resistance),
+        "smc_type": smc.get("type"),
+        "smc_strength": smc.get("strength"),
+        "swing_high": smc.get("swing_high"),
+        "swing_low": smc.get("swing_low"),
+        "rejection_up": smc.get("rejection_up"),
+        "rejection_down": smc.get("rejection_down"),
+    }
+
+
+def overall_direction(tf_results):
+    """Итоговое направление пары по результатам TF (анализ и пакетная оценка)."""
+    m1 = next((r for r in tf_results if r.get("tf") == "M1"), None)
+    dirs = [r["direction"] for r in tf_results]
+    buy_count = dirs.count("BUY")
+    sell_count = dirs.count("SELL")
+
+    # 1) Для частых сигналов — главное направление М1
+    if m1 and m1["direction"] in ("BUY", "SELL"):
+        return m1["direction"]
+    # 2) Если М1 дал NONE — голосование TF
+    if buy_count > sell_count:
+        return "BUY"
+    if sell_count > buy_count:
+        return "SELL"
+    return "NONE"
+
+
 def calc_overall_probability(tf_results):
     m1  = next((x for x in tf_results if x.get("tf") == "M1"), None)
     m5  = next((x for x in tf_results if x.get("tf") == "M5"), None)
@@ -0,0 +1,459 @@
+# bot/selfcheck.py
+# ==========================================
+# Дифференциальные проверки быстрых путей
+# ==========================================
+#
+# Запуск:  python -m bot.selfcheck [--count 300] [--only smc ...]
+#
+# Каждая проверка сравнивает оптимизированную реализацию с эталоном
+# (прежний код или pandas) на случайных свечах: обычные, с округлёнными ценами
+# (много равных экстремумов), плоские, крупного масштаба, с тяжёлыми хвостами и с NaN.
+# Код выхода 1, если есть хоть одно расхождение. Данные синтетические, сеть не нужна.
+
+import argparse
+import json
+import math
+import sys
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from .bench import legacy_pass, make_frame
+from .indicator_state import IndicatorState
+from .batch_scoring import indicator_matrix, score_batch, stack_frames
+from .indicators import compute_indicators, indicator_arrays
+from .levels import get_swing_levels
+from .scoring import calc_overall_probability, overall_direction, score_on_arrays, score_on_tf
+from .smc import detect_reversal, detect_smc_levels
+
+
+def same(a: dict, b: dict) -> bool:
+    """Равенство результатов: те же ключи и значения, NaN == NaN."""
+    if a.keys() != b.keys():
+        return False
+    for k, x in a.items():
+        y = b[k]
+        if isinstance(x, float) and isinstance(y, float) and math.isnan(x) and math.isnan(y):
+            continue
+        if x != y:
+            return False
+    return True
+
+
+def random_frame(rng: np.random.Generator, i: int, lo: int = 8, hi: int = 400) -> pd.DataFrame:
+    """make_frame со случайной длиной и режимом (0..4); каждый седьмой набор — с NaN в OHLC."""
+    df = make_frame(int(rng.integers(lo, hi)), seed=int(rng.integers(1 << 31)), mode=i % 5)
+    if i % 7 == 6:
+        for col in ("high", "low", "close"):
+            df.loc[rng.random(len(df)) < 0.05, col] = np.nan
+    return df
+
+
+def _report(name: str, i: int, df: pd.DataFrame, ref: dict, got: dict, extra: str = ""):
+    diff = {k: (ref[k], got.get(k)) for k in ref if not same({k: ref[k]}, {k: got.get(k)})}
+    print(f"❌ {name}: набор {i} ({len(df)} баров{extra}): {diff}")
+
+
+# ---------- smc: swing_points против прежнего цикла по iloc ----------
+
+def _legacy_last_swing(df: pd.DataFrame, start: int, k: int, col: str, fn: str):
+    """Прежний поиск swing: цикл от start вниз, окно iloc[i - k : i + k + 1]."""
+    for i in range(start, k, -1):
+        w = df.iloc[i - k: i + k + 1]
+        if float(df.iloc[i][col]) == float(getattr(w[col], fn)()):
+            return i
+    return None
+
+
+def legacy_detect_reversal(df: pd.DataFrame, swing_lookback: int = 3) -> dict:
+    none = {
+        "reversal_up": False,
+        "reversal_down": False,
+        "type": "NONE",
+        "strength": 0.0,
+        "last_swing_high": None,
+        "last_swing_low": None,
+    }
+    if df is None or len(df) < swing_lookback * 4:
+        return none
+
+    close = df["close"].iloc[-1]
+    start = len(df) - swing_lookback * 2
+    swing_high_idx = _legacy_last_swing(df, start, swing_lookback, "high", "max")
+    swing_low_idx = _legacy_last_swing(df, start, swing_lookback, "low", "min")
+    if swing_high_idx is None or swing_low_idx is None:
+        return none
+
+    last_swing_high = df["high"].values[swing_high_idx]
+    last_swing_low = df["low"].values[swing_low_idx]
+
+    reversal_up = reversal_down = False
+    reversal_type = "NONE"
+    strength = 0.0
+    if close > last_swing_high:
+        reversal_up = True
+        strength = (close - last_swing_high) / last_swing_high
+        reversal_type = "CHoCH_UP"
+    if close < last_swing_low:
+        reversal_down = True
+        strength = (last_swing_low - close) / last_swing_low
+        reversal_type = "CHoCH_DOWN"
+    if reversal_up and reversal_down:
+        if abs(close - last_swing_high) > abs(close - last_swing_low):
+            reversal_down = False
+            reversal_type = "CHoCH_UP"
+        else:
+            reversal_up = False
+            reversal_type = "CHoCH_DOWN"
+    if reversal_up and close > last_swing_high * 1.001:
+        reversal_type = "BOS_UP"
+    if reversal_down and close < last_swing_low * 0.999:
+        reversal_type = "BOS_DOWN"
+
+    return {
+        "reversal_up": reversal_up,
+        "reversal_down": reversal_down,
+        "type": reversal_type,
+        "strength": float(strength),
+        "last_swing_high": float(last_swing_high),
+        "last_swing_low": float(last_swing_low),
+    }
+
+
+def legacy_detect_smc_levels(df: pd.DataFrame, swing_lookback: int = 3, tolerance_factor: float = 0.5) -> dict:
+    none = {
+        "swing_high": None,
+        "swing_low": None,
+        "type": "NONE",
+        "strength": 0.0,
+        "rejection_up": False,
+        "rejection_down": False,
+    }
+    if df is None or len(df) < swing_lookback * 3:
+        return none
+
+    close = df["close"].iloc[-1]
+    high = df["high"].iloc[-1]
+    low = df["low"].iloc[-1]
+    tolerance = (high - low) * tolerance_factor
+
+    swing_high_idx = _legacy_last_swing(df, len(df) - 6, swing_lookback, "high", "max")
+    swing_low_idx = _legacy_last_swing(df, len(df) - 6, swing_lookback, "low", "min")
+    if swing_high_idx is None or swing_low_idx is None:
+        return none
+
+    swing_high = df["high"].values[swing_high_idx]
+    swing_low = df["low"].values[swing_low_idx]
+
+    rejection_up = rejection_down = False
+    strength = 0.0
+    if high >= swing_high - tolerance and close < swing_high:
+        rejection_down = True
+        strength = (high - close) / (swing_high + 1e-9)
+    if low <= swing_low + tolerance and close > swing_low:
+        rejection_up = True
+        strength = (close - low) / (swing_low + 1e-9)
+
+    if close > swing_high * 1.001:
+        stype = "BOS_UP"
+    elif close < swing_low * 0.999:
+        stype = "BOS_DOWN"
+    elif close > swing_high:
+        stype = "CHoCH_UP"
+    elif close < swing_low:
+        stype = "CHoCH_DOWN"
+    elif rejection_up:
+        stype = "REJECTION_UP"
+    elif rejection_down:
+        stype = "REJECTION_DOWN"
+    else:
+        stype = "NONE"
+
+    return {
+        "swing_high": float(swing_high),
+        "swing_low": float(swing_low),
+        "type": stype,
+        "strength": float(strength),
+        "rejection_up": rejection_up,
+        "rejection_down": rejection_down,
+    }
+
+
+def check_smc(count: int, seed: int = 0) -> int:
+    """detect_reversal / detect_smc_levels (swing_points) против цикла по iloc, k = 2..4."""
+    rng = np.random.default_rng(seed)
+    bad = 0
+    for i in range(count):
+        df = random_frame(rng, i, lo=6, hi=160)
+        for k in (2, 3, 4):
+            for name, fast, legacy in (
+                ("detect_reversal", detect_reversal, legacy_detect_reversal),
+                ("detect_smc_levels", detect_smc_levels, legacy_detect_smc_levels),
+            ):
+                ref, got = legacy(df, k), fast(df, k)
+                if not same(ref, got):
+                    bad += 1
+                    _report(name, i, df, ref, got, f", k={k}")
+    print(f"smc: {count} наборов × k=2..4, расхождений: {bad}")
+    return bad
+
+
+# ---------- indicator_state: потоковые индикаторы против pandas ----------
+
+STATE_COLUMNS = ("EMA20", "EMA12", "EMA26", "MACD", "MACD_sig", "RSI")
+
+
+def check_indicator_state(count: int, seed: int = 0) -> int:
+    """
+    IndicatorState по барам против compute_indicators (pandas ewm) — на каждом
+    баре, бит-в-бит; плюс снимок в JSON посередине серии и продолжение.
+    """
+    rng = np.random.default_rng(seed)
+    bad = 0
+    for i in range(count):
+        df = random_frame(rng, i, lo=2, hi=300)
+        ref_rows = compute_indicators(df)[list(STATE_COLUMNS)].to_numpy().tolist()
+        cut = int(rng.integers(1, len(df)))
+
+        st = IndicatorState()
+        for j, row in enumerate(df[["time", "close"]].itertuples(index=False)):
+            if j == cut:
+                st = IndicatorState.from_snapshot(json.loads(json.dumps(st.snapshot())))
+            got = st.update(row.time, row.close)
+            want = dict(zip(STATE_COLUMNS, ref_rows[j]))
+            if not same(want, got):
+                bad += 1
+                _report("IndicatorState", i, df, want, got, f", бар {j}, снимок на {cut}")
+                break
+        else:
+            whole = IndicatorState.from_frame(df).values
+            if not same(st.values, whole):
+                bad += 1
+                _report("IndicatorState.from_frame", i, df, st.values, whole)
+    print(f"indicator_state: {count} наборов, по каждому бару, расхождений: {bad}")
+    return bad
+
+
+# ---------- indicators: indicator_arrays против прежнего pandas-расчёта ----------
+
+# поле IndicatorArrays → колонка legacy_pass (прежний расчёт на pandas)
+INDICATOR_COLUMNS = {
+    "ema20": "EMA20",
+    "ema12": "EMA12",
+    "ema26": "EMA26",
+    "macd": "MACD",
+    "macd_sig": "MACD_sig",
+    "macd_hist": "macd_hist",
+    "rsi": "RSI",
+    "atr": "ATR",
+    "impulse": "impulse",
+}
+
+
+def check_indicators(count: int, seed: int = 0) -> int:
+    """
+    indicator_arrays и batch_scoring.indicator_matrix против legacy_pass.
+    Рекурсии с обеих сторон считает pandas, остальное — те же операции IEEE,
+    поэтому сравнение точное.
+    """
+    rng = np.random.default_rng(seed)
+    bad = 0
+    frames = []
+    for i in range(count):
+        df = random_frame(rng, i, lo=2, hi=400)
+        ref = legacy_pass(df)
+        c, h, l = (df[k].to_numpy(dtype="float64") for k in ("close", "high", "low"))
+        if len(df) >= 60:
+            frames.append(df)
+
+        got = {}
+        ind = indicator_arrays(c, h, l)
+        for name, col in INDICATOR_COLUMNS.items():
+            if not np.array_equal(getattr(ind, name), ref[col].to_numpy(), equal_nan=True):
+                got[f"indicator_arrays.{name}"] = "≠"
+        if got:
+            bad += 1
+            print(f"❌ indicators: набор {i} ({len(df)} баров): {got}")
+
+    # пакет: матрица из наборов одной длины (последние 60 баров)
+    if frames:
+        tail = [df.tail(60) for df in frames]
+        c, h, l = (np.stack([d[k].to_numpy(dtype="float64") for d in tail]) for k in ("close", "high", "low"))
+        ind = indicator_matrix(c, h, l)
+        for j, d in enumerate(tail):
+            ref = legacy_pass(d.reset_index(drop=True))
+            diff = [
+                name for name, col in INDICATOR_COLUMNS.items()
+                if not np.array_equal(getattr(ind, name)[j], ref[col].to_numpy(), equal_nan=True)
+            ]
+            if diff:
+                bad += 1
+                print(f"❌ indicator_matrix: строка {j}: {diff}")
+    print(f"indicators: {count} наборов + пакет из {len(frames)}, расхождений: {bad}")
+    return bad
+
+
+# ---------- scoring: score_on_arrays против эталонного score_on_tf ----------
+
+def legacy_get_swing_levels(df: pd.DataFrame, lookback: int = 60):
+    """levels.get_swing_levels в том виде, как он был (цикл по iloc)."""
+    if len(df) < lookback + 5:
+        return None, None
+
+    swings_high = []
+    swings_low = []
+
+    for i in range(2, lookback):
+        idx = -i
+        if idx - 1 < -len(df) or idx + 1 >= 0:
+            continue
+        if df["high"].iloc[idx] > df["high"].iloc[idx - 1] and df["high"].iloc[idx] > df["high"].iloc[idx + 1]:
+            swings_high.append(df["high"].iloc[idx])
+        if df["low"].iloc[idx] < df["low"].iloc[idx - 1] and df["low"].iloc[idx] < df["low"].iloc[idx + 1]:
+            swings_low.append(df["low"].iloc[idx])
+
+    resistance = max(swings_high) if swings_high else None
+    support = min(swings_low) if swings_low else None
+
+    return support, resistance
+
+
+def flat_frame(n: int) -> pd.DataFrame:
+    """Свечи без движения: все цены равны (ATR = 0, RSI = NaN)."""
+    df = make_frame(n)
+    df[["open", "high", "low", "close"]] = 1.25
+    return df
+
+
+def _score(fn, *args):
+    """Результат оценки или тип исключения — оба пути должны падать одинаково."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return {"error": type(e).__name__}
+
+
+def check_scoring(count: int, seed: int = 0) -> int:
+    """
+    score_on_arrays (быстрый путь без pandas) против score_on_tf — прежнего
+    конвейера на pandas (compute_indicators → compute_macd → rolling ATR), M1 и M5.
+    Уровни get_swing_levels, которые эталон берёт из levels, — против прежнего цикла.
+    """
+    rng = np.random.default_rng(seed)
+    bad = 0
+    for i in range(count):
+        df = flat_frame(int(rng.integers(55, 200))) if i % 11 == 10 else random_frame(rng, i, lo=55, hi=400)
+        arrays = tuple(df[k].to_numpy(dtype="float64") for k in ("open", "high", "low", "close"))
+        ref_df = compute_indicators(df)
+        for tf in ("M1", "M5"):
+            ref = _score(score_on_tf, ref_df, tf)
+            got = _score(score_on_arrays, *arrays, tf)
+            if not same(ref, got):
+                bad += 1
+                _report("score_on_arrays", i, df, ref, got, f", {tf}")
+        ref = dict(zip(("support", "resistance"), legacy_get_swing_levels(df, 40)))
+        got = dict(zip(("support", "resistance"), get_swing_levels(df, 40)))
+        if not same(ref, got):
+            bad += 1
+            _report("get_swing_levels", i, df, ref, got)
+    print(f"scoring: {count} наборов × 2 TF, расхождений: {bad}")
+    return bad
+
+
+# ---------- batch: score_batch против оценки каждой пары отдельно ----------
+
+BATCH_TFS = ("M1", "M5", "M15")
+
+
+def check_batch(count: int, seed: int = 0) -> int:
+    """
+    batch_scoring.score_batch против score_on_arrays + overall_direction +
+    calc_overall_probability по каждой паре. Стопки по 2-12 пар на 3 TF
+    (длины истории TF разные или одинаковые), часть пар — с NaN или короткой
+    историей: stack_frames должен отсеять ровно их, как в autoscan.prefilter_pairs.
+    """
+    rng = np.random.default_rng(seed)
+    bad = 0
+    rounds = max(count // 10, 1)
+    scored = 0
+    for r in range(rounds):
+        p = int(rng.integers(2, 13))
+        same_len = r % 2 == 0
+        bars = {tf: int(rng.integers(60, 160)) for tf in BATCH_TFS}
+        if same_len:
+            bars = dict.fromkeys(BATCH_TFS, bars["M1"])
+        frames = {tf: [] for tf in BATCH_TFS}
+        for j in range(p):
+            for tf in BATCH_TFS:
+                i = r * 100 + j
+                short = rng.random() < 0.1
+                frames[tf].append(random_frame(rng, i, lo=bars[tf] - 30 if short else bars[tf], hi=bars[tf] + 60))
+
+        ok = set(range(p))
+        for tf in BATCH_TFS:
+            _, rows = stack_frames(frames[tf], bars[tf])
+            want = [
+                j for j, df in enumerate(frames[tf])
+                if len(df) >= bars[tf] and not df[["open", "high", "low", "close"]].tail(bars[tf]).isna().any().any()
+            ]
+            if rows != want:
+                bad += 1
+                print(f"❌ stack_frames: стопка {r}, {tf}: {rows} вместо {want}")
+            ok &= set(rows)
+        batch = sorted(ok)
+        if not batch:
+            continue
+
+        pairs = [f"P{j}" for j in batch]
+        ohlc = {tf: stack_frames([frames[tf][j] for j in batch], bars[tf])[0] for tf in BATCH_TFS}
+        got = score_batch(pairs, ohlc)
+        for k, (pair, j) in enumerate(zip(pairs, batch)):
+            tf_results = []
+            for tf in BATCH_TFS:
+                res = score_on_arrays(*(m[k] for m in ohlc[tf]), tf)
+                res["tf"] = tf
+                tf_results.append(res)
+            ref = {
+                "dir": overall_direction(tf_results),
+                "score": next(x["score"] for x in tf_results if x["tf"] == "M1"),
+                "prob": calc_overall_probability(tf_results),
+            }
+            have = {key: got[pair][key] for key in ref}
+            for ref_tf, got_tf in zip(tf_results, got[pair]["tf_results"]):
+                ref_tf = {key: ref_tf[key] for key in got_tf}
+                if not same(ref_tf, got_tf):
+                    diff = {key: (ref_tf[key], got_tf[key]) for key in got_tf if not same({key: ref_tf[key]}, {key: got_tf[key]})}
+                    have[ref_tf["tf"]] = diff
+            if not same(ref, have):
+                bad += 1
+                print(f"❌ score_batch: стопка {r}, пара {j} ({bars}): {ref} ≠ {have}")
+            scored += 1
+    print(f"batch: {rounds} стопок, {scored} пар × {len(BATCH_TFS)} TF, расхождений: {bad}")
+    return bad
+
+
+CHECKS: Dict[str, Callable[[int, int], int]] = {
+    "smc": check_smc,
+    "indicator_state": check_indicator_state,
+    "indicators": check_indicators,
+    "scoring": check_scoring,
+    "batch": check_batch,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка быстрых путей с эталонными реализациями")
+    parser.add_argument("--count", type=int, default=300, help="случайных наборов на проверку")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(CHECKS), help="только эти проверки")
+    args = parser.parse_args()
+
+    bad = 0
+    for name in args.only or CHECKS:
+        bad += CHECKS[name](args.count, args.seed)
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
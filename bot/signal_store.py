@@ -0,0 +1,378 @@
+# bot/signal_store.py
+# ==========================================
+# Хранилище сигналов на SQLite (WAL)
+# ==========================================
+#
+# Одна таблица signals со схемой SIGNAL_COLUMNS и индексами
+#   (pair, timestamp_utc)       — история / статистика по паре,
+#   (evaluated, timestamp_utc)  — неоценённые и оценённые сигналы за окно.
+# Писатель один (поток с очередью, коммит пачкой), читатели — свои соединения
+# на поток: в WAL чтение не блокирует запись и наоборот.
+# Тот же интерфейс, что у CSV-журнала (bot/logger.py): append / update / read /
+# flush / close / stats. Импорт старых CSV — python -m bot.migrate_signals.
+
+import atexit
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .config import SIGNAL_FSYNC_BATCH, SIGNAL_FSYNC_INTERVAL
+
+# (колонка, тип SQLite); порядок = порядок колонок CSV-журнала
+SIGNAL_SCHEMA: List[Tuple[str, str]] = [
+    ("timestamp_utc", "TEXT"),
+    ("pair", "TEXT"),
+    ("direction", "TEXT"),
+    ("probability", "REAL"),
+    ("expiry_min", "INTEGER"),
+    ("entry_price", "REAL"),
+    ("evaluated", "BOOL"),
+    ("result", "TEXT"),
+    ("ema20", "REAL"),
+    ("macd_diff", "REAL"),
+    ("macd_vote", "INTEGER"),
+    ("rsi", "REAL"),
+    ("rsi_vote", "INTEGER"),
+    ("rsi_pro_active", "BOOL"),
+    ("impulse", "REAL"),
+    ("pattern", "TEXT"),
+    ("reversal_up", "BOOL"),
+    ("reversal_down", "BOOL"),
+    ("div_buy", "BOOL"),
+    ("div_sell", "BOOL"),
+    ("near_support", "BOOL"),
+    ("near_resistance", "BOOL"),
+    ("smc_type", "TEXT"),
+    ("smc_strength", "REAL"),
+    ("price_at_expiry", "REAL"),
+]
+SIGNAL_COLUMNS = [c for c, _ in SIGNAL_SCHEMA]
+_TYPES = dict(SIGNAL_SCHEMA)
+_BOOL_COLUMNS = [c for c, t in SIGNAL_SCHEMA if t == "BOOL"]
+
+_DDL = [
+    "CREATE TABLE IF NOT EXISTS signals ("
+    + ", ".join(
+        f"{c} {t} NOT NULL" if c in ("timestamp_utc", "pair")
+        else f"{c} {t} NOT NULL DEFAULT 0" if c == "evaluated"
+        else f"{c} {t}"
+        for c, t in SIGNAL_SCHEMA
+    )
+    + ", UNIQUE (timestamp_utc, pair))",
+    "CREATE INDEX IF NOT EXISTS idx_signals_pair_ts ON signals (pair, timestamp_utc)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_eval_ts ON signals (evaluated, timestamp_utc)",
+]
+
+_INSERT = (
+    f"INSERT OR IGNORE INTO signals ({', '.join(SIGNAL_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in SIGNAL_COLUMNS)})"
+)
+
+
+def _sql_value(col: str, v: Any) -> Any:
+    """Значение строки сигнала → тип колонки SQLite (None для пустых / NaN)."""
+    if v is None:
+        return None
+    if hasattr(v, "item"):          # numpy-скаляры
+        v = v.item()
+    if isinstance(v, float) and v != v:
+        return None
+    t = _TYPES.get(col, "TEXT")
+    if t == "BOOL":
+        return int(bool(v))
+    if t == "INTEGER" and isinstance(v, float):
+        return int(v)
+    return v
+
+
+def row_from_csv(rec: Dict[str, str]) -> List[Any]:
+    """Строка CSV-журнала (всё строками) → значения для INSERT."""
+    values = []
+    for col, t in SIGNAL_SCHEMA:
+        v = rec.get(col)
+        if v is None or v == "" or v == "nan":
+            values.append(0 if col == "evaluated" else None)
+        elif t == "BOOL":
+            values.append(int(v in ("True", "true", "1", "1.0")))
+        elif t == "REAL":
+            values.append(float(v))
+        elif t == "INTEGER":
+            values.append(int(float(v)))
+        else:
+            values.append(v)
+    return values
+
+
+class SQLiteSignalStore:
+    """
+    Сигналы в SQLite (journal_mode=WAL, synchronous=NORMAL).
+
+    - append / update кладутся в очередь; поток-писатель выполняет их пачкой
+      в одной транзакции (коммит раз в fsync_interval сек или каждые fsync_batch операций);
+    - read(since, pairs, evaluated) — индексный запрос, соединение своё на каждый поток.
+    """
+
+    def __init__(self, path: Path, fsync_interval: float = SIGNAL_FSYNC_INTERVAL,
+                 fsync_batch: int = SIGNAL_FSYNC_BATCH,
+                 seed: Optional[Callable[[], Iterable[Path]]] = None):
+        self.path = Path(path)
+        self.seed = seed                  # CSV для импорта, если базы ещё нет
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        self.appended = 0
+        self.updated = 0
+        self.commits = 0
+        self.errors = 0
+        self._ready = False
+
+    def _init_db(self):
+        """Схема и индексы — при первом обращении, не при импорте модуля."""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            created = not self.path.exists()
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for ddl in _DDL:
+                    conn.execute(ddl)
+                conn.commit()
+            finally:
+                conn.close()
+            self._ready = True
+        if created and self.seed is not None:
+            counts = import_csv(self, self.seed())
+            if any(counts.values()):
+                print(f"📥 {self.path.name}: импортировано из CSV {sum(counts.values())} сигналов")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+            self._local.conn = conn
+        return conn
+
+    # ---------- запись (любой поток) ----------
+
+    def start(self):
+        self._init_db()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="signal-store", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def append(self, row: Dict[str, Any]):
+        self.start()
+        self._queue.put(("append", [_sql_value(c, row.get(c)) for c in SIGNAL_COLUMNS]))
+
+    def update(self, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        """changes: {(timestamp_utc, pair): {колонка: значение}}."""
+        if changes:
+            self.start()
+            self._queue.put(("update", changes))
+
+    def insert_many(self, rows: Iterable[Sequence[Any]]) -> int:
+        """Пакетная вставка уже приведённых строк (миграция), мимо очереди. Дубли пропускаются."""
+        self._init_db()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(_INSERT, rows)
+            return conn.total_changes
+        finally:
+            conn.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "db": str(self.path),
+            "queue": self._queue.qsize(),
+            "appended": self.appended,
+            "updated": self.updated,
+            "commits": self.commits,
+            "errors": self.errors,
+        }
+
+    # ---------- поток-писатель ----------
+
+    def _run(self):
+        conn = self._connect()
+        pending = 0
+        last_commit = time.monotonic()
+        waiters: List[threading.Event] = []
+        while True:
+            try:
+                op = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                op = ("flush", None)
+
+            stop = op is None
+            if not stop:
+                kind, arg = op
+                try:
+                    if kind == "append":
+                        conn.execute(_INSERT, arg)
+                        self.appended += 1
+                        pending += 1
+                    elif kind == "update":
+                        self._apply(conn, arg)
+                        pending += 1
+                    elif kind == "flush" and arg is not None:
+                        waiters.append(arg)
+                except Exception as e:
+                    self.errors += 1
+                    print("⚠️ signal store:", e)
+
+            due = pending >= self.fsync_batch or time.monotonic() - last_commit >= self.fsync_interval
+            if stop or waiters or (pending and (due or self._queue.empty())):
+                try:
+                    conn.commit()
+                    if pending:
+                        self.commits += 1
+                except Exception as e:
+                    self.errors += 1
+                    print("⚠️ signal store commit:", e)
+                pending = 0
+                last_commit = time.monotonic()
+                for ev in waiters:
+                    ev.set()
+                waiters.clear()
+
+            if stop:
+                conn.close()
+                return
+
+    def _apply(self, conn: sqlite3.Connection, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        for (ts, pair), upd in changes.items():
+            cols = [c for c in upd if c in _TYPES]
+            if not cols:
+                continue
+            conn.execute(
+                f"UPDATE signals SET {', '.join(f'{c} = ?' for c in cols)} "
+                "WHERE timestamp_utc = ? AND pair = ?",
+                [_sql_value(c, upd[c]) for c in cols] + [ts, pair],
+            )
+            self.updated += 1
+
+    # ---------- чтение ----------
+
+    def read(self, since: Optional[datetime] = None, pairs: Optional[Sequence[str]] = None,
+             evaluated: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Сигналы по фильтрам, по возрастанию времени. Условия подобраны под индексы:
+        pairs → (pair, timestamp_utc), evaluated → (evaluated, timestamp_utc).
+        """
+        self._init_db()
+        where, args = [], []
+        if pairs is not None:
+            pairs = list(pairs)
+            if not pairs:
+                return pd.DataFrame(columns=SIGNAL_COLUMNS)
+            where.append(f"pair IN ({', '.join('?' for _ in pairs)})")
+            args += pairs
+        if evaluated is not None:
+            where.append("evaluated = ?")
+            args.append(int(evaluated))
+        if since is not None:
+            where.append("timestamp_utc >= ?")
+            args.append(since.isoformat())
+        sql = f"SELECT {', '.join(SIGNAL_COLUMNS)} FROM signals"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp_utc"
+
+        df = pd.read_sql_query(sql, self._reader(), params=args)
+        for col in _BOOL_COLUMNS:
+            df[col] = df[col].map(lambda v: bool(v) if v is not None and v == v else v)
+        df["evaluated"] = df["evaluated"].astype(bool)
+        df["result"] = df["result"].astype("string")
+        return df
+
+
+    def page(self, pairs: Optional[Sequence[str]] = None, since: Optional[str] = None,
+             until: Optional[str] = None, before: Optional[Tuple[str, str]] = None, limit: int = 100,
+             columns: Sequence[str] = SIGNAL_COLUMNS) -> List[Dict[str, Any]]:
+        """
+        Страница истории: limit самых свежих сигналов с (timestamp_utc, pair) < before
+        (keyset-курсор по ключу UNIQUE: у пар одного символа время может совпадать),
+        в окне [since, until), по возрастанию времени.
+        Обратный проход по индексу (pair, timestamp_utc) — O(limit), без pandas.
+        """
+        self._init_db()
+        columns = [c for c in columns if c in _TYPES] or SIGNAL_COLUMNS
+        where, args = [], []
+        if pairs is not None:
+            pairs = list(pairs)
+            if not pairs:
+                return []
+            where.append(f"pair IN ({', '.join('?' for _ in pairs)})")
+            args += pairs
+        for op, v in ((">=", since), ("<", until), ("<=", before and before[0])):
+            if v is not None:
+                where.append(f"timestamp_utc {op} ?")
+                args.append(v)
+        if before is not None:
+            # timestamp_utc <= ? выше оставлен для диапазона по индексу
+            where.append("(timestamp_utc, pair) < (?, ?)")
+            args += before
+        sql = f"SELECT {', '.join(columns)} FROM signals"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp_utc DESC, pair DESC LIMIT ?"
+        args.append(int(limit))
+
+        bools = [i for i, c in enumerate(columns) if _TYPES[c] == "BOOL"]
+        rows = []
+        for values in self._reader().execute(sql, args):
+            rec = dict(zip(columns, values))
+            for i in bools:
+                v = values[i]
+                if v is not None:
+                    rec[columns[i]] = bool(v)
+            rows.append(rec)
+        rows.reverse()
+        return rows
+
+
+def import_csv(store: SQLiteSignalStore, files: Iterable[Path]) -> Dict[str, int]:
+    """CSV-журналы (текущий + архивы) → store. Повторный импорт дублей не создаёт."""
+    counts: Dict[str, int] = {}
+    for path in files:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [row_from_csv(rec) for rec in csv.DictReader(f) if rec.get("timestamp_utc") and rec.get("pair")]
+        counts[Path(path).name] = store.insert_many(rows)
+    return counts
@@ -0,0 +1,95 @@
+# bot/singleflight.py
+# ==========================================
+# Single-flight: один расчёт на ключ для всех конкурентных вызовов
+# ==========================================
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Реестр вычислений "в полёте".
+
+    Первый вызов с ключом считает результат, остальные конкурентные вызовы
+    с тем же ключом ждут его же, а не запускают свой расчёт.
+    Работает между разными event loop'ами (aiogram в главном потоке,
+    uvicorn в потоке start_api): результат передаётся через
+    concurrent.futures.Future.
+
+    Готовый результат мемоизируется до expires_at (например, до закрытия бара).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._memo: Dict[Hashable, Tuple[float, Any]] = {}
+        self.calls = 0
+        self.shared = 0      # дождались чужого расчёта
+        self.memo_hits = 0   # взяли готовый результат
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        expires_at: float,
+        memoize: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        now = time.time()
+        with self._lock:
+            self.calls += 1
+            memo = self._memo.get(key)
+            if memo is not None and memo[0] > now:
+                self.memo_hits += 1
+                return memo[1]
+
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+            else:
+                self.shared += 1
+
+        if not leader:
+            # shield: отмена одного ожидающего не должна отменять общий расчёт
+            return await asyncio.shield(asyncio.wrap_future(fut))
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if not fut.done():
+                fut.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if memoize is None or memoize(result):
+                self._purge(now)
+                self._memo[key] = (expires_at, result)
+        if not fut.done():
+            fut.set_result(result)
+        return result
+
+    def _purge(self, now: float):
+        for k in [k for k, v in self._memo.items() if v[0] <= now]:
+            del self._memo[k]
+
+    def forget(self, key: Hashable):
+        with self._lock:
+            self._memo.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "memo_hits": self.memo_hits,
+                "inflight": len(self._inflight),
+                "memo": len(self._memo),
+            }
@@ -1,8 +1,52 @@
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-def detect_reversal(df: pd.DataFrame, swing_lookback: int = 3):
-    if df is None or len(df) < swing_lookback * 4:
+def swing_points(highs, lows, swing_lookback: int = 3):
+    """
+    Все swing-точки разом: i — swing high, если high[i] равен максимуму
+    окна [i - k, i + k] (swing low — аналогично по min low), k = swing_lookback.
+
+    Центрированный rolling max/min по numpy-массивам + одно векторное сравнение
+    вместо df.iloc-срезов в цикле. У краёв окно обрезается (как iloc-срез),
+    NaN пропускаются (как Series.max / min).
+    Возвращает (индексы swing high, индексы swing low) по возрастанию.
+    """
+    highs = np.asarray(highs, dtype="float64")
+    lows = np.asarray(lows, dtype="float64")
+    k = swing_lookback
+
+    pad_lo = np.full(k, -np.inf)
+    pad_hi = np.full(k, np.inf)
+    win = 2 * k + 1
+    roll_max = np.fmax.reduce(sliding_window_view(np.concatenate([pad_lo, highs, pad_lo]), win), axis=1)
+    roll_min = np.fmin.reduce(sliding_window_view(np.concatenate([pad_hi, lows, pad_hi]), win), axis=1)
+
+    return np.flatnonzero(highs == roll_max), np.flatnonzero(lows == roll_min)
+
+
+def _last_in_range(idx: np.ndarray, lo: int, hi: int):
+    """Последний индекс из idx в диапазоне [lo, hi] или None."""
+    pos = np.searchsorted(idx, hi, side="right") - 1
+    if pos >= 0 and idx[pos] >= lo:
+        return int(idx[pos])
+    return None
+
+
+def detect_reversal(df: pd.DataFrame, swing_lookback: int = 3, swings=None):
+    if df is None:
+        return detect_reversal_arrays(np.empty(0), np.empty(0), np.empty(0), swing_lookback)
+    return detect_reversal_arrays(
+        df["high"].values, df["low"].values, df["close"].values, swing_lookback, swings
+    )
+
+
+def detect_reversal_arrays(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                           swing_lookback: int = 3, swings=None):
+    """detect_reversal по массивам high / low / close (по возрастанию времени)."""
+    n = len(closes)
+    if n < swing_lookback * 4:
         return {
             "reversal_up": False,
             "reversal_down": False,
@@ -12,26 +56,13 @@ def detect_reversal(df: pd.DataFrame, swing_lookback: int = 3):
             "last_swing_low": None,
         }
 
-    highs = df["high"].values
-    lows = df["low"].values
-    close = df["close"].iloc[-1]
-
-    swing_high_idx = None
-    swing_low_idx = None
+    close = closes[-1]
 
-    for i in range(len(df) - swing_lookback * 2, swing_lookback, -1):
-        window = df.iloc[i - swing_lookback : i + swing_lookback + 1]
-        center = df.iloc[i]
-        if float(center["high"]) == float(window["high"].max()):
-            swing_high_idx = i
-            break
-
-    for i in range(len(df) - swing_lookback * 2, swing_lookback, -1):
-        window = df.iloc[i - swing_lookback : i + swing_lookback + 1]
-        center = df.iloc[i]
-        if float(center["low"]) == float(window["low"].min()):
-            swing_low_idx = i
-            break
+    # последний swing в диапазоне (swing_lookback, len - 2 * swing_lookback]
+    sh_idx, sl_idx = swings if swings is not None else swing_points(highs, lows, swing_lookback)
+    upper = n - swing_lookback * 2
+    swing_high_idx = _last_in_range(sh_idx, swing_lookback + 1, upper)
+    swing_low_idx = _last_in_range(sl_idx, swing_lookback + 1, upper)
 
     if swing_high_idx is None or swing_low_idx is None:
         return {
@@ -84,8 +115,20 @@ def detect_reversal(df: pd.DataFrame, swing_lookback: int = 3):
     }
 
 
-def detect_smc_levels(df: pd.DataFrame, swing_lookback: int = 3, tolerance_factor: float = 0.5):
-    if df is None or len(df) < swing_lookback * 3:
+def detect_smc_levels(df: pd.DataFrame, swing_lookback: int = 3, tolerance_factor: float = 0.5, swings=None):
+    if df is None:
+        return detect_smc_levels_arrays(np.empty(0), np.empty(0), np.empty(0), swing_lookback)
+    return detect_smc_levels_arrays(
+        df["high"].values, df["low"].values, df["close"].values,
+        swing_lookback, tolerance_factor, swings,
+    )
+
+
+def detect_smc_levels_arrays(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                             swing_lookback: int = 3, tolerance_factor: float = 0.5, swings=None):
+    """detect_smc_levels по массивам high / low / close (по возрастанию времени)."""
+    n = len(closes)
+    if n < swing_lookback * 3:
         return {
             "swing_high": None,
             "swing_low": None,
@@ -95,29 +138,17 @@ def detect_smc_levels(df: pd.DataFrame, swing_lookback: int = 3, tolerance_facto
             "rejection_down": False,
         }
 
-    highs = df["high"].values
-    lows = df["low"].values
-    close = df["close"].iloc[-1]
-    last = df.iloc[-1]
-    high = last["high"]
-    low = last["low"]
+    close = closes[-1]
+    high = highs[-1]
+    low = lows[-1]
 
-    atr = (df["high"].iloc[-1] - df["low"].iloc[-1])
+    atr = high - low
     tolerance = atr * tolerance_factor
 
-    swing_high_idx = swing_low_idx = None
-
-    for i in range(len(df) - 6, swing_lookback, -1):
-        w = df.iloc[i - swing_lookback : i + swing_lookback + 1]
-        if df.iloc[i]["high"] == w["high"].max():
-            swing_high_idx = i
-            break
-
-    for i in range(len(df) - 6, swing_lookback, -1):
-        w = df.iloc[i - swing_lookback : i + swing_lookback + 1]
-        if df.iloc[i]["low"] == w["low"].min():
-            swing_low_idx = i
-            break
+    # последний swing в диапазоне (swing_lookback, len - 6]
+    sh_idx, sl_idx = swings if swings is not None else swing_points(highs, lows, swing_lookback)
+    swing_high_idx = _last_in_range(sh_idx, swing_lookback + 1, n - 6)
+    swing_low_idx = _last_in_range(sl_idx, swing_lookback + 1, n - 6)
 
     if swing_high_idx is None or swing_low_idx is None:
         return {
@@ -0,0 +1,304 @@
+# bot/stats_index.py
+# ==========================================
+# Агрегаты статистики сигналов в памяти
+# ==========================================
+#
+# Корзины (pair, час) с счётчиками + скользящие итоги окон 24h / 7d / all
+# по каждой паре и по всем парам ("*"). Обновляются инкрементально:
+#   on_signal  — сигнал записан (signals, buy/sell, сумма вероятностей, last_active);
+#   on_results — сигнал оценён (wins / losses).
+# Запрос статистики — O(1): готовый итог окна, без чтения хранилища.
+# Окно считается по целым часам: 24h = текущий час + 23 предыдущих.
+# Корзины старше самого длинного окна удаляются (в итоге "all" они уже учтены).
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import STATS_BUCKET_SEC
+
+STATS_WINDOWS: Dict[str, Optional[int]] = {"24h": 86400, "7d": 7 * 86400, "all": None}
+ALL_PAIRS = "*"
+
+
+def _float(v) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if f != f else f
+
+
+def _epoch(ts: str) -> Optional[float]:
+    try:
+        dt = datetime.fromisoformat(str(ts))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class Agg:
+    """Счётчики одной корзины / одного окна."""
+
+    __slots__ = ("signals", "buy", "sell", "prob_sum", "prob_n", "wins", "losses", "last_ts", "last_active")
+
+    def __init__(self):
+        self.signals = 0
+        self.buy = 0
+        self.sell = 0
+        self.prob_sum = 0.0
+        self.prob_n = 0
+        self.wins = 0
+        self.losses = 0
+        self.last_ts = float("-inf")
+        self.last_active: Optional[str] = None
+
+    def add_signal(self, direction: str, prob: Optional[float], ts: float, ts_str: str):
+        self.signals += 1
+        self.buy += direction == "BUY"
+        self.sell += direction == "SELL"
+        if prob is not None:
+            self.prob_sum += prob
+            self.prob_n += 1
+        if ts >= self.last_ts:
+            self.last_ts, self.last_active = ts, ts_str
+
+    def add_result(self, result: str, sign: int = 1):
+        self.wins += sign * (result == "WIN")
+        self.losses += sign * (result == "LOSE")
+
+    def merge(self, other: "Agg", sign: int = 1):
+        self.signals += sign * other.signals
+        self.buy += sign * other.buy
+        self.sell += sign * other.sell
+        self.prob_sum += sign * other.prob_sum
+        self.prob_n += sign * other.prob_n
+        self.wins += sign * other.wins
+        self.losses += sign * other.losses
+        if sign > 0 and other.last_ts >= self.last_ts:
+            self.last_ts, self.last_active = other.last_ts, other.last_active
+        elif sign < 0 and self.signals <= 0:
+            # из окна выпадают сначала старые корзины: последний сигнал уходит последним
+            self.last_ts, self.last_active = float("-inf"), None
+
+    def summary(self) -> Dict[str, Any]:
+        """Формат /stats: total — все сигналы окна, winrate — по оценённым."""
+        done = self.wins + self.losses
+        return {
+            "total": self.signals,
+            "wins": self.wins,
+            "losses": self.losses,
+            "buy": self.buy,
+            "sell": self.sell,
+            "winrate": round(self.wins / done * 100, 1) if done else 0,
+            "avg_prob": round(self.prob_sum / self.prob_n, 1) if self.prob_n else 0,
+            "last_active": self.last_active or "–",
+        }
+
+
+class StatsIndex:
+    """
+    Индекс статистики по (pair, корзина времени).
+
+    lock — общий с записью в хранилище (logger.log_signal / evaluate_pending_signals
+    обновляют индекс и ставят запись в очередь под ним). rebuild() читает хранилище
+    без lock: события, пришедшие за время чтения, копятся в журнале и после подмены
+    корзин применяются заново — кроме тех, что уже попали в прочитанные данные.
+    """
+
+    def __init__(self, bucket_sec: int = STATS_BUCKET_SEC):
+        self.bucket_sec = bucket_sec
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._buckets: Dict[str, Dict[int, Agg]] = {}
+        self._totals: Dict[str, Dict[str, Agg]] = {w: {} for w in STATS_WINDOWS}
+        self._edge: Dict[str, int] = {}   # первая корзина внутри окна
+        self._rebuild_lock = threading.RLock()
+        self._pending: Optional[List[Tuple[str, Any]]] = None   # журнал на время rebuild()
+        self.rebuilds = 0
+
+    # ---------- инкрементальные обновления ----------
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_sec * self.bucket_sec)
+
+    def _targets(self, pair: str, b: int):
+        """Итоги окон, куда попадает корзина b (по паре и по всем парам)."""
+        for w in STATS_WINDOWS:
+            if b >= self._edge.get(w, b):
+                tot = self._totals[w]
+                yield tot.setdefault(pair, Agg())
+                yield tot.setdefault(ALL_PAIRS, Agg())
+
+    def on_signal(self, row: Dict[str, Any]):
+        with self.lock:
+            if self._pending is not None:
+                self._pending.append(("signal", dict(row)))
+            if not self.loaded:
+                return
+            ts_str = str(row.get("timestamp_utc"))
+            ts = _epoch(ts_str)
+            if ts is None:
+                return
+            pair = str(row.get("pair"))
+            direction = str(row.get("direction"))
+            prob = _float(row.get("probability"))
+
+            b = self._bucket(ts)
+            self._advance()
+            if b >= self._oldest_edge(b):
+                self._buckets.setdefault(pair, {}).setdefault(b, Agg()).add_signal(direction, prob, ts, ts_str)
+            for agg in self._targets(pair, b):
+                agg.add_signal(direction, prob, ts, ts_str)
+            if result := row.get("result"):
+                self._add_result(pair, b, str(result))
+
+    def on_results(self, changes: Dict[Tuple[str, str], Dict[str, Any]]):
+        """changes в формате SIGNAL_LOG.update: {(timestamp_utc, pair): {"result": ...}}."""
+        with self.lock:
+            if self._pending is not None:
+                self._pending.append(("results", dict(changes)))
+            if not self.loaded:
+                return
+            self._advance()
+            for (ts_str, pair), upd in changes.items():
+                ts = _epoch(ts_str)
+                if ts is not None and upd.get("result"):
+                    self._add_result(pair, self._bucket(ts), str(upd["result"]))
+
+    def _add_result(self, pair: str, b: int, result: str):
+        bucket = self._buckets.get(pair, {}).get(b)
+        if bucket is not None:
+            bucket.add_result(result)
+        for agg in self._targets(pair, b):
+            agg.add_result(result)
+
+    def _oldest_edge(self, default: int) -> int:
+        return min(self._edge.values(), default=default)
+
+    def _advance(self, now: Optional[float] = None):
+        """Сдвинуть окна к текущему часу: вычесть выпавшие корзины, удалить старые."""
+        cur = self._bucket(now if now is not None else datetime.now(timezone.utc).timestamp())
+        moved = False
+        for w, span in STATS_WINDOWS.items():
+            if span is None:
+                continue
+            edge = cur - span + self.bucket_sec
+            old = self._edge.get(w)
+            if old is not None and edge <= old:
+                continue
+            self._edge[w] = edge
+            moved = True
+            if old is None:
+                continue
+            tot = self._totals[w]
+            for pair, buckets in self._buckets.items():
+                for b, agg in buckets.items():
+                    if old <= b < edge:
+                        tot.setdefault(pair, Agg()).merge(agg, -1)
+                        tot.setdefault(ALL_PAIRS, Agg()).merge(agg, -1)
+        if not moved:
+            return
+        # корзины вне самого длинного окна больше не нужны
+        edge = self._oldest_edge(cur)
+        for buckets in self._buckets.values():
+            for b in [b for b in buckets if b < edge]:
+                del buckets[b]
+
+    # ---------- перестроение из хранилища ----------
+
+    def rebuild(self, loader: Callable[[], pd.DataFrame]):
+        """
+        Полный пересчёт по всем сигналам хранилища (старт процесса).
+        loader() (flush + чтение всего лога) и пересчёт идут без self.lock —
+        запись сигналов и оценка не ждут; под lock только подмена корзин
+        и повтор событий из журнала.
+        """
+        with self._rebuild_lock:
+            with self.lock:
+                self._pending = []
+            try:
+                df = loader()
+                fresh = StatsIndex(self.bucket_sec)
+                fresh.loaded = True
+                fresh._advance()
+                seen: Dict[Tuple[str, str], Optional[str]] = {}
+                for row in _rows(df):
+                    fresh.on_signal(row)
+                    seen[(str(row.get("timestamp_utc")), str(row.get("pair")))] = row["result"]
+            except BaseException:
+                with self.lock:
+                    self._pending = None
+                raise
+            with self.lock:
+                pending, self._pending = self._pending, None
+                self._buckets, self._totals, self._edge = fresh._buckets, fresh._totals, fresh._edge
+                self.loaded = True
+                for kind, event in pending:
+                    if kind == "signal":
+                        # запись могла успеть попасть в хранилище до чтения
+                        if (str(event.get("timestamp_utc")), str(event.get("pair"))) not in seen:
+                            self.on_signal(event)
+                    else:
+                        # результат уже учтён, если прочитанная строка оценена
+                        fresh_changes = {k: upd for k, upd in event.items() if not seen.get((str(k[0]), str(k[1])))}
+                        if fresh_changes:
+                            self.on_results(fresh_changes)
+                self.rebuilds += 1
+
+    def ensure_loaded(self, loader: Callable[[], pd.DataFrame]):
+        if self.loaded:
+            return
+        with self._rebuild_lock:
+            if not self.loaded:
+                self.rebuild(loader)
+
+    # ---------- запросы O(1) ----------
+
+    def summary(self, window: str = "all", pairs: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Итог окна по всем парам или по списку пар (символ WebApp → 1-2 пары)."""
+        with self.lock:
+            self._advance()
+            tot = self._totals[window]
+            if pairs is None:
+                return tot.get(ALL_PAIRS, Agg()).summary()
+            agg = Agg()
+            for p in pairs:
+                if p in tot:
+                    agg.merge(tot[p])
+            return agg.summary()
+
+    def breakdown(self, window: str = "all") -> Dict[str, Dict[str, Any]]:
+        """Итоги окна по каждой паре (без "*")."""
+        with self.lock:
+            self._advance()
+            return {
+                p: agg.summary()
+                for p, agg in sorted(self._totals[window].items())
+                if p != ALL_PAIRS and agg.signals
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "loaded": self.loaded,
+                "pairs": len(self._buckets),
+                "buckets": sum(len(b) for b in self._buckets.values()),
+                "rebuilds": self.rebuilds,
+            }
+
+
+def _rows(df: pd.DataFrame) -> Iterable[Dict[str, Any]]:
+    cols = [c for c in ("timestamp_utc", "pair", "direction", "probability", "result") if c in df.columns]
+    for values in df[cols].itertuples(index=False, name=None):
+        row = dict(zip(cols, values))
+        res = row.get("result")
+        row["result"] = res if isinstance(res, str) and res in ("WIN", "LOSE") else None
+        yield row
+
+
+STATS_INDEX = StatsIndex()
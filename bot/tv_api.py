@@ -1,9 +1,19 @@
-import requests
+import threading
+from typing import Dict, Optional, Tuple
+
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 
+from .config import TV_TIMEOUT, TV_HISTORY_MAX_BARS
+from .candle_cache import CANDLE_CACHE
+from .http_client import HTTP
+
 BASE_URL = "https://dchart-api.tradingview.com/history"
 
+# Скользящая история по (pair, resolution): запрос докачивает только новые бары
+_HISTORY: Dict[Tuple[str, str], pd.DataFrame] = {}
+_HISTORY_LOCK = threading.Lock()
+
 def tv_symbol(pair: str) -> str:
     """
     EUR/USD → OANDA:EURUSD
@@ -12,7 +22,22 @@ def tv_symbol(pair: str) -> str:
     s = pair.replace("/", "")
     return f"OANDA:{s}"
 
-def get_tv_series(pair: str, interval="1min", n_bars=300):
+def tv_window_sec(res_sec: int, n_bars: int, now: int) -> int:
+    """
+    Сколько секунд истории запросить, чтобы получить n_bars баров:
+    n_bars * 1.5 (пропуски / низкая ликвидность), минимум 10000 секунд,
+    +2 суток, если окно задевает выходные (Forex закрыт с пятницы по воскресенье).
+    """
+    window = max(10000, int(n_bars * res_sec * 1.5))
+    day = datetime.fromtimestamp(now - window, timezone.utc).date()
+    end = datetime.fromtimestamp(now, timezone.utc).date()
+    while day <= end:
+        if day.weekday() >= 5:
+            return window + 2 * 86400
+        day += timedelta(days=1)
+    return window
+
+async def get_tv_series(pair: str, interval="1min", n_bars=300):
     # 1) Правильное преобразование интервала
     resolution_map = {
         "1min": "1",
@@ -22,11 +47,26 @@ def get_tv_series(pair: str, interval="1min", n_bars=300):
         "1h": "60",
     }
     res = resolution_map.get(interval, "1")
+    res_sec = int(res) * 60
 
-    # 2) Дата диапазон для n_bars
+    # 1.1) Тот же бар уже скачивали — отдаём из кэша без сети
+    cached = CANDLE_CACHE.get("tv", pair, res_sec, n_bars)
+    if cached is not None:
+        return cached, None
+
+    # 2) Дата диапазон: только бары после последнего сохранённого,
+    #    либо полный бэкфилл окна под n_bars, если истории мало
     now = int(datetime.now(timezone.utc).timestamp())
-    # запас +10000 секунд
-    _from = now - 10000
+    key = (pair, res)
+    with _HISTORY_LOCK:
+        hist = _HISTORY.get(key)
+
+    topup = hist is not None and len(hist) >= n_bars
+    if topup:
+        # последний бар мог быть незакрытым — перезапрашиваем и его
+        _from = int(hist["time"].iloc[-1])
+    else:
+        _from = now - tv_window_sec(res_sec, n_bars, now)
 
     # 3) TV symbol
     symbol = tv_symbol(pair)
@@ -39,25 +79,69 @@ def get_tv_series(pair: str, interval="1min", n_bars=300):
     }
 
     try:
-        r = requests.get(BASE_URL, params=params, timeout=7)
-        data = r.json()
+        # общий пул соединений, не блокирует event loop
+        data = await HTTP.get_json(BASE_URL, params=params, timeout=TV_TIMEOUT, source="tv")
 
-        if "s" not in data or data["s"] != "ok":
+        status = data.get("s")
+        if status == "no_data" and topup:
+            # новых баров нет (рынок закрыт) — отдаём то, что есть, но не кэшируем
+            # как текущий бар: следующий запрос снова спросит TradingView
+            return hist.tail(n_bars), None
+        if status != "ok":
+            # error / неверный символ / лимит запросов — ошибка, а не старая история
             return None, {"error": f"Нет данных TradingView для {pair}"}
 
-        df = pd.DataFrame({
-            "time": data["t"],
-            "open": data["o"],
-            "high": data["h"],
-            "low": data["l"],
-            "close": data["c"],
-        })
-
-        df["datetime"] = pd.to_datetime(df["time"], unit="s", utc=True)
-        df["dt_utc"] = df["datetime"]
-
-        return df.tail(n_bars), None
+        df = _merge_history(key, hist, _tv_frame(data), max(TV_HISTORY_MAX_BARS, n_bars))
+        df = df.tail(n_bars)
+        CANDLE_CACHE.put("tv", pair, res_sec, n_bars, df)
+        return df, None
 
     except Exception as e:
         print("TV API ERROR:", e)
         return None, {"error": "Ошибка загрузки TradingView"}
+
+
+def _tv_frame(data: dict) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "time": data["t"],
+        "open": data["o"],
+        "high": data["h"],
+        "low": data["l"],
+        "close": data["c"],
+    })
+
+    df["datetime"] = pd.to_datetime(df["time"], unit="s", utc=True)
+    df["dt_utc"] = df["datetime"]
+    return df
+
+
+def _merge_history(key, hist: Optional[pd.DataFrame], new: pd.DataFrame, keep: int) -> pd.DataFrame:
+    """
+    Склейка сохранённой истории с новыми барами:
+    дубликаты по time — побеждает свежий бар (формирующийся мог измениться).
+    """
+    if hist is not None and not hist.empty:
+        df = pd.concat([hist, new], ignore_index=True)
+        df = df.drop_duplicates(subset="time", keep="last").sort_values("time")
+    else:
+        df = new.sort_values("time")
+    df = df.tail(keep).reset_index(drop=True)
+
+    with _HISTORY_LOCK:
+        _HISTORY[key] = df
+    return df
+
+
+def reset_tv_history(pair: Optional[str] = None):
+    """Сбросить скользящую историю пары (или всю) — следующий запрос сделает полный бэкфилл."""
+    with _HISTORY_LOCK:
+        for key in [k for k in _HISTORY if pair is None or k[0] == pair]:
+            del _HISTORY[key]
+
+
+def get_tv_series_sync(pair: str, interval="1min", n_bars=300):
+    """
+    Синхронная обёртка над get_tv_series для фоновых потоков
+    (оценка сигналов). Запрос идёт через тот же общий пул HTTP.
+    """
+    return HTTP.run_sync(get_tv_series(pair, interval, n_bars))
@@ -1,10 +1,14 @@
 # po_candles.py
 
-from collections import defaultdict, deque
-from dataclasses import dataclass, asdict
-from typing import Deque, Dict, List
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 
+from po_resample import resample_ohlc
+
 
 @dataclass
 class Candle:
@@ -15,6 +19,72 @@ class Candle:
     close: float
 
 
+# строки буфера CandleRing
+TS, OPEN, HIGH, LOW, CLOSE = range(5)
+FIELDS = ("time", "open", "high", "low", "close")
+
+
+class CandleRing:
+    """
+    Кольцевой буфер свечей одного символа: массив float64 формы (5, 2 * capacity),
+    строки ts / open / high / low / close.
+
+    Каждая свеча пишется в два слота (i и i + capacity), поэтому последние
+    n свечей всегда лежат подряд: buf[:, pos + capacity - n : pos + capacity].
+    Добавление и обновление свечи — O(1), срез последних N — без копирования.
+
+    Формирующаяся свеча ведётся в cur (python float — дешевле записи в numpy
+    на каждый тик) и переносится в буфер перед чтением и перед новой свечой.
+    """
+
+    __slots__ = ("capacity", "buf", "pos", "count", "cur", "dirty")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buf = np.zeros((5, 2 * capacity), dtype=np.float64)
+        self.pos = 0      # слот следующей свечи
+        self.count = 0    # сколько свечей в буфере (<= capacity)
+        self.cur: Optional[List[float]] = None   # [ts, open, high, low, close] последней свечи
+        self.dirty = False
+
+    def flush(self):
+        if self.dirty:
+            i = (self.pos - 1) % self.capacity
+            self.buf[:, i] = self.cur
+            self.buf[:, i + self.capacity] = self.cur
+            self.dirty = False
+
+    def append(self, ts: float, price: float):
+        self.flush()
+        self.cur = [ts, price, price, price, price]
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.dirty = True
+
+    def update(self, price: float):
+        """Тик внутри последней свечи: high / low / close."""
+        c = self.cur
+        if price > c[HIGH]:
+            c[HIGH] = price
+        if price < c[LOW]:
+            c[LOW] = price
+        c[CLOSE] = price
+        self.dirty = True
+
+    def last_candle(self) -> "Candle":
+        ts, o, h, l, c = self.cur
+        return Candle(int(ts), o, h, l, c)
+
+    def view(self, limit: int) -> np.ndarray:
+        """Последние limit свечей: (5, n) view буфера, только для чтения."""
+        self.flush()
+        n = max(min(limit, self.count), 0)
+        end = self.pos + self.capacity
+        v = self.buf[:, end - n:end]
+        v.flags.writeable = False
+        return v
+
+
 class CandleBuilder:
     """
     Собирает свечи OHLC из любых тиков.
@@ -22,46 +92,107 @@ class CandleBuilder:
         builder = CandleBuilder(timeframe_sec=60)
         builder.on_tick("EURUSD_otc", ts_ms, price)
         df = builder.get_candles_df("EURUSD_otc")
+        arr = builder.get_arrays("EURUSD_otc", limit=500)   # numpy, одна копия под lock
+
+    on_close(symbol, tf_sec, candle) — вызывается, когда первый тик нового
+    бакета закрывает предыдущую свечу (событие "bar_close" для подписчиков).
+
+    Свечи хранятся в CandleRing на символ (max_candles последних).
+    on_tick вызывается из потоков Flask — изменения буфера под self.lock.
     """
 
-    def __init__(self, timeframe_sec: int = 60, max_candles: int = 2000):
+    def __init__(self, timeframe_sec: int = 60, max_candles: int = 2000,
+                 on_close: Optional[Callable[[str, int, Candle], None]] = None):
         self.tf = timeframe_sec
         self.max_candles = max_candles
-        self.data: Dict[str, Deque[Candle]] = defaultdict(
-            lambda: deque(maxlen=self.max_candles)
-        )
+        self.on_close = on_close
+        self.data: Dict[str, CandleRing] = {}
+        self.lock = threading.Lock()
 
     def _bucket(self, ts_sec: int) -> int:
         return ts_sec - ts_sec % self.tf
 
-    def on_tick(self, symbol: str, ts_ms: int, price: float):
+    def on_tick(self, symbol: str, ts_ms: int, price: float, emit: bool = True):
         if ts_ms > 10 ** 11:  # ms
             ts_sec = ts_ms // 1000
         else:
             ts_sec = int(ts_ms)
 
         bucket_ts = self._bucket(ts_sec)
-        dq = self.data[symbol]
+        price = float(price)
+        closed = None
 
-        if dq and dq[-1].ts == bucket_ts:
-            c = dq[-1]
-            c.high = max(c.high, price)
-            c.low = min(c.low, price)
-            c.close = price
-        else:
-            dq.append(Candle(bucket_ts, price, price, price, price))
+        with self.lock:
+            ring = self.data.get(symbol)
+            if ring is None:
+                ring = self.data[symbol] = CandleRing(self.max_candles)
+
+            cur = ring.cur
+            if cur is not None and cur[TS] == bucket_ts:
+                ring.update(price)
+            else:
+                if cur is not None and cur[TS] < bucket_ts and emit and self.on_close is not None:
+                    closed = ring.last_candle()
+                ring.append(bucket_ts, price)
+
+        if closed is not None:
+            self.on_close(symbol, self.tf, closed)
+
+    def view_arrays(self, symbol: str, limit: int = 200) -> Dict[str, np.ndarray]:
+        """
+        Как get_arrays, но view кольцевого буфера без копии и без блокировки.
+        Вызывать под self.lock и не выносить за него: последняя свеча меняется
+        с новыми тиками, а при limit >= max_candles первый слот среза
+        перезаписывается следующей свечой.
+        """
+        ring = self.data.get(symbol)
+        if ring is None:
+            return {f: np.empty(0, dtype=np.float64) for f in FIELDS}
+        return dict(zip(FIELDS, ring.view(limit)))
+
+    def get_arrays(self, symbol: str, limit: int = 200) -> Dict[str, np.ndarray]:
+        """
+        Последние limit свечей колонками float64: {"time", "open", "high", "low", "close"}.
+        Срез копируется одним блоком под self.lock — согласованный снимок,
+        который можно отдавать и кодировать вне блокировки.
+        """
+        with self.lock:
+            ring = self.data.get(symbol)
+            if ring is None:
+                return {f: np.empty(0, dtype=np.float64) for f in FIELDS}
+            v = ring.view(limit).copy()
+        return dict(zip(FIELDS, v))
 
     def get_candles(self, symbol: str, limit: int = 200) -> List[Candle]:
-        dq = self.data.get(symbol)
-        if not dq:
-            return []
-        return list(dq)[-limit:]
+        with self.lock:
+            arr = self.view_arrays(symbol, limit)
+            cols = np.vstack([arr[f] for f in FIELDS]).T.tolist()
+        return [Candle(int(ts), o, h, l, c) for ts, o, h, l, c in cols]
 
     def get_candles_df(self, symbol: str, limit: int = 200) -> pd.DataFrame:
-        candles = self.get_candles(symbol, limit)
-        if not candles:
+        arr = self.get_arrays(symbol, limit)
+        if not len(arr["time"]):
             return pd.DataFrame(columns=["time", "open", "high", "low", "close"])
 
-        df = pd.DataFrame([asdict(c) for c in candles])
-        df["datetime"] = pd.to_datetime(df["ts"], unit="s", utc=True)
-        return df[["datetime", "open", "high", "low", "close"]]
+        return pd.DataFrame({
+            "datetime": pd.to_datetime(arr["time"].astype(np.int64), unit="s", utc=True),
+            "open": arr["open"],
+            "high": arr["high"],
+            "low": arr["low"],
+            "close": arr["close"],
+        })
+
+    def get_resampled_df(self, symbol: str, tf_sec: int, limit: int = 200,
+                         drop_partial: bool = False) -> pd.DataFrame:
+        """
+        Свечи старшего TF, собранные из свечей этого билдера (обычно M1):
+            m1 = CandleBuilder(timeframe_sec=60)
+            df_h1 = m1.get_resampled_df("EURUSD_otc", 3600)
+        """
+        ratio = max(tf_sec // self.tf, 1)
+        base = self.get_candles_df(symbol, limit=(limit + 1) * ratio)
+        if base.empty:
+            return base
+
+        df = resample_ohlc(base, tf_sec, base_sec=self.tf, drop_partial=drop_partial)
+        return df[["datetime", "open", "high", "low", "close"]].tail(limit)
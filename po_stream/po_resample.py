@@ -0,0 +1,105 @@
+# po_resample.py
+#
+# Сборка свечей старших таймфреймов (M5/M15/M30/H1) из одной M1-серии.
+# Только pandas/numpy — модуль используется и ботом (bot/analyzer.py),
+# и tick-сервером (po_candles.CandleBuilder).
+
+from typing import Optional
+import time
+
+import numpy as np
+import pandas as pd
+
+TF_SECONDS = {
+    "M1": 60,
+    "M5": 300,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+}
+
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def bucket_start(ts_sec, tf_sec: int, offset_sec: int = 0):
+    """
+    Начало бакета TF для unix-времени (секунды, UTC).
+    Работает и со скаляром, и с numpy-массивом.
+
+    Границы считаются от эпохи UTC, поэтому M5..H1 совпадают с границами
+    TradingView / PocketOption в любом часовом поясе с целым сдвигом в часах.
+    offset_sec — сдвиг границ (например, -1800 для пояса UTC+05:30 на H1).
+    """
+    return ts_sec - (ts_sec - offset_sec) % tf_sec
+
+
+def _epoch_seconds(df: pd.DataFrame) -> np.ndarray:
+    if "time" in df.columns and pd.api.types.is_numeric_dtype(df["time"]):
+        return df["time"].to_numpy(dtype="int64")
+    dt = pd.to_datetime(df["datetime"], utc=True)
+    return ((dt - _EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype="int64")
+
+
+def resample_ohlc(
+    df: pd.DataFrame,
+    tf_sec: int,
+    base_sec: int = 60,
+    offset_sec: int = 0,
+    drop_partial: bool = False,
+    now: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Собрать свечи TF=tf_sec из свечей base_sec (обычно M1).
+
+    Вход: колонки open/high/low/close + "time" (unix, сек) или "datetime".
+    Выход: time, open, high, low, close, datetime, bars, complete
+    (+ dt_utc, если он был во входе — формат get_tv_series / fetch_po_candles).
+
+    - open/close — первая/последняя M1 в бакете, high/low — max/min;
+    - пропущенные M1 внутри бакета (нет тиков, разрыв сессии) не мешают;
+    - bars — сколько базовых свечей попало в бакет;
+    - complete — бакет закрыт (его конец <= now, по умолчанию — текущее время).
+      Последний бакет обычно формирующийся, как и у самого TradingView;
+      drop_partial=True его отбрасывает.
+    """
+    if tf_sec % base_sec != 0:
+        raise ValueError(f"tf_sec={tf_sec} не кратен base_sec={base_sec}")
+
+    cols = ["time", "open", "high", "low", "close", "datetime", "bars", "complete"]
+    if df is None or df.empty:
+        return pd.DataFrame(columns=cols)
+
+    t = _epoch_seconds(df)
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    o = df["open"].to_numpy(dtype="float64")[order]
+    h = df["high"].to_numpy(dtype="float64")[order]
+    l = df["low"].to_numpy(dtype="float64")[order]
+    c = df["close"].to_numpy(dtype="float64")[order]
+
+    b = bucket_start(t, tf_sec, offset_sec)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    ends = np.r_[starts[1:], len(t)]
+
+    if now is None:
+        now = time.time()
+    bucket_ts = b[starts]
+
+    out = pd.DataFrame({
+        "time": bucket_ts,
+        "open": o[starts],
+        "high": np.maximum.reduceat(h, starts),
+        "low": np.minimum.reduceat(l, starts),
+        "close": c[ends - 1],
+    })
+    out["datetime"] = pd.to_datetime(out["time"], unit="s", utc=True)
+    out["bars"] = ends - starts
+    out["complete"] = bucket_ts + tf_sec <= now
+
+    if "dt_utc" in df.columns:
+        out["dt_utc"] = out["datetime"]
+
+    if drop_partial:
+        out = out[out["complete"]].reset_index(drop=True)
+
+    return out
@@ -3,17 +3,25 @@
 import asyncio
 import json
 import threading
-from typing import Dict, Set
+import time
+from typing import Dict, List, Optional, Set
 
+import numpy as np
 from flask import Flask, request, jsonify
 
 from po_candles import CandleBuilder  # из твоего po_candles.py
 import websockets
 
+# Arrow IPC для /candles?format=arrow — опционально
+try:
+    import pyarrow as pa  # type: ignore
+except Exception:
+    pa = None
+
 # ====== НАСТРОЙКИ =====================================================
 
 HTTP_HOST = "0.0.0.0"
-HTTP_PORT = 9001          # REST /tick /ohlc /candles
+HTTP_PORT = 9001          # REST /tick /ohlc /candles /snapshot
 
 WS_HOST = "0.0.0.0"
 WS_PORT = 9002            # WebSocket ws://host:9002/ws
@@ -26,27 +34,75 @@ TF_MAP = {
     "M30": 1800,
 }
 
+# Таймфреймы без своего CandleBuilder — собираются из M1 (po_resample.py)
+DERIVED_TF_MAP = {
+    "H1": 3600,
+}
+
 # ====== Flask-приложение (REST API) ==================================
 
 app = Flask(__name__)
 
+# секунды -> имя TF для событий
+TF_NAMES = {sec: name for name, sec in TF_MAP.items()}
+
+
+def on_bar_close(symbol: str, tf_sec: int, candle):
+    """
+    Свеча закрылась (пришёл первый тик следующего бакета) —
+    пушим "bar_close" в WebSocket: автосканер бота пересчитывает пару сразу.
+    """
+    ws_broadcast_safe({
+        "event": "bar_close",
+        "symbol": symbol,
+        "tf": TF_NAMES.get(tf_sec, str(tf_sec)),
+        "time": candle.ts,
+        "open": candle.open,
+        "high": candle.high,
+        "low": candle.low,
+        "close": candle.close,
+    })
+
+
 # Глобальные CandleBuilder-ы по таймфреймам
 BUILDERS: Dict[int, CandleBuilder] = {
-    sec: CandleBuilder(timeframe_sec=sec, max_candles=3000) for sec in TF_MAP.values()
+    sec: CandleBuilder(timeframe_sec=sec, max_candles=3000, on_close=on_bar_close)
+    for sec in TF_MAP.values()
 }
 
 # Последние тики по символу
 LAST_TICK: Dict[str, dict] = {}
 
+# Версия данных: растёт на каждом тике / истории (ETag и ?since= для /snapshot, /candles/bulk).
+# SYMBOL_SEQ — версия последнего изменения символа; тик + его seq пишутся под SEQ_LOCK.
+SEQ_LOCK = threading.Lock()
+SEQ = 0
+SYMBOL_SEQ: Dict[str, int] = {}
+
+
+def bump_seq(symbol: str, tick: Optional[dict] = None) -> int:
+    """Новая версия символа (свечи к этому моменту уже обновлены)."""
+    global SEQ
+    with SEQ_LOCK:
+        SEQ += 1
+        SYMBOL_SEQ[symbol] = SEQ
+        if tick is not None:
+            tick["seq"] = SEQ
+            LAST_TICK[symbol] = tick
+        return SEQ
+
 # ====== WebSocket сервер ==============================================
 
 WS_CLIENTS: Set["websockets.WebSocketServerProtocol"] = set()
 WS_LOOP = asyncio.new_event_loop()
 
 
-async def ws_handler(ws, path):
+async def ws_handler(ws, path=None):
     """Обработчик WebSocket-подключений (простой broadcast-сервер)."""
-    if path != "/ws":
+    if path is None:
+        # websockets >= 13: handler(connection), путь — в connection.request
+        path = getattr(getattr(ws, "request", None), "path", "/ws")
+    if path.split("?")[0] != "/ws":
         await ws.close()
         return
 
@@ -88,8 +144,12 @@ def ws_broadcast_safe(payload: dict):
 def start_ws_server():
     """Запуск WebSocket-сервера в отдельном потоке."""
     asyncio.set_event_loop(WS_LOOP)
-    server_coro = websockets.serve(ws_handler, WS_HOST, WS_PORT, ping_interval=20, ping_timeout=20)
-    WS_LOOP.run_until_complete(server_coro)
+
+    async def serve():
+        # websockets >= 13 создаёт сервер только внутри работающего loop
+        return await websockets.serve(ws_handler, WS_HOST, WS_PORT, ping_interval=20, ping_timeout=20)
+
+    WS_LOOP.run_until_complete(serve())
     print(f"🌐 WebSocket server started at ws://{WS_HOST}:{WS_PORT}/ws")
     WS_LOOP.run_forever()
 
@@ -100,19 +160,19 @@ def on_po_tick(symbol: str, ts: float, price: float, account: str = "REAL"):
     """
     Обработка одного тика от PocketOption:
     - обновляем все таймфреймы
-    - обновляем LAST_TICK
+    - обновляем LAST_TICK (+ версию символа)
     - пушим событие в WebSocket
     """
-    LAST_TICK[symbol] = {
+    # Обновляем свечи по всем таймфреймам
+    for sec, builder in BUILDERS.items():
+        builder.on_tick(symbol, int(ts * 1000), price)  # CandleBuilder сам разберет ms/sec
+
+    bump_seq(symbol, {
         "symbol": symbol,
         "time": ts,
         "price": price,
         "account": account,
-    }
-
-    # Обновляем свечи по всем таймфреймам
-    for sec, builder in BUILDERS.items():
-        builder.on_tick(symbol, int(ts * 1000), price)  # CandleBuilder сам разберет ms/sec
+    })
 
     # WebSocket-событие
     ws_broadcast_safe({
@@ -134,8 +194,10 @@ def on_po_history(symbol: str, period_sec: int, candles_raw):
         # Этот таймфрейм нам не нужен – просто проигнорируем или можно логировать
         return
 
+    # история — не "живое" закрытие баров, события не шлём
     for ts, price in candles_raw:
-        builder.on_tick(symbol, int(ts), float(price))
+        builder.on_tick(symbol, int(ts), float(price), emit=False)
+    bump_seq(symbol)
 
     ws_broadcast_safe({
         "event": "history",
@@ -148,16 +210,18 @@ def on_po_history(symbol: str, period_sec: int, candles_raw):
 def get_tf_seconds(tf_param: str) -> int:
     """
     Преобразование tf строки в секунды.
-    Поддерживает: M1/M5/M15/M30 или просто число (секунды).
+    Поддерживает: M1/M5/M15/M30, H1 (из M1) или просто число (секунды).
     """
     tf_param = (tf_param or "").upper()
     if tf_param in TF_MAP:
         return TF_MAP[tf_param]
+    if tf_param in DERIVED_TF_MAP:
+        return DERIVED_TF_MAP[tf_param]
 
     # Попытка интерпретировать как число секунд
     try:
         sec = int(tf_param)
-        if sec in BUILDERS:
+        if sec in BUILDERS or sec in DERIVED_TF_MAP.values():
             return sec
     except Exception:
         pass
@@ -166,6 +230,104 @@ def get_tf_seconds(tf_param: str) -> int:
     return TF_MAP["M1"]
 
 
+def parse_list(param: Optional[str]) -> Optional[List[str]]:
+    """"EURUSD_otc,GBPUSD_otc" -> список; пусто -> None (все)."""
+    items = [x.strip() for x in (param or "").split(",") if x.strip()]
+    return items or None
+
+
+CANDLE_FIELDS = ("time", "open", "high", "low", "close")
+CANDLE_FORMATS = ("rows", "columns", "binary", "arrow")
+
+
+def get_candles_arrays(symbol: str, sec: int, limit: int) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Свечи символа по TF колонками float64 (time — unix-секунды).
+    Свой CandleBuilder — копия среза под его lock; H1 — сборка из M1. None — TF не поддерживается.
+    """
+    builder = BUILDERS.get(sec)
+    if builder:
+        return builder.get_arrays(symbol, limit=limit)
+    if sec in DERIVED_TF_MAP.values():
+        df = BUILDERS[TF_MAP["M1"]].get_resampled_df(symbol, sec, limit=limit)
+        if df.empty:
+            return {f: np.empty(0, dtype=np.float64) for f in CANDLE_FIELDS}
+        arr = {f: df[f].to_numpy(dtype=np.float64) for f in CANDLE_FIELDS[1:]}
+        arr["time"] = df["datetime"].to_numpy(dtype="datetime64[s]").astype(np.float64)
+        return arr
+    return None
+
+
+def candles_rows(arr: Dict[str, np.ndarray]) -> List[dict]:
+    """Формат rows (совместимый): [{"time": ISO-строка UTC, "open": ..., ...}]."""
+    iso = np.datetime_as_string(arr["time"].astype("datetime64[s]"), unit="s")
+    cols = [arr[f].tolist() for f in CANDLE_FIELDS[1:]]
+    return [
+        {"time": t + "+00:00", "open": o, "high": h, "low": l, "close": c}
+        for t, o, h, l, c in zip(iso.tolist(), *cols)
+    ]
+
+
+def candles_columns(arr: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Формат columns: {"time": [unix-сек], "open": [...], ...}."""
+    out = {f: arr[f].tolist() for f in CANDLE_FIELDS[1:]}
+    return {"time": arr["time"].astype(np.int64).tolist(), **out}
+
+
+def candles_binary(arr: Dict[str, np.ndarray]):
+    """
+    Формат binary: float64 little-endian, колонки подряд (time, open, high, low, close),
+    n = размер / 40. Читается как np.frombuffer(body, "<f8").reshape(5, -1).
+    """
+    body = np.vstack([arr[f] for f in CANDLE_FIELDS]).astype("<f8", copy=False).tobytes()
+    resp = app.response_class(body, mimetype="application/octet-stream")
+    resp.headers["X-Columns"] = ",".join(CANDLE_FIELDS)
+    resp.headers["X-Count"] = str(len(arr["time"]))
+    return resp
+
+
+def candles_arrow(arr: Dict[str, np.ndarray]):
+    """Формат arrow: Arrow IPC stream с колонками time (int64) и OHLC (float64)."""
+    cols = {f: arr[f] for f in CANDLE_FIELDS}
+    cols["time"] = arr["time"].astype(np.int64)
+    table = pa.table(cols)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return app.response_class(sink.getvalue().to_pybytes(), mimetype="application/vnd.apache.arrow.stream")
+
+
+def data_version(symbols: Optional[List[str]]) -> int:
+    """Версия набора символов: максимальный seq (все символы — глобальный SEQ)."""
+    with SEQ_LOCK:
+        if symbols is None:
+            return SEQ
+        return max((SYMBOL_SEQ.get(s, 0) for s in symbols), default=0)
+
+
+def versioned(payload: dict, version: int):
+    """JSON с ETag = версия данных."""
+    resp = jsonify(payload)
+    resp.set_etag(str(version))
+    return resp
+
+
+def not_modified(version: int):
+    """304 без тела, если у клиента уже эта версия (If-None-Match)."""
+    if request.if_none_match.contains(str(version)):
+        resp = app.response_class(status=304)
+        resp.set_etag(str(version))
+        return resp
+    return None
+
+
+def parse_since() -> int:
+    try:
+        return int(request.args.get("since", "0"))
+    except ValueError:
+        return 0
+
+
 # ====== REST: получение свечей ========================================
 
 @app.get("/ohlc")
@@ -204,35 +366,79 @@ def api_get_ohlc():
 @app.get("/candles")
 def api_get_candles():
     """
-    GET /candles?symbol=EURUSD_otc&tf=M5&limit=200
-    Возвращает массив свечей.
+    GET /candles?symbol=EURUSD_otc&tf=M5&limit=200&format=rows
+    Возвращает свечи; format:
+      rows    — массив {"time": ISO, "open", "high", "low", "close"} (по умолчанию);
+      columns — {"time": [unix-сек], "open": [...], ...};
+      binary  — float64 колонками подряд (см. candles_binary);
+      arrow   — Arrow IPC stream (если установлен pyarrow).
     """
     symbol = request.args.get("symbol")
     tf_param = request.args.get("tf", "M1")
     limit = int(request.args.get("limit", "200"))
+    fmt = request.args.get("format", "rows").lower()
 
     if not symbol:
         return jsonify({"error": "symbol required"}), 400
+    if fmt not in CANDLE_FORMATS:
+        return jsonify({"error": f"unsupported format: {fmt}"}), 400
+    if fmt == "arrow" and pa is None:
+        return jsonify({"error": "arrow format requires pyarrow"}), 400
 
     sec = get_tf_seconds(tf_param)
-    builder = BUILDERS.get(sec)
-    if not builder:
+    arr = get_candles_arrays(symbol, sec, limit)
+    if arr is None:
         return jsonify({"error": f"unsupported tf: {tf_param}"}), 400
 
-    df = builder.get_candles_df(symbol, limit=limit)
-    if df.empty:
-        return jsonify([])
+    if fmt == "binary":
+        return candles_binary(arr)
+    if fmt == "arrow":
+        return candles_arrow(arr)
+    if fmt == "columns":
+        return jsonify(candles_columns(arr))
+    return jsonify(candles_rows(arr))
 
-    out = []
-    for _, row in df.iterrows():
-        out.append({
-            "time": row["datetime"].isoformat(),
-            "open": float(row["open"]),
-            "high": float(row["high"]),
-            "low": float(row["low"]),
-            "close": float(row["close"]),
-        })
-    return jsonify(out)
+
+@app.get("/candles/bulk")
+def api_get_candles_bulk():
+    """
+    GET /candles/bulk?symbols=EURUSD_otc,GBPUSD_otc&tf=M1,M5&limit=200&since=<seq>&format=rows
+    Свечи нескольких символов и TF одним ответом (format — rows или columns):
+        {"seq": N, "candles": {symbol: {tf: свечи как в /candles}}}
+    symbols обязателен; since — только символы, изменившиеся после этой версии.
+    ETag = seq: повтор с If-None-Match при неизменных данных -> 304.
+    """
+    symbols = parse_list(request.args.get("symbols"))
+    tfs = parse_list(request.args.get("tf")) or ["M1"]
+    limit = int(request.args.get("limit", "200"))
+    since = parse_since()
+    fmt = request.args.get("format", "rows").lower()
+
+    if not symbols:
+        return jsonify({"error": "symbols required"}), 400
+    if fmt not in ("rows", "columns"):
+        return jsonify({"error": f"unsupported format: {fmt}"}), 400
+    encode = candles_columns if fmt == "columns" else candles_rows
+
+    version = data_version(symbols)
+    cached = not_modified(version)
+    if cached is not None:
+        return cached
+
+    tf_secs = {tf.upper(): get_tf_seconds(tf) for tf in tfs}
+    out: Dict[str, Dict[str, object]] = {}
+    for symbol in symbols:
+        if SYMBOL_SEQ.get(symbol, 0) <= since:
+            continue
+        by_tf = {}
+        for tf, sec in tf_secs.items():
+            arr = get_candles_arrays(symbol, sec, limit)
+            if arr is None:
+                return jsonify({"error": f"unsupported tf: {tf}"}), 400
+            by_tf[tf] = encode(arr)
+        out[symbol] = by_tf
+
+    return versioned({"seq": version, "candles": out}, version)
 
 
 @app.get("/last_tick")
@@ -251,6 +457,29 @@ def api_last_tick():
     return jsonify(data)
 
 
+@app.get("/snapshot")
+def api_snapshot():
+    """
+    GET /snapshot?symbols=EURUSD_otc,GBPUSD_otc&since=<seq>
+    Последние тики всех (или перечисленных) символов одним ответом:
+        {"seq": N, "server_time": ..., "ticks": {symbol: тик как в /last_tick + seq}}
+    since — только тики новее этой версии; ETag = seq, If-None-Match -> 304.
+    """
+    symbols = parse_list(request.args.get("symbols"))
+    since = parse_since()
+
+    with SEQ_LOCK:
+        version = SEQ if symbols is None else max((SYMBOL_SEQ.get(s, 0) for s in symbols), default=0)
+        names = LAST_TICK.keys() if symbols is None else [s for s in symbols if s in LAST_TICK]
+        ticks = {s: LAST_TICK[s] for s in names if LAST_TICK[s]["seq"] > since}
+
+    cached = not_modified(version)
+    if cached is not None:
+        return cached
+
+    return versioned({"seq": version, "server_time": time.time(), "ticks": ticks}, version)
+
+
 # ====== REST: приём данных от po_cdp_hook ===============================
 
 @app.post("/tick")